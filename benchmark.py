@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+Benchmark and replay harness for the check pipeline.
+
+Replays recorded frames (from the dataset store in dataset/, or the sample
+images in the repo) and a presence timeline through the real pipeline: the
+monitor engine, presence long-polling, the change detector, result cache,
+local model, Gemini batcher, retries, circuit breaker, dataset writer and
+ntfy notifications. Only the far ends are replaced, by local stand-in
+servers for the camera, the presence service's /status, Gemini and ntfy,
+each with injectable latency and error rate.
+
+The timeline is replayed `--speed` times faster than real time, as daytime
+presence (home -> out transitions trigger checks), and reports:
+  - end-to-end alert latency (presence change at the stand-in presence
+    service -> notification received by the stand-in ntfy), p50/p95/p99
+  - Gemini calls per (replayed) day
+  - per stage: wall time p50/p95/p99 and CPU time per call (CPU of the
+    thread running the stage), plus retained memory with --trace-memory
+
+Usage:
+    uv run benchmark.py                                  # one synthetic day
+    uv run benchmark.py --days 7 --speed 5000
+    uv run benchmark.py --timeline presence.log          # replay recorded presence
+    uv run benchmark.py --gemini-latency 2 --gemini-error-rate 0.2 --ntfy-error-rate 0.1
+    uv run benchmark.py --json results.json              # keep results to compare runs
+"""
+import argparse
+import asyncio
+import contextlib
+import dataclasses
+import functools
+import io
+import json
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+from google import genai
+from google.genai import types
+
+import config
+import main
+import transport
+from cameras import CameraConfig
+from circuit_breaker import CircuitBreaker
+from dataset_store import OPEN_LABEL, iter_labelled_images
+from gemini_batcher import GeminiBatcher
+from monitor_engine import MonitorEngine
+from simulate import load_presence_log
+
+SCRIPT_DIR = Path(__file__).parent
+DATASET_DIR = SCRIPT_DIR / "dataset"
+SAMPLE_IMAGES = [(OPEN_LABEL, SCRIPT_DIR / "door_open_daytime.jpg"),
+                 ("door_closed", SCRIPT_DIR / "door_shut_daytime.jpg")]
+# Synthetic day: (hour, someone_home) presence changes
+DEFAULT_DAY = [(8.0, False), (12.5, True), (13.25, False), (17.75, True), (19.0, False), (20.5, True)]
+
+
+@dataclass
+class Fault:
+    """Injected latency (seconds) and error rate (0-1) of a stand-in server."""
+    latency: float = 0.0
+    error_rate: float = 0.0
+
+    def fails(self, rng: random.Random) -> bool:
+        """Wait the latency, then decide whether this request fails."""
+        if self.latency:
+            time.sleep(self.latency)
+        return rng.random() < self.error_rate
+
+
+@dataclass
+class StageStats:
+    wall: list[float] = field(default_factory=list)
+    cpu: list[float] = field(default_factory=list)
+    memory: list[int] = field(default_factory=list)
+
+
+def instrument(stats: dict[str, StageStats], name: str, fn):
+    """Wrap a stage function to record wall time, thread CPU time and retained memory per call."""
+    stage = stats.setdefault(name, StageStats())
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            stage.wall.append(time.perf_counter() - wall)
+            stage.cpu.append(time.thread_time() - cpu)
+            if memory is not None:
+                stage.memory.append(tracemalloc.get_traced_memory()[0] - memory)
+    return wrapper
+
+
+class StandIns:
+    """Camera, presence, Gemini and ntfy stand-ins on one local HTTP server."""
+
+    def __init__(self, frames: list[tuple[str, bytes]], faults: dict[str, Fault], seed: int = 0):
+        self.frames = frames
+        self.faults = faults
+        self.rng = random.Random(seed)
+        self.frame_index = 0
+        self.last_label = frames[0][0]
+        self.gemini_requests = 0
+        self.gemini_frames = 0
+        self.alerts: list[float] = []  # monotonic arrival times of delivered notifications
+        self.failed_checks = 0  # delivered "check failed" notifications
+        self.someone_home = True
+        self.version = 0
+        self.closing = False
+        self._changed = threading.Condition()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="stand-ins", daemon=True).start()
+
+    def close(self):
+        with self._changed:
+            self.closing = True
+            self._changed.notify_all()
+        self.server.shutdown()
+
+    def set_presence(self, someone_home: bool):
+        with self._changed:
+            self.someone_home = someone_home
+            self.version += 1
+            self._changed.notify_all()
+
+    def next_frame(self) -> bytes:
+        label, image = self.frames[self.frame_index % len(self.frames)]
+        self.frame_index += 1
+        self.last_label = label
+        return image
+
+    def presence_status(self, query: dict) -> dict:
+        with self._changed:
+            if "since" in query:
+                since = int(query["since"][0])
+                wait = float(query.get("timeout", [config.PRESENCE_LONGPOLL_MAX_SECONDS])[0])
+                self._changed.wait_for(lambda: self.version > since or self.closing, timeout=wait)
+            return {"someone_home": self.someone_home, "people_home": ["bench"] if self.someone_home else [],
+                    "version": self.version}
+
+    def gemini_response(self, body: dict) -> dict:
+        """Answer like Gemini, with the label of the frame the camera served last."""
+        images = sum("inlineData" in part for content in body["contents"] for part in content["parts"])
+        self.gemini_frames += images
+        answer = {"is_open": self.last_label == OPEN_LABEL, "rationale": f"Stand-in: {self.last_label}"}
+        text = json.dumps(answer if images == 1 else [answer] * images)
+        return {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}]}
+
+    def _handler(self):
+        standins = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status: int, data: bytes = b"", content_type: str = "application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _fails(self, name: str) -> bool:
+                if standins.faults[name].fails(standins.rng):
+                    error = {"error": {"code": 503, "message": f"Injected {name} failure", "status": "UNAVAILABLE"}}
+                    self._reply(503, json.dumps(error).encode())
+                    return True
+                return False
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path == "/shot.jpg":
+                    if not self._fails("camera"):
+                        self._reply(200, standins.next_frame(), "image/jpeg")
+                elif url.path == "/status":
+                    if not self._fails("presence"):
+                        payload = standins.presence_status(parse_qs(url.query))
+                        self._reply(200, json.dumps(payload).encode())
+                else:
+                    self._reply(404)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path.endswith(":generateContent"):
+                    standins.gemini_requests += 1
+                    if not self._fails("gemini"):
+                        self._reply(200, json.dumps(standins.gemini_response(json.loads(body))).encode())
+                elif not self._fails("ntfy"):
+                    standins.alerts.append(time.monotonic())
+                    if self.headers.get("Title", "").endswith("check failed"):
+                        standins.failed_checks += 1
+                    self._reply(200, b"{}")
+
+            def log_message(self, format, *args):
+                return
+
+        return Handler
+
+
+def load_frames(dataset_dir: Path, limit: int) -> list[tuple[str, bytes]]:
+    """Recorded (label, jpeg) frames from the dataset, or the repo's sample images."""
+    frames = []
+    if dataset_dir.exists():
+        for name, label, image in iter_labelled_images(dataset_dir):
+            frames.append((label, image))
+            if len(frames) >= limit:
+                break
+    return frames or [(label, path.read_bytes()) for label, path in SAMPLE_IMAGES]
+
+
+def default_timeline(days: int) -> list[tuple[float, bool]]:
+    """(offset seconds, someone_home) presence changes for `days` synthetic days."""
+    return [(day * 86400 + hour * 3600, someone_home) for day in range(days) for hour, someone_home in DEFAULT_DAY]
+
+
+def load_timeline(path: Path) -> list[tuple[float, bool]]:
+    """Presence changes from a presence monitor log, as offsets from the first one (plus a minute)."""
+    changes = load_presence_log(path)
+    start = changes[0][0]
+    return [(60 + (when - start).total_seconds(), someone_home) for when, someone_home in changes]
+
+
+def percentiles(values: list[float]) -> tuple[float, float, float]:
+    if not values:
+        return (float("nan"),) * 3
+    return tuple(float(p) for p in np.percentile(values, [50, 95, 99]))
+
+
+def alert_latencies(departures: list[float], alerts: list[float]) -> tuple[list[float], int]:
+    """Latency from each home -> out change to the first alert after it (before the next one)."""
+    latencies, missed = [], 0
+    for i, departed in enumerate(departures):
+        next_departure = departures[i + 1] if i + 1 < len(departures) else float("inf")
+        arrived = [t for t in alerts if departed <= t < next_departure]
+        if arrived:
+            latencies.append(arrived[0] - departed)
+        else:
+            missed += 1
+    return latencies, missed
+
+
+def scaled_retry(policy, scale: float):
+    return dataclasses.replace(policy, base_delay=policy.base_delay * scale, max_delay=policy.max_delay * scale,
+                               deadline=policy.deadline * scale)
+
+
+def wire_pipeline(standins: StandIns, workdir: Path, days: float, args, stats: dict[str, StageStats]):
+    """Point the real pipeline at the stand-ins, instrument its stages, and build one camera monitor."""
+    main.NTFY_SERVER = standins.base_url
+    main.PRESENCE_API_PORT = standins.port
+    main.PHONE_IPS = {}  # presence fallback must not ping real phones
+    # Replayed presence changes are daytime ones (home -> out transitions trigger checks)
+    main.is_daytime = lambda clock=main.get_local_time: True
+    client = genai.Client(api_key="benchmark", http_options=types.HttpOptions(
+        base_url=standins.base_url, timeout=int(config.GEMINI_HTTP_TIMEOUT * 1000)))
+    transport.get_gemini_client = lambda: client
+    main.CAMERA_RETRY = scaled_retry(main.CAMERA_RETRY, args.retry_scale)
+    main.GEMINI_RETRY = scaled_retry(main.GEMINI_RETRY, args.retry_scale)
+    main.NTFY_RETRY = scaled_retry(main.NTFY_RETRY, args.retry_scale)
+    main.GEMINI_BREAKER = CircuitBreaker("Gemini", config.GEMINI_BREAKER_FAILURE_THRESHOLD,
+                                         config.GEMINI_BREAKER_RESET_SECONDS * args.retry_scale)
+
+    for name, fn in (("presence", "is_anyone_home"), ("camera", "fetch_frame"),
+                     ("shortcuts", "answer_without_gemini"), ("notify", "send_notification")):
+        setattr(main, fn, instrument(stats, name, getattr(main, fn)))
+    gemini = GeminiBatcher(main.DoorStatus, main.QUERY, main.BATCH_QUERY, callers=1)
+    gemini._generate = instrument(stats, "gemini", gemini._generate)
+    main.DATASET_WRITER._write = instrument(stats, "dataset", main.DATASET_WRITER._write)
+
+    camera = CameraConfig(
+        name="bench", url=f"{standins.base_url}/shot.jpg", stream_url=None, title="Benchmark door",
+        ntfy_topic="benchmark", dataset_dir=workdir / "dataset",
+        model_path=Path(args.local_model) if args.local_model else workdir / "no_model.npz",
+        result_cache_path=workdir / "result_cache.json",
+    )
+    # The replay compresses days into seconds, so allow each replayed day's budget at once
+    limiter = main.ApiRateLimiter(int(main.MAX_API_CALLS_PER_DAY * max(days, 1)),
+                                  recheck_headroom=main.API_RECHECK_HEADROOM)
+    return {camera.name: main.CameraMonitor(camera, limiter, gemini)}
+
+
+async def replay(standins: StandIns, monitors: dict, timeline: list[tuple[float, bool]], speed: float,
+                 drain: float, stats: dict[str, StageStats]) -> list[float]:
+    """Run the monitor engine while playing the timeline. Returns monotonic home -> out times."""
+    decide = instrument(stats, "decide", lambda someone_home: main.decide_checks(monitors, someone_home))
+    engine = MonitorEngine(
+        poll_presence=main.poll_presence,
+        decide=decide,
+        run_check=lambda name, priority: main.run_door_check(monitors[name], priority),
+        save=lambda result: main.save_check_result(monitors[result.camera], result),
+        notify=lambda result: main.notify_check_result(monitors[result.camera], result),
+        interval=1,
+        workers=main.CAMERA_WORKERS,
+        now=main.get_local_time,
+    )
+    engine_task = asyncio.create_task(engine.run())
+    departures = []
+    start = time.monotonic()
+    try:
+        for offset, someone_home in timeline:
+            await asyncio.sleep(max(0.0, start + offset / speed - time.monotonic()))
+            if not someone_home and standins.someone_home:
+                departures.append(time.monotonic())
+            standins.set_presence(someone_home)
+        await asyncio.sleep(drain)
+    finally:
+        standins.close()
+        engine_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await engine_task
+    return departures
+
+
+def report(results: dict):
+    print(f"Replayed {results['days']:.2f} days ({results['departures']} home -> out changes) "
+          f"in {results['elapsed_seconds']:.1f}s")
+    p50, p95, p99 = results["alert_latency_seconds"]
+    print(f"Alert latency: p50 {p50:.3f}s  p95 {p95:.3f}s  p99 {p99:.3f}s  "
+          f"({results['alerts']} alerts, {results['failed_checks']} of them failed checks, "
+          f"{results['missed_alerts']} missed)")
+    print(f"Gemini: {results['api_calls_per_day']:.1f} calls/day recorded against the budget, "
+          f"{results['gemini_requests_per_day']:.1f} requests/day incl. failures")
+    print(f"Peak RSS: {results['max_rss_mib']:.1f} MiB")
+    print()
+    print(f"{'stage':<10} {'calls':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'CPU ms/call':>12} {'KiB/call':>9}")
+    for name, stage in results["stages"].items():
+        p50, p95, p99 = (1000 * value for value in stage["wall_seconds"])
+        memory = f"{stage['memory_kib']:9.1f}" if stage["memory_kib"] is not None else f"{'-':>9}"
+        print(f"{name:<10} {stage['calls']:>6} {p50:>9.2f} {p95:>9.2f} {p99:>9.2f} "
+              f"{1000 * stage['cpu_seconds']:>12.2f} {memory}")
+
+
+def run(args) -> dict:
+    frames = load_frames(Path(args.dataset), args.max_frames)
+    timeline = load_timeline(Path(args.timeline)) if args.timeline else default_timeline(args.days)
+    days = timeline[-1][0] / 86400 if args.timeline else args.days
+    faults = {name: Fault(getattr(args, f"{name}_latency"), getattr(args, f"{name}_error_rate"))
+              for name in ("camera", "presence", "gemini", "ntfy")}
+    stats: dict[str, StageStats] = {}
+    if args.trace_memory:
+        tracemalloc.start()
+
+    standins = StandIns(frames, faults, args.seed)
+    standins.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        monitors = wire_pipeline(standins, Path(tmp), days, args, stats)
+        started = time.monotonic()
+        # The pipeline logs every step; keep the report readable unless asked
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            departures = asyncio.run(replay(standins, monitors, timeline, args.speed, args.drain, stats))
+            main.DATASET_WRITER.close()
+        elapsed = time.monotonic() - started
+        api_calls = monitors["bench"].api_limiter.api_calls_today
+
+    latencies, missed = alert_latencies(departures, standins.alerts)
+    return {
+        "days": days,
+        "elapsed_seconds": elapsed,
+        "frames": len(frames),
+        "departures": len(departures),
+        "alerts": len(standins.alerts),
+        "failed_checks": standins.failed_checks,
+        "missed_alerts": missed,
+        "alert_latency_seconds": percentiles(latencies),
+        "api_calls_per_day": api_calls / days,
+        "gemini_requests_per_day": standins.gemini_requests / days,
+        "max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "faults": {name: dataclasses.asdict(fault) for name, fault in faults.items()},
+        "stages": {
+            name: {
+                "calls": len(stage.wall),
+                "wall_seconds": percentiles(stage.wall),
+                "cpu_seconds": float(np.mean(stage.cpu)) if stage.cpu else 0.0,
+                "memory_kib": float(np.mean(stage.memory)) / 1024 if stage.memory else None,
+            }
+            for name, stage in stats.items()
+        },
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=str(DATASET_DIR), help="dataset to replay frames from")
+    parser.add_argument("--max-frames", type=int, default=200)
+    parser.add_argument("--timeline", help="presence monitor log to replay (default: synthetic days)")
+    parser.add_argument("--days", type=int, default=1, help="synthetic days to replay")
+    parser.add_argument("--speed", type=float, default=1440, help="replay speed-up (1440: a day per minute)")
+    parser.add_argument("--drain", type=float, default=5, help="seconds to wait for the last alerts")
+    parser.add_argument("--retry-scale", type=float, default=0.01,
+                        help="scale retry delays/deadlines and the breaker reset time by this")
+    parser.add_argument("--local-model", help="local model to use (default: none, every check asks Gemini)")
+    for name in ("camera", "presence", "gemini", "ntfy"):
+        parser.add_argument(f"--{name}-latency", type=float, default=0.0, help=f"seconds added to each {name} request")
+        parser.add_argument(f"--{name}-error-rate", type=float, default=0.0, help=f"fraction of {name} requests failing with 503")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-memory", action="store_true", help="record retained memory per stage (slower)")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own output")
+    args = parser.parse_args()
+
+    results = run(args)
+    report(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"\nWrote {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,112 @@
+"""
+Persistent MJPEG camera stream reader.
+
+Instead of a full HTTP request + JPEG transfer for every check, a
+background thread keeps the camera's MJPEG stream open and stores the most
+recent frames in a small ring buffer, reconnecting automatically. Checks
+take the latest frame with no fetch latency.
+
+Frames are kept as the camera's JPEG bytes (immutable), so the same object
+is shared with the change detector, classifier, dataset and notifications
+without copying, and only frames that are actually checked get decoded.
+"""
+import re
+import threading
+import time
+from collections import deque
+from typing import Iterable, Iterator
+
+import config
+import transport
+
+SOI = b"\xff\xd8"  # JPEG start of image
+EOI = b"\xff\xd9"  # JPEG end of image
+CONTENT_LENGTH = re.compile(rb"Content-Length:\s*(\d+)", re.IGNORECASE)
+# Give up on a buffer that grew this big without containing a frame
+MAX_BUFFER_BYTES = 8 * 1024 * 1024
+
+
+def iter_mjpeg_frames(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Split a multipart MJPEG byte stream into JPEG frames.
+
+    Uses the part's Content-Length header when present (robust to EXIF
+    thumbnails inside the JPEG), otherwise scans for the end-of-image marker.
+    """
+    buf = bytearray()
+    for chunk in chunks:
+        buf += chunk
+        while True:
+            start = buf.find(SOI)
+            if start < 0:
+                if len(buf) > MAX_BUFFER_BYTES:
+                    del buf[:-1]
+                break
+            match = CONTENT_LENGTH.search(buf, 0, start)
+            if match:
+                end = start + int(match.group(1))
+                if len(buf) < end:
+                    break
+            else:
+                eoi = buf.find(EOI, start + 2)
+                if eoi < 0:
+                    break
+                end = eoi + 2
+            frame = bytes(buf[start:end])
+            del buf[:end]
+            yield frame
+
+
+class CameraStream:
+    """Background reader keeping the latest frames of an MJPEG stream."""
+
+    def __init__(self, url: str,
+                 buffer_frames: int = config.CAMERA_STREAM_BUFFER_FRAMES,
+                 max_reconnect_seconds: float = config.CAMERA_STREAM_MAX_RECONNECT_SECONDS):
+        self.url = url
+        self.max_reconnect_seconds = max_reconnect_seconds
+        # (monotonic timestamp, jpeg bytes), newest last
+        self.frames: deque[tuple[float, bytes]] = deque(maxlen=buffer_frames)
+        self.connected = False
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"stream {self.url}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def latest(self, max_age: float = config.CAMERA_STREAM_MAX_FRAME_AGE) -> bytes | None:
+        """The newest frame, or None if there is none younger than max_age seconds."""
+        try:
+            timestamp, frame = self.frames[-1]
+        except IndexError:
+            return None
+        if time.monotonic() - timestamp > max_age:
+            return None
+        return frame
+
+    def _run(self):
+        delay = 1.0
+        while not self._stop.is_set():
+            try:
+                with transport.get(self.url, stream=True) as response:
+                    response.raise_for_status()
+                    print(f"Connected to camera stream {self.url}")
+                    self.connected = True
+                    delay = 1.0
+                    # read1 returns whatever has arrived; iter_content would wait for a full
+                    # chunk, holding back the newest frame until the next ones fill it
+                    chunks = iter(lambda: response.raw.read1(64 * 1024), b"")
+                    for frame in iter_mjpeg_frames(chunks):
+                        self.frames.append((time.monotonic(), frame))
+                        if self._stop.is_set():
+                            return
+            except Exception as e:
+                print(f"Camera stream {self.url} failed: {e}")
+            self.connected = False
+            # Reconnect with exponential backoff
+            self._stop.wait(delay)
+            delay = min(delay * 2, self.max_reconnect_seconds)
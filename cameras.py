@@ -0,0 +1,66 @@
+"""
+Camera configuration.
+
+config.CAMERAS lists the cameras (one per door or gate) to monitor. Each
+entry needs a unique "name" and a "url"; everything else is optional and
+defaults per camera, so notifications, dataset folders, local models and
+result caches stay separate:
+
+    stream_url         None (MJPEG stream to read frames from instead of `url`)
+    title              "<Name> door", used in notification titles
+    ntfy_topic         NTFY_TOPIC
+    dataset_dir        dataset_<name>
+    model_path         door_model_<name>.npz
+    result_cache_path  result_cache_<name>.json
+
+Relative paths are relative to the project directory.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+
+import config
+
+SCRIPT_DIR = Path(__file__).parent
+
+
+@dataclass(frozen=True)
+class CameraConfig:
+    name: str
+    url: str
+    stream_url: str | None
+    title: str
+    ntfy_topic: str
+    dataset_dir: Path
+    model_path: Path
+    result_cache_path: Path
+
+
+def load_cameras(entries: list[dict] = config.CAMERAS) -> list[CameraConfig]:
+    """Build camera configs from config.CAMERAS, filling in per-camera defaults."""
+    cameras = []
+    seen = set()
+    for entry in entries:
+        name = entry["name"]
+        if name in seen:
+            raise ValueError(f"Duplicate camera name in config.CAMERAS: {name}")
+        seen.add(name)
+        cameras.append(CameraConfig(
+            name=name,
+            url=entry["url"],
+            stream_url=entry.get("stream_url"),
+            title=entry.get("title", f"{name.replace('_', ' ').capitalize()} door"),
+            ntfy_topic=entry.get("ntfy_topic", config.NTFY_TOPIC),
+            dataset_dir=SCRIPT_DIR / entry.get("dataset_dir", f"dataset_{name}"),
+            model_path=SCRIPT_DIR / entry.get("model_path", f"door_model_{name}.npz"),
+            result_cache_path=SCRIPT_DIR / entry.get("result_cache_path", f"result_cache_{name}.json"),
+        ))
+    if not cameras:
+        raise ValueError("config.CAMERAS is empty")
+    return cameras
+
+
+def get_camera(name: str) -> CameraConfig:
+    for camera in load_cameras():
+        if camera.name == name:
+            return camera
+    raise KeyError(f"No camera named {name!r} in config.CAMERAS")
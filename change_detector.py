@@ -0,0 +1,60 @@
+"""
+Frame-difference change detector.
+
+Compares each camera frame against a rolling reference (a small grayscale
+thumbnail) and remembers the last classification. While the scene is
+effectively unchanged the remembered DoorStatus can be reused, so no model
+or API call is needed. A scene change marks the remembered result stale.
+"""
+import numpy as np
+
+import config
+from image_features import grayscale_array
+
+
+class ChangeDetector:
+    """Detects scene changes between frames and caches the last result."""
+
+    def __init__(self,
+                 size: tuple[int, int] = config.CHANGE_DETECTOR_SIZE,
+                 pixel_delta: float = config.CHANGE_PIXEL_DELTA,
+                 fraction_threshold: float = config.CHANGE_FRACTION_THRESHOLD,
+                 reference_alpha: float = config.CHANGE_REFERENCE_ALPHA):
+        self.size = size
+        self.pixel_delta = pixel_delta
+        self.fraction_threshold = fraction_threshold
+        self.reference_alpha = reference_alpha
+        self.reference: np.ndarray | None = None
+        self.last_result = None
+        self.stale = True
+
+    def update(self, image_bytes: bytes) -> bool:
+        """Feed a new frame. Returns True if the scene changed since the reference."""
+        frame = grayscale_array(image_bytes, self.size)
+        if self.reference is None or self.reference.shape != frame.shape:
+            self.reference = frame
+            self.stale = True
+            return True
+
+        changed_fraction = float((np.abs(frame - self.reference) > self.pixel_delta).mean())
+        if changed_fraction > self.fraction_threshold:
+            # Scene changed: start a new reference and force a real classification
+            self.reference = frame
+            self.stale = True
+            return True
+
+        # Unchanged: let the reference follow slow lighting drift
+        self.reference += self.reference_alpha * (frame - self.reference)
+        return False
+
+    def cached_result(self, image_bytes: bytes):
+        """Return the remembered result if this frame shows the same scene, else None."""
+        changed = self.update(image_bytes)
+        if changed or self.stale:
+            return None
+        return self.last_result
+
+    def remember(self, result):
+        """Store the classification for the current reference frame."""
+        self.last_result = result
+        self.stale = False
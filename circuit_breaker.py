@@ -0,0 +1,107 @@
+"""
+Circuit breaker for an unreliable dependency (Gemini).
+
+After `failure_threshold` consecutive failures the breaker opens and calls
+are refused straight away, so checks take the degraded path instead of
+sitting through a full retry sequence each time. After `reset_seconds` it
+half-opens and lets a single probe call through: success closes it again,
+failure re-opens it for another `reset_seconds`.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the dependency while the breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+        self.probe_in_flight = False
+        self.times_opened = 0
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            print(f"{self.name} circuit breaker: {self.state} -> {state}")
+            self.state = state
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (claims the probe when half-open)."""
+        if self.state == OPEN and self.clock() - self.opened_at >= self.reset_seconds:
+            self._set_state(HALF_OPEN)
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may go through now."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit breaker is {self.state}")
+
+    async def call(self, attempt: Callable[[], Awaitable[T]],
+                   is_outage: Callable[[Exception], bool]) -> T:
+        """Await `attempt()` if the breaker allows it, recording the outcome.
+
+        Errors for which `is_outage` is false mean the dependency is up and
+        count as a success. A cancelled call (e.g. by a retry deadline) never
+        answered, so it counts as a failure, which also frees a half-open probe.
+        """
+        self.check()
+        try:
+            result = await attempt()
+        except asyncio.CancelledError:
+            self.record_failure()
+            raise
+        except Exception as e:
+            if is_outage(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+        self._set_state(CLOSED)
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.probe_in_flight = False
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.times_opened += 1
+            self.opened_at = self.clock()
+            self._set_state(OPEN)
+
+    def status(self) -> dict:
+        """Breaker state for monitoring."""
+        retry_in = None
+        if self.state == OPEN:
+            retry_in = max(0.0, self.reset_seconds - (self.clock() - self.opened_at))
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "retry_in_seconds": retry_in,
+        }
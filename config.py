@@ -15,30 +15,140 @@ DAYTIME_END = time(20, 0)
 
 # Continuous monitoring configuration
 CHECK_INTERVAL_SECONDS = 30  # How often main loop checks conditions
-MAX_API_CALLS_PER_DAY = 20
+MAX_API_CALLS_PER_DAY = 20  # per rolling 24 hours, split across cameras
+# Low-priority re-checks must leave this many calls spare for transition checks
+# (calls for the remaining night checks are always kept back)
+API_RECHECK_HEADROOM = 2
 
 # Night check times (hours in 24-hour format, in LOCAL_TIMEZONE)
 NIGHT_CHECK_HOURS = [20, 22, 0, 4]
 
+# Continuous mode (`uv run main.py --continuous`): sample every camera this
+# often, classify locally (Gemini only for uncertain frames, at re-check
+# priority) and notify only when the debounced door state changes
+CONTINUOUS_SAMPLE_SECONDS = 5
+CONTINUOUS_DEBOUNCE = 3  # consistent readings required to flip the door state
+CONTINUOUS_OPEN_ALERT_SECONDS = 15 * 60  # alert when the door has been open this long...
+CONTINUOUS_OPEN_REALERT_SECONDS = 60 * 60  # ...and again this often while it stays open
+
 # Presence monitor settings
 PRESENCE_PING_INTERVAL = 10  # seconds between pings in presence monitor
 PRESENCE_DEBOUNCE = 3  # number of consistent checks required to flip state
+PRESENCE_PROBE_TIMEOUT = 2  # seconds; one sweep pings all phones concurrently within this
 PRESENCE_API_PORT = 8765  # port for presence HTTP status server
+PRESENCE_LONGPOLL_MAX_SECONDS = 60  # max time /status?since=<version> waits for a change
+PRESENCE_LONGPOLL_SECONDS = 30  # how long main.py asks each long-poll to wait
 PRESENCE_LOG_FILE = "presence.log"
 
+# Prometheus metrics for main.py at http://<host>:METRICS_PORT/metrics (None to disable);
+# the presence monitor serves its own at /metrics on PRESENCE_API_PORT
+METRICS_PORT = 8766
+
 # Notification settings
+NTFY_SERVER = "https://ntfy.sh"
 NTFY_TOPIC = "is_my_garage_door_open"
 NOTIFY_WHEN_SHUT = True
 
 # Camera settings
 CAM_URL = "http://192.168.0.225:8080/shot.jpg"
+CAM_STREAM_URL = "http://192.168.0.225:8080/video"  # MJPEG stream (None to fetch CAM_URL per check)
+CAMERA_STREAM_BUFFER_FRAMES = 4  # recent stream frames kept in memory
+CAMERA_STREAM_MAX_FRAME_AGE = 5  # seconds; older stream frames fall back to a CAM_URL fetch
+CAMERA_STREAM_MAX_RECONNECT_SECONDS = 60  # cap on the stream reconnect backoff
+
+# Upload image sizes (longest side in pixels) and JPEG quality; the dataset keeps the original
+MODEL_IMAGE_MAX_SIZE = 768  # Gemini input; <=768px keeps the image within a few tiles/tokens
+MODEL_IMAGE_QUALITY = 85
+NOTIFY_THUMBNAIL_MAX_SIZE = 480  # ntfy attachment
+NOTIFY_THUMBNAIL_QUALITY = 70
+
+# Local classifier settings (train with `uv run local_classifier.py train`)
+LOCAL_MODEL_PATH = "door_model.npz"  # relative to the project directory
+LOCAL_CONFIDENCE_THRESHOLD = 0.9  # below this confidence, fall back to Gemini
+# A trained model is only saved if it passes these on held-out images
+LOCAL_MODEL_MIN_PER_CLASS = 20  # images of each class (open / closed)
+LOCAL_MODEL_MIN_ACCURACY = 0.95  # overall, and of the confident answers that skip Gemini
+
+# Change detector settings (reuse the last result while the scene is unchanged)
+CHANGE_DETECTOR_SIZE = (64, 48)  # (width, height) of the grayscale comparison thumbnail
+CHANGE_PIXEL_DELTA = 0.08  # per-pixel brightness change (0-1) counted as changed
+CHANGE_FRACTION_THRESHOLD = 0.05  # fraction of changed pixels that means "scene changed"
+CHANGE_REFERENCE_ALPHA = 0.1  # how fast the reference follows slow lighting drift
+
+# Result cache settings (Gemini answers keyed by perceptual hash of the frame)
+RESULT_CACHE_PATH = "result_cache.json"  # relative to the project directory
+RESULT_CACHE_TTL_SECONDS = 3 * 24 * 3600
+RESULT_CACHE_MAX_ENTRIES = 500
+RESULT_CACHE_MAX_HAMMING_DISTANCE = 4  # bits of the 128-bit dHash that may differ
+
+# Dataset store: frames are packed into append-only segment files of up to this size
+DATASET_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+# Frames within this many bits (of the 128-bit dHash) of a stored frame with the
+# same label are near-duplicates and not stored again (None stores everything)
+DATASET_DEDUP_MAX_DISTANCE = 4
+# The dHash ignores overall brightness, so near-duplicates must also fall in the
+# same band of mean brightness: dusk and night versions of a scene are kept
+DATASET_DEDUP_BRIGHTNESS_STEP = 0.1
+# Background dataset writer: frames are written (and fsynced) in batches of up
+# to DATASET_WRITER_BATCH_SIZE, collected for up to DATASET_WRITER_FLUSH_SECONDS.
+# When the queue is full (slow disk), saving waits up to DATASET_WRITER_PUT_TIMEOUT
+# seconds for space and then drops the frame
+DATASET_WRITER_QUEUE_SIZE = 256
+DATASET_WRITER_BATCH_SIZE = 32
+DATASET_WRITER_FLUSH_SECONDS = 2.0
+DATASET_WRITER_PUT_TIMEOUT = 5.0
+
+# Persistent monitor state (API call counts, night checks, presence), see state_store.py
+STATE_DB_PATH = "monitor_state.db"  # relative to the project directory
 
-# Retry configuration for 503 errors
-MAX_RETRIES = 15
-RETRY_INTERVAL_SECONDS = 60
+# Cameras to monitor (one per door/gate), see cameras.py for optional fields and defaults.
+# The first camera keeps the original single-camera paths.
+CAMERAS = [
+    {
+        "name": "garage",
+        "url": CAM_URL,
+        "stream_url": CAM_STREAM_URL,
+        "title": "Garage door",
+        "ntfy_topic": NTFY_TOPIC,
+        "dataset_dir": "dataset",
+        "model_path": LOCAL_MODEL_PATH,
+        "result_cache_path": RESULT_CACHE_PATH,
+    },
+    # {"name": "side_gate", "url": "http://192.168.0.226:8080/shot.jpg"},
+]
+CAMERA_WORKERS = 4  # max cameras fetched/classified concurrently
+
+# HTTP transport settings: (connect, read) timeouts in seconds per host
+HTTP_POOL_SIZE = 4  # keep-alive connections kept per host
+HTTP_DEFAULT_TIMEOUT = (5, 30)
+CAMERA_HTTP_TIMEOUT = (3, 10)
+PRESENCE_HTTP_TIMEOUT = (0.5, 1)
+NTFY_HTTP_TIMEOUT = (5, 30)
+GEMINI_HTTP_TIMEOUT = 60  # seconds for one Gemini request (the client default is no limit)
+
+# Retry policies per dependency: exponential backoff (base_delay doubling up to
+# max_delay, with jitter), giving up after max_attempts or deadline seconds
+CAMERA_RETRY = {"max_attempts": 5, "base_delay": 1, "max_delay": 15, "deadline": 60}
+GEMINI_RETRY = {"max_attempts": 15, "base_delay": 5, "max_delay": 120, "deadline": 15 * 60}
+NTFY_RETRY = {"max_attempts": 8, "base_delay": 2, "max_delay": 60, "deadline": 10 * 60}
+# Gemini circuit breaker: open after this many consecutive failed calls, and
+# probe again after GEMINI_BREAKER_RESET_SECONDS. While open, checks get a
+# degraded best-effort answer instead of waiting on retries
+GEMINI_BREAKER_FAILURE_THRESHOLD = 3
+GEMINI_BREAKER_RESET_SECONDS = 300
+# Degraded-mode heuristic at night: mean frame brightness (0-1) above this is
+# taken as the door open (outside light coming in)
+DEGRADED_NIGHT_OPEN_BRIGHTNESS = 0.25
+# Before retrying Gemini, refetch the camera frame if it is older than this
+RETRY_REFETCH_AFTER_SECONDS = 30
+
+# Gemini settings
+GEMINI_MODEL = "gemini-3-flash-preview"
+GEMINI_BATCH_WINDOW_SECONDS = 1.0  # how long to collect frames due together into one request
+GEMINI_BATCH_MAX_FRAMES = 8
 
 # Gemini query prompt
-QUERY = """
+QUERY_CONTEXT = """
 I have a camera set up inside the garage to check if the garage door is open or closed.
 
 In daytime, if the door is open, you should see the driveway and maybe the street.
@@ -47,8 +157,18 @@ windows.
 
 At night, I'd expect a mostly black image if the door is shut. If it's open you might see 
 the street lights outside.
+"""
 
+QUERY = QUERY_CONTEXT + """
 Here's the latest photo.
 
 Is the door open or closed?
 """
+
+# Prompt for several photos in one request (from different cameras/doors)
+BATCH_QUERY = QUERY_CONTEXT + """
+Here are the latest photos, possibly from cameras at different doors, each labelled
+"Photo N:". Judge each photo on its own.
+
+For each photo, in order, is the door open or closed?
+"""
@@ -0,0 +1,550 @@
+#!/usr/bin/env python3
+"""
+Append-only, indexed dataset store for classified camera frames.
+
+Instead of one JPEG file per check (hundreds of thousands of small files
+and slow directory scans after a few months), frames are appended to large
+segment files and indexed in SQLite:
+
+    <dataset_dir>/segments/segment_000001.bin   packed JPEG blobs, append-only
+    <dataset_dir>/index.sqlite                  one row per frame: timestamp,
+                                                label, rationale, camera,
+                                                perceptual hash, blob location
+
+Appends are O(1) (write the blob at the end of the open segment, then insert
+one index row), and the index answers range queries by time, label and
+camera. A crash between the two leaves only unreferenced bytes at the end of
+a segment. `export` writes the old directory-tree layout (door_open/,
+door_closed/) for tools that want files, e.g. FiftyOne.
+
+Frames repeat a lot (the same closed door, night after night), so appends
+skip near-duplicates: a frame whose perceptual hash is within
+DATASET_DEDUP_MAX_DISTANCE bits of a stored frame with the same label and
+band of mean brightness (DATASET_DEDUP_BRIGHTNESS_STEP; the hash itself
+ignores brightness) is recorded in a `duplicates` table (with the sample it
+duplicates) instead of being stored. Featureless frames (e.g. black) are
+always stored. Lookups use multi-index hashing (hash_index.py), not a scan. `dedup` does
+the same for a store built without it, keeping the earliest frame of each
+cluster, and `compact` reclaims the segment space of dropped frames.
+
+Frames saved by older versions as loose JPEGs in door_open/ and door_closed/
+are still read by iter_labelled_images, and can be moved into the store with
+`import`.
+
+Usage:
+    uv run dataset_store.py stats [--camera NAME]
+    uv run dataset_store.py export OUT_DIR [--label door_open] [--since 2026-01-01] [--until ...]
+    uv run dataset_store.py import [--camera NAME]   # move legacy loose JPEGs into the store
+    uv run dataset_store.py dedup [--distance 4]     # drop near-duplicates already stored
+    uv run dataset_store.py compact                  # reclaim space (stop the monitor first)
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+from zoneinfo import ZoneInfo
+
+import config
+from cameras import get_camera
+from hash_index import HashIndex
+from image_features import dhash, is_featureless, mean_brightness
+
+SCRIPT_DIR = Path(__file__).parent
+DATASET_DIR = SCRIPT_DIR / "dataset"
+INDEX_NAME = "index.sqlite"
+SEGMENTS_DIR = "segments"
+
+# Label for each door state, also the directory names of the tree layout
+OPEN_LABEL = "door_open"
+CLOSED_LABEL = "door_closed"
+LABELS = (OPEN_LABEL, CLOSED_LABEL)
+IMPORT_BATCH_SIZE = 100
+
+
+# AUTOINCREMENT: ids are never reused after samples are dropped, so an id always
+# means the same frame (the FiftyOne sync and the duplicates table refer to them)
+SAMPLES_TABLE = """
+    CREATE TABLE IF NOT EXISTS samples (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp REAL NOT NULL,
+        camera TEXT NOT NULL,
+        label TEXT NOT NULL,
+        rationale TEXT NOT NULL,
+        phash TEXT NOT NULL,
+        segment INTEGER NOT NULL,
+        offset INTEGER NOT NULL,
+        length INTEGER NOT NULL,
+        brightness REAL
+    )
+"""
+SAMPLES_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS samples_timestamp ON samples (timestamp)",
+    "CREATE INDEX IF NOT EXISTS samples_label_timestamp ON samples (label, timestamp)",
+)
+
+
+def label_for(is_open: bool) -> str:
+    return OPEN_LABEL if is_open else CLOSED_LABEL
+
+
+def dedup_key(label: str, brightness: float) -> tuple[str, int]:
+    """Frames are only near-duplicates of frames with the same key."""
+    return label, int(brightness / config.DATASET_DEDUP_BRIGHTNESS_STEP)
+
+
+@dataclass(frozen=True)
+class Frame:
+    """A frame to add to the store."""
+    image_bytes: bytes
+    is_open: bool
+    rationale: str = ""
+    camera: str = ""
+    timestamp: float | None = None  # unix seconds, default now
+
+
+@dataclass(frozen=True)
+class Sample:
+    """One indexed frame (image bytes are read separately with read_image)."""
+    id: int
+    timestamp: float  # unix seconds
+    camera: str
+    label: str
+    rationale: str
+    phash: str  # 128-bit dHash as 32 hex digits
+    segment: int
+    offset: int
+    length: int
+
+    def local_time(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp, ZoneInfo(config.LOCAL_TIMEZONE))
+
+    def filename(self) -> str:
+        """Directory-tree filename, in the format main.py used for loose JPEGs."""
+        return f"{self.local_time().strftime('%Y%m%d_%H%M%S_%f')[:-3]}.jpg"
+
+
+class DatasetStore:
+    """Segment files of packed JPEGs plus a SQLite index."""
+
+    def __init__(self, root: Path = DATASET_DIR,
+                 segment_max_bytes: int = config.DATASET_SEGMENT_MAX_BYTES,
+                 dedup_distance: int | None = config.DATASET_DEDUP_MAX_DISTANCE):
+        self.root = Path(root)
+        self.segment_max_bytes = segment_max_bytes
+        self.dedup_distance = dedup_distance
+        # dedup_key -> HashIndex of stored hashes, values are [sample id]; built on first use
+        self._indexes: dict[tuple[str, int], HashIndex] | None = None
+        (self.root / SEGMENTS_DIR).mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.root / INDEX_NAME, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # Appends are batched into one transaction each, so FULL (an fsync per
+        # commit) is cheap, and an index row never outlives a power cut
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(SAMPLES_TABLE)
+        for index in SAMPLES_INDEXES:
+            self._db.execute(index)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS duplicates (
+                id INTEGER PRIMARY KEY,
+                sample_id INTEGER,
+                timestamp REAL NOT NULL,
+                camera TEXT NOT NULL,
+                label TEXT NOT NULL,
+                rationale TEXT NOT NULL,
+                phash TEXT NOT NULL,
+                representative_id INTEGER NOT NULL,
+                distance INTEGER NOT NULL
+            )
+        """)
+        row = self._db.execute("SELECT MAX(segment) FROM samples").fetchone()
+        self._segment = row[0] or 1
+        self._segment_file = None
+        self._add_brightness()
+        self._never_reuse_ids()
+
+    def _add_brightness(self):
+        """Add the brightness column to a store created without it."""
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(samples)")]
+        if "brightness" in columns:
+            return
+        rows = self._db.execute("SELECT id, segment, offset, length FROM samples").fetchall()
+        print(f"Adding brightness to {len(rows)} samples in {self.root}")
+        updates = []
+        for sample_id, segment, offset, length in rows:
+            with open(self._segment_path(segment), "rb") as f:
+                f.seek(offset)
+                updates.append((mean_brightness(f.read(length)), sample_id))
+        with self._db:
+            self._db.execute("ALTER TABLE samples ADD COLUMN brightness REAL")
+            self._db.executemany("UPDATE samples SET brightness = ? WHERE id = ?", updates)
+
+    def _never_reuse_ids(self):
+        """Rebuild the samples table of a store created without AUTOINCREMENT."""
+        sql = self._db.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'samples'").fetchone()[0]
+        if "AUTOINCREMENT" in sql:
+            return
+        with self._db:
+            self._db.execute("BEGIN")
+            for index in ("samples_timestamp", "samples_label_timestamp"):
+                self._db.execute(f"DROP INDEX {index}")
+            self._db.execute("ALTER TABLE samples RENAME TO samples_old")
+            self._db.execute(SAMPLES_TABLE)
+            for index in SAMPLES_INDEXES:
+                self._db.execute(index)
+            self._db.execute("INSERT INTO samples SELECT id, timestamp, camera, label, rationale, phash, segment, "
+                             "offset, length, brightness FROM samples_old")
+            self._db.execute("DROP TABLE samples_old")
+            # Ids of samples already dropped as duplicates aren't handed out again either
+            self._db.execute("DELETE FROM sqlite_sequence WHERE name = 'samples'")
+            self._db.execute(
+                "INSERT INTO sqlite_sequence (name, seq) SELECT 'samples', MAX(COALESCE(MAX(s.id), 0), "
+                "COALESCE((SELECT MAX(sample_id) FROM duplicates), 0)) FROM samples s"
+            )
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.root / SEGMENTS_DIR / f"segment_{segment:06d}.bin"
+
+    def append(self, image_bytes: bytes, is_open: bool, rationale: str = "", camera: str = "",
+               timestamp: float | None = None) -> int | None:
+        """Add one frame. Returns its sample id (None if skipped as a near-duplicate)."""
+        return self.append_many([Frame(image_bytes, is_open, rationale, camera, timestamp)])[0]
+
+    def _open_segment(self):
+        """The segment file to append to, rolling over to a new one when full."""
+        if self._segment_file is None:
+            self._segment_file = open(self._segment_path(self._segment), "ab")
+        if self._segment_file.tell() >= self.segment_max_bytes:
+            self._sync_segment()
+            self._segment_file.close()
+            self._segment += 1
+            self._segment_file = open(self._segment_path(self._segment), "ab")
+        return self._segment_file
+
+    def _sync_segment(self):
+        self._segment_file.flush()
+        os.fsync(self._segment_file.fileno())
+
+    def _dedup_indexes(self) -> dict[tuple[str, int], HashIndex]:
+        if self._indexes is None:
+            self._indexes = {}
+            rows = self._db.execute("SELECT id, label, phash, brightness FROM samples ORDER BY id")
+            for sample_id, label, phash, brightness in rows:
+                if not is_featureless(int(phash, 16)):
+                    self._dedup_index(label, brightness).add(int(phash, 16), [sample_id])
+        return self._indexes
+
+    def _dedup_index(self, label: str, brightness: float) -> HashIndex:
+        key = dedup_key(label, brightness)
+        if key not in self._indexes:
+            self._indexes[key] = HashIndex(self.dedup_distance)
+        return self._indexes[key]
+
+    def append_many(self, frames: list[Frame]) -> list[int | None]:
+        """Add a batch of frames durably. Returns their sample ids (None for skipped near-duplicates).
+
+        The blobs are written and fsynced before the index rows that point at
+        them are committed (in one transaction), so a batch costs two fsyncs
+        however many frames it holds.
+        """
+        prepared = []
+        for frame in frames:
+            timestamp = frame.timestamp if frame.timestamp is not None else datetime.now().timestamp()
+            phash = dhash(frame.image_bytes)
+            brightness = mean_brightness(frame.image_bytes)
+            prepared.append((frame, [timestamp, frame.camera, label_for(frame.is_open), frame.rationale,
+                                     f"{phash:032x}"], phash, brightness))
+        with self._lock:
+            dedup = self.dedup_distance is not None
+            if dedup:
+                self._dedup_indexes()
+            # [sample id] per stored frame, filled in on insert (the indexes hold the same lists)
+            refs: list[list | None] = [None] * len(frames)
+            kept, duplicates = [], []
+            for i, (frame, row, phash, brightness) in enumerate(prepared):
+                index = self._dedup_index(row[2], brightness) if dedup and not is_featureless(phash) else None
+                match = index.find(phash) if index is not None else None
+                if match is not None:
+                    distance, representative = match
+                    duplicates.append((row, representative, distance))
+                    continue
+                segment_file = self._open_segment()
+                row += [self._segment, segment_file.tell(), len(frame.image_bytes), brightness]
+                segment_file.write(frame.image_bytes)
+                refs[i] = [None]
+                kept.append((row, refs[i]))
+                if index is not None:
+                    index.add(phash, refs[i])
+            if kept:
+                self._sync_segment()
+            try:
+                with self._db:
+                    for row, ref in kept:
+                        ref[0] = self._db.execute(
+                            "INSERT INTO samples (timestamp, camera, label, rationale, phash, segment, offset, length, "
+                            "brightness) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row,
+                        ).lastrowid
+                    for row, representative, distance in duplicates:
+                        self._db.execute(
+                            "INSERT INTO duplicates (timestamp, camera, label, rationale, phash, representative_id, distance) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)", row + [representative[0], distance],
+                        )
+            except Exception:
+                self._indexes = None  # may hold frames whose rows were rolled back
+                raise
+        return [ref[0] if ref is not None else None for ref in refs]
+
+    def dedup(self, max_distance: int) -> tuple[int, int]:
+        """Drop stored near-duplicates, keeping the earliest sample of each cluster.
+
+        Same rules as on append: same label and brightness band, and
+        featureless frames are all kept.
+
+        Dropped samples move to the duplicates table along with the sample
+        they duplicate; compact() reclaims their segment space.
+        Returns (kept, dropped).
+        """
+        indexes: dict[tuple[str, int], HashIndex] = {}
+        dropped = []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, timestamp, camera, label, rationale, phash, brightness FROM samples ORDER BY timestamp, id"
+            ).fetchall()
+            for *row, brightness in rows:
+                phash = int(row[5], 16)
+                if is_featureless(phash):
+                    continue
+                key = dedup_key(row[3], brightness)
+                if key not in indexes:
+                    indexes[key] = HashIndex(max_distance)
+                index = indexes[key]
+                match = index.find(phash)
+                if match is None:
+                    index.add(phash, row[0])
+                else:
+                    dropped.append((row, match))
+            with self._db:
+                for row, (distance, representative_id) in dropped:
+                    self._db.execute(
+                        "INSERT INTO duplicates (sample_id, timestamp, camera, label, rationale, phash, "
+                        "representative_id, distance) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (*row, representative_id, distance),
+                    )
+                    self._db.execute("DELETE FROM samples WHERE id = ?", (row[0],))
+            self._indexes = None
+        return len(rows) - len(dropped), len(dropped)
+
+    def compact(self) -> int:
+        """Rewrite the segments to hold only stored samples. Returns the bytes freed.
+
+        Not safe while another process is appending to this store.
+        """
+        with self._lock:
+            old_segments = sorted((self.root / SEGMENTS_DIR).glob("segment_*.bin"))
+            size_before = sum(path.stat().st_size for path in old_segments)
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
+            self._segment = max((int(path.stem.split("_")[1]) for path in old_segments), default=0) + 1
+
+            rows = self._db.execute("SELECT id, segment, offset, length FROM samples ORDER BY id").fetchall()
+            updates = []
+            for sample_id, segment, offset, length in rows:
+                with open(self._segment_path(segment), "rb") as f:
+                    f.seek(offset)
+                    data = f.read(length)
+                segment_file = self._open_segment()
+                updates.append((self._segment, segment_file.tell(), sample_id))
+                segment_file.write(data)
+            if updates:
+                self._sync_segment()
+            with self._db:
+                self._db.executemany("UPDATE samples SET segment = ?, offset = ? WHERE id = ?", updates)
+            for path in old_segments:
+                path.unlink()
+            size_after = sum(path.stat().st_size for path in (self.root / SEGMENTS_DIR).glob("segment_*.bin"))
+        return size_before - size_after
+
+    def query(self, since: float | None = None, until: float | None = None, label: str | None = None,
+              camera: str | None = None, after_id: int | None = None, limit: int | None = None) -> list[Sample]:
+        """Samples in timestamp order, filtered by time range [since, until), label, camera
+        and id (after_id: only samples added after that one, as ids only grow)."""
+        clauses, params = [], []
+        for clause, value in (("timestamp >= ?", since), ("timestamp < ?", until),
+                              ("label = ?", label), ("camera = ?", camera), ("id > ?", after_id)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        sql = "SELECT id, timestamp, camera, label, rationale, phash, segment, offset, length FROM samples"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        return [Sample(*row) for row in rows]
+
+    def counts(self) -> dict[str, int]:
+        """Number of samples per label."""
+        with self._lock:
+            rows = self._db.execute("SELECT label, COUNT(*) FROM samples GROUP BY label").fetchall()
+        return {label: 0 for label in LABELS} | dict(rows)
+
+    def duplicate_count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM duplicates").fetchone()[0]
+
+    def read_image(self, sample: Sample) -> bytes:
+        with open(self._segment_path(sample.segment), "rb") as f:
+            f.seek(sample.offset)
+            return f.read(sample.length)
+
+    def export(self, out_dir: Path, **filters) -> int:
+        """Write matching samples as door_open/ and door_closed/ JPEG files. Returns the count."""
+        for label in LABELS:
+            (out_dir / label).mkdir(parents=True, exist_ok=True)
+        samples = self.query(**filters)
+        for sample in samples:
+            (out_dir / sample.label / sample.filename()).write_bytes(self.read_image(sample))
+        return len(samples)
+
+    def import_tree(self, tree_dir: Path, camera: str = "") -> int:
+        """Move loose door_open/ and door_closed/ JPEGs into the store. Returns the count.
+
+        Timestamps come from the file modification times. Each file is deleted
+        once it's in the store, so an interrupted import can just be rerun.
+        """
+        paths = [path for label in LABELS for path in sorted((tree_dir / label).glob("*.jpg"))]
+        paths.sort(key=lambda path: path.stat().st_mtime)  # oldest first, so it's kept over its duplicates
+        for start in range(0, len(paths), IMPORT_BATCH_SIZE):
+            batch = paths[start:start + IMPORT_BATCH_SIZE]
+            self.append_many([
+                Frame(path.read_bytes(), path.parent.name == OPEN_LABEL, camera=camera, timestamp=path.stat().st_mtime)
+                for path in batch
+            ])
+            for path in batch:
+                path.unlink()
+        return len(paths)
+
+    def close(self):
+        with self._lock:
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
+            self._db.close()
+
+
+def iter_labelled_images(dataset_dir: Path = DATASET_DIR) -> Iterator[tuple[str, str, bytes]]:
+    """Yield (name, label, image_bytes) for every frame in a dataset directory:
+    the store's samples, then any legacy loose JPEGs in door_open/ and door_closed/."""
+    dataset_dir = Path(dataset_dir)
+    if (dataset_dir / INDEX_NAME).exists():
+        store = DatasetStore(dataset_dir)
+        try:
+            for sample in store.query():
+                yield f"sample {sample.id}", sample.label, store.read_image(sample)
+        finally:
+            store.close()
+    for label in LABELS:
+        for image_path in sorted((dataset_dir / label).glob("*.jpg")):
+            yield str(image_path), label, image_path.read_bytes()
+
+
+def parse_time(value: str | None) -> float | None:
+    """ISO date/time in LOCAL_TIMEZONE -> unix seconds."""
+    if value is None:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=ZoneInfo(config.LOCAL_TIMEZONE))
+    return parsed.timestamp()
+
+
+def cmd_stats(args):
+    store = DatasetStore(Path(args.dataset))
+    counts = store.counts()
+    samples = store.query()
+    print(f"{sum(counts.values())} samples in {args.dataset}: "
+          + ", ".join(f"{count} {label}" for label, count in counts.items())
+          + f" ({store.duplicate_count()} near-duplicates dropped)")
+    if samples:
+        print(f"From {samples[0].local_time():%Y-%m-%d %H:%M} to {samples[-1].local_time():%Y-%m-%d %H:%M}")
+    store.close()
+    return 0
+
+
+def cmd_export(args):
+    store = DatasetStore(Path(args.dataset))
+    count = store.export(Path(args.out_dir), since=parse_time(args.since), until=parse_time(args.until),
+                         label=args.label)
+    print(f"Exported {count} images to {args.out_dir}")
+    store.close()
+    return 0
+
+
+def cmd_import(args):
+    store = DatasetStore(Path(args.dataset))
+    count = store.import_tree(Path(args.dataset), camera=args.camera or "")
+    print(f"Imported {count} loose images into the store in {args.dataset}")
+    store.close()
+    return 0
+
+
+def cmd_dedup(args):
+    store = DatasetStore(Path(args.dataset))
+    kept, dropped = store.dedup(args.distance)
+    print(f"Kept {kept} samples, dropped {dropped} near-duplicates (run 'compact' to reclaim their space)")
+    store.close()
+    return 0
+
+
+def cmd_compact(args):
+    store = DatasetStore(Path(args.dataset))
+    freed = store.compact()
+    print(f"Compacted {args.dataset}, freed {freed / 1e6:.1f} MB")
+    store.close()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dataset", default=str(DATASET_DIR))
+    parser.add_argument("--camera", help="use this camera's dataset directory from config.CAMERAS")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_stats = sub.add_parser("stats", help="Show sample counts and time range")
+    p_stats.set_defaults(func=cmd_stats)
+
+    p_export = sub.add_parser("export", help="Export to a door_open/door_closed directory tree")
+    p_export.add_argument("out_dir")
+    p_export.add_argument("--label", choices=LABELS)
+    p_export.add_argument("--since", help="ISO date/time (local timezone)")
+    p_export.add_argument("--until", help="ISO date/time (local timezone)")
+    p_export.set_defaults(func=cmd_export)
+
+    p_import = sub.add_parser("import", help="Move legacy loose JPEGs in the dataset directory into the store")
+    p_import.set_defaults(func=cmd_import)
+
+    p_dedup = sub.add_parser("dedup", help="Drop near-duplicate samples, keeping one per cluster")
+    p_dedup.add_argument("--distance", type=int, default=config.DATASET_DEDUP_MAX_DISTANCE or 0,
+                         help="max Hamming distance (bits of the 128-bit dHash) between duplicates")
+    p_dedup.set_defaults(func=cmd_dedup)
+
+    p_compact = sub.add_parser("compact", help="Reclaim space of dropped samples (stop the monitor first)")
+    p_compact.set_defaults(func=cmd_compact)
+
+    args = parser.parse_args()
+    if args.camera is not None:
+        args.dataset = str(get_camera(args.camera).dataset_dir)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
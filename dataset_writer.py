@@ -0,0 +1,116 @@
+"""
+Background, batched writer for the dataset store.
+
+Saving a frame only queues it; a writer thread appends queued frames to
+their dataset stores in batches (one fsync per batch rather than per frame),
+so slow storage (an SD card on a Pi) never delays a check or a notification.
+
+Backpressure: the queue is bounded. When the disk can't keep up and the
+queue is full, submit() waits up to `put_timeout` seconds for space and then
+drops the frame (losing a training image is better than stalling the
+monitor). close() drains everything queued before returning.
+"""
+import queue
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable
+
+import config
+import metrics
+from dataset_store import DatasetStore, Frame
+
+_STOP = object()
+
+
+class DatasetWriter:
+    """Appends submitted frames to dataset stores from a background thread."""
+
+    def __init__(self, get_store: Callable[[Path], DatasetStore],
+                 queue_size: int = config.DATASET_WRITER_QUEUE_SIZE,
+                 batch_size: int = config.DATASET_WRITER_BATCH_SIZE,
+                 flush_seconds: float = config.DATASET_WRITER_FLUSH_SECONDS,
+                 put_timeout: float = config.DATASET_WRITER_PUT_TIMEOUT):
+        self.get_store = get_store
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.put_timeout = put_timeout
+        self.written = 0
+        self.duplicates = 0  # near-duplicates the store skipped
+        self.dropped = 0
+        self.failed = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="dataset-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, dataset_dir: Path, frame: Frame) -> bool:
+        """Queue a frame for `dataset_dir`. Returns False if it was dropped (queue full)."""
+        self._ensure_started()
+        try:
+            self._queue.put((dataset_dir, frame), timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"Dataset writer queue full, dropping frame ({self.dropped} dropped so far)")
+            return False
+
+    def _next_batch(self) -> tuple[list, bool]:
+        """Wait for a first item, then up to flush_seconds for more. Returns (batch, stop)."""
+        item = self._queue.get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _write(self, batch: list[tuple[Path, Frame]]):
+        by_store = defaultdict(list)
+        for dataset_dir, frame in batch:
+            by_store[dataset_dir].append(frame)
+        for dataset_dir, frames in by_store.items():
+            try:
+                with metrics.STAGE_SECONDS.time(stage="dataset_save"):
+                    ids = self.get_store(dataset_dir).append_many(frames)
+                saved = sum(sample_id is not None for sample_id in ids)
+                self.written += saved
+                self.duplicates += len(frames) - saved
+                skipped = f", skipped {len(frames) - saved} near-duplicate(s)" if saved < len(frames) else ""
+                print(f"Saved {saved} image(s) to {dataset_dir}{skipped}")
+            except Exception as e:
+                self.failed += len(frames)
+                print(f"Failed to save {len(frames)} image(s) to {dataset_dir}: {e}")
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = self._next_batch()
+            if batch:
+                self._write(batch)
+
+    def close(self, timeout: float | None = 30):
+        """Write everything queued so far, then stop the thread."""
+        if self._thread is None:
+            return
+        pending = self._queue.qsize()
+        if pending:
+            print(f"Writing {pending} queued dataset image(s)...")
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print("Dataset writer did not finish in time, some images may not have been saved")
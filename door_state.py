@@ -0,0 +1,67 @@
+"""
+Debounced door state machine for continuous monitoring.
+
+Per-frame classifications are noisy (a car's headlights, someone walking
+past, a low-confidence local answer), so like the presence monitor's
+`people_state` the door only changes state after `debounce` consecutive
+readings disagree with it. Each update returns the event to alert on, if
+any: the door opened or closed, or it has been open for longer than
+`open_alert_seconds` (repeated every `open_realert_seconds` while it stays
+open).
+
+Holds a few numbers per camera, so memory stays flat however long it runs.
+"""
+import config
+
+OPENED = "opened"
+CLOSED = "closed"
+OPEN_TOO_LONG = "open_too_long"
+
+
+class DoorStateMachine:
+    """Debounced open/closed state from a stream of readings."""
+
+    def __init__(self, debounce: int = config.CONTINUOUS_DEBOUNCE,
+                 open_alert_seconds: float = config.CONTINUOUS_OPEN_ALERT_SECONDS,
+                 open_realert_seconds: float = config.CONTINUOUS_OPEN_REALERT_SECONDS):
+        self.debounce = debounce
+        self.open_alert_seconds = open_alert_seconds
+        self.open_realert_seconds = open_realert_seconds
+        self.is_open: bool | None = None  # unknown until `debounce` consistent readings
+        self.candidate: bool | None = None  # the reading being counted towards a change
+        self.counter = 0
+        self.last_changed: float | None = None
+        self.last_open_alert: float | None = None
+
+    def open_for(self, now: float) -> float:
+        """Seconds the door has been open (0 if it isn't)."""
+        if not self.is_open or self.last_changed is None:
+            return 0.0
+        return now - self.last_changed
+
+    def update(self, is_open: bool, now: float) -> str | None:
+        """Feed a reading taken at `now` (monotonic seconds). Returns the event, or None."""
+        if is_open == self.is_open:
+            # reset counter
+            self.candidate = None
+            self.counter = 0
+            if (is_open and self.open_for(now) >= self.open_alert_seconds
+                    and (self.last_open_alert is None or now - self.last_open_alert >= self.open_realert_seconds)):
+                self.last_open_alert = now
+                return OPEN_TOO_LONG
+            return None
+
+        if is_open != self.candidate:
+            # only consecutive equal readings count (while the state is unknown they can differ)
+            self.candidate = is_open
+            self.counter = 0
+        self.counter += 1
+        if self.counter < self.debounce:
+            return None
+        # flip state
+        self.is_open = is_open
+        self.candidate = None
+        self.counter = 0
+        self.last_changed = now
+        self.last_open_alert = None
+        return OPENED if is_open else CLOSED
@@ -0,0 +1,137 @@
+"""
+Batched Gemini classification.
+
+Door checks that come due together (several cameras) are collected for a
+short window and sent to Gemini as one request with a list-of-results
+response schema. The window closes early once every camera has a frame
+queued, and isn't used at all with a single camera. Each caller blocks
+until its own result comes back, so from the caller's side it behaves like
+a single call.
+
+Only one caller per batch (the first to get a result) "pays" for the
+request, so the API budget is charged once per Gemini call rather than
+once per frame.
+"""
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+from google.genai import types
+
+import config
+import transport
+
+
+@dataclass
+class _Request:
+    image_bytes: bytes
+    future: Future = field(default_factory=Future)
+
+
+class GeminiBatcher:
+    """Collects frames from concurrent callers and classifies them in one request."""
+
+    def __init__(self, schema, query: str, batch_query: str,
+                 model: str = config.GEMINI_MODEL,
+                 window_seconds: float = config.GEMINI_BATCH_WINDOW_SECONDS,
+                 max_batch: int = config.GEMINI_BATCH_MAX_FRAMES,
+                 callers: int | None = None):
+        """`callers` is how many frames can be pending at once (one per camera), if known."""
+        self.schema = schema
+        self.query = query
+        self.batch_query = batch_query
+        self.model = model
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch if callers is None else max(1, min(max_batch, callers))
+        self.calls = 0  # requests sent, failed ones included (they use quota too)
+        self.errors = 0  # requests that failed
+        self.frames = 0
+        self._pending: list[_Request] = []
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+
+    def classify(self, image_bytes: bytes):
+        """Classify one frame. Blocks until its batch returns.
+
+        Returns (result, paid): `paid` is True for exactly one caller per
+        Gemini request, which should record the API call. Raises whatever
+        the Gemini request raised.
+        """
+        request = _Request(image_bytes)
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="gemini-batcher", daemon=True)
+                self._thread.start()
+            self._pending.append(request)
+            self._cond.notify()
+        return request.future.result()
+
+    def _next_batch(self) -> list[_Request]:
+        """Wait for a first frame, then up to the window for more (until the batch is full)."""
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+            deadline = time.monotonic() + self.window_seconds
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                results = self._generate([request.image_bytes for request in batch])
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+            paid = True
+            for request, result in zip(batch, results):
+                if result is None:
+                    request.future.set_exception(ValueError("Gemini returned no result for this photo"))
+                    continue
+                request.future.set_result((result, paid))
+                paid = False
+
+    def _generate(self, images: list[bytes]) -> list:
+        """Send one Gemini request covering all images, return one result per image."""
+        parts = [types.Part.from_bytes(data=image, mime_type="image/jpeg") for image in images]
+        client = transport.get_gemini_client()
+        if len(images) == 1:
+            contents = [self.query, parts[0]]
+            schema = self.schema
+        else:
+            print(f"Classifying {len(images)} frames in one Gemini request")
+            contents = [self.batch_query]
+            for i, part in enumerate(parts, start=1):
+                contents += [f"Photo {i}:", part]
+            schema = list[self.schema]
+
+        self.calls += 1
+        self.frames += len(images)
+        try:
+            response = client.models.generate_content(
+                model=self.model,
+                contents=contents,
+                config={
+                    "response_mime_type": "application/json",
+                    "response_schema": schema,
+                }
+            )
+            # Access the parsed Pydantic object(s) directly
+            parsed = response.parsed
+            if parsed is None:
+                raise ValueError(f"Failed to parse gemini response: {response}")
+            results = [parsed] if len(images) == 1 else list(parsed)
+            if len(results) != len(images):
+                raise ValueError(f"Gemini returned {len(results)} results for {len(images)} photos")
+        except Exception:
+            self.errors += 1
+            raise
+        return results
@@ -0,0 +1,49 @@
+"""
+Multi-index hashing for finding near-duplicate perceptual hashes.
+
+Two hashes within `max_distance` bits of each other must agree exactly on
+at least one of `max_distance + 1` disjoint chunks of their bits
+(pigeonhole). So every hash is filed under each of its chunk values, and a
+lookup only compares against hashes sharing a chunk with the key, instead
+of against every stored hash. Lookups stay fast with hundreds of thousands
+of stored hashes.
+"""
+from collections import defaultdict
+from typing import Any
+
+from image_features import hamming_distance
+
+
+class HashIndex:
+    """Maps integer hashes to values; finds the nearest stored hash within max_distance."""
+
+    def __init__(self, max_distance: int, hash_bits: int = 128):
+        self.max_distance = max_distance
+        num_chunks = max_distance + 1
+        bounds = [hash_bits * i // num_chunks for i in range(num_chunks + 1)]
+        # (shift, mask) per chunk
+        self._chunks = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(bounds, bounds[1:])]
+        # one table per chunk: chunk value -> [(hash, value)]
+        self._tables: list[defaultdict[int, list]] = [defaultdict(list) for _ in self._chunks]
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, key: int, value: Any):
+        entry = (key, value)
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            table[(key >> shift) & mask].append(entry)
+        self._size += 1
+
+    def find(self, key: int) -> tuple[int, Any] | None:
+        """The (distance, value) of the nearest stored hash within max_distance, or None."""
+        best = None
+        for table, (shift, mask) in zip(self._tables, self._chunks):
+            for stored, value in table.get((key >> shift) & mask, ()):
+                distance = hamming_distance(key, stored)
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, value)
+                    if distance == 0:
+                        return best
+        return best
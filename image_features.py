@@ -0,0 +1,75 @@
+"""
+Cheap image features shared by the local classifier and frame processing.
+
+Everything here works on raw JPEG bytes as returned by the camera, and only
+needs Pillow + NumPy so it runs fine on a CPU-only Raspberry Pi.
+"""
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+# Size of the downscaled grayscale thumbnail used as the feature base
+FEATURE_SIZE = (32, 24)
+HISTOGRAM_BINS = 16
+
+
+def grayscale_array(image_bytes: bytes, size: tuple[int, int] = FEATURE_SIZE) -> np.ndarray:
+    """Decode JPEG bytes into a small float32 grayscale array scaled to [0, 1].
+
+    `size` is (width, height); the returned array has shape (height, width).
+    """
+    with Image.open(BytesIO(image_bytes)) as img:
+        # draft() lets the JPEG decoder skip most of the work when downscaling
+        img.draft("L", (size[0] * 2, size[1] * 2))
+        small = img.convert("L").resize(size, Image.Resampling.BILINEAR)
+    return np.asarray(small, dtype=np.float32) / 255.0
+
+
+def feature_vector(image_bytes: bytes) -> np.ndarray:
+    """Build the feature vector used by the local door classifier.
+
+    Concatenates the downscaled grayscale pixels, a brightness histogram and
+    a few global statistics (mean/std brightness).
+    """
+    gray = grayscale_array(image_bytes)
+    hist, _ = np.histogram(gray, bins=HISTOGRAM_BINS, range=(0.0, 1.0))
+    hist = hist.astype(np.float32) / gray.size
+    stats = np.array([gray.mean(), gray.std()], dtype=np.float32)
+    return np.concatenate([gray.ravel(), hist, stats])
+
+
+def dhash(image_bytes: bytes, hash_size: int = 8, min_gradient: float = 0.1,
+          min_contrast: float = 0.02) -> int:
+    """Difference hash (dHash) of an image as a (2 * hash_size**2)-bit integer.
+
+    Each pixel is compared with its right-hand neighbour, with one bit for
+    "brighter" and one for "darker". The thumbnail is first stretched to its
+    own min/max, so a dim night frame hashes like the same scene by day
+    instead of collapsing to near zero. Gradients smaller than
+    `min_gradient` (a fraction of that range) set neither bit, so sensor
+    noise doesn't flip bits. A frame whose range is below `min_contrast`
+    has no usable structure and hashes to 0 (see is_featureless).
+    """
+    gray = grayscale_array(image_bytes, (hash_size + 1, hash_size))
+    low, high = float(gray.min()), float(gray.max())
+    if high - low < min_contrast:
+        return 0
+    gradient = np.diff((gray - low) / (high - low), axis=1)
+    bits = np.concatenate([(gradient > min_gradient).ravel(), (gradient < -min_gradient).ravel()])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def mean_brightness(image_bytes: bytes) -> float:
+    """Mean brightness of an image in [0, 1]."""
+    return float(grayscale_array(image_bytes).mean())
+
+
+def is_featureless(image_hash: int, min_bits: int = 6) -> bool:
+    """True if a dhash has too few bits set to tell scenes apart (e.g. a black frame)."""
+    return image_hash.bit_count() < min_bits
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return (a ^ b).bit_count()
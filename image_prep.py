@@ -0,0 +1,38 @@
+"""
+Re-encoded image payloads for uploads.
+
+The camera's full-resolution JPEG is only needed for the dataset. Gemini
+gets a downscaled, quality-tuned copy (fewer upload bytes and image tokens)
+and ntfy gets a small thumbnail, both sized in config.py.
+"""
+from io import BytesIO
+
+from PIL import Image
+
+import config
+
+
+def resize_jpeg(image_bytes: bytes, max_size: int, quality: int) -> bytes:
+    """Downscale so the longest side is at most max_size and re-encode as JPEG.
+
+    Returns the original bytes if that wouldn't make the payload smaller.
+    """
+    with Image.open(BytesIO(image_bytes)) as img:
+        # draft() lets the JPEG decoder downscale while decoding (much cheaper)
+        img.draft("RGB", (max_size, max_size))
+        small = img.convert("RGB")
+    small.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    out = BytesIO()
+    small.save(out, format="JPEG", quality=quality, optimize=True)
+    data = out.getvalue()
+    return data if len(data) < len(image_bytes) else image_bytes
+
+
+def prepare_model_image(image_bytes: bytes) -> bytes:
+    """Payload sent to Gemini."""
+    return resize_jpeg(image_bytes, config.MODEL_IMAGE_MAX_SIZE, config.MODEL_IMAGE_QUALITY)
+
+
+def make_thumbnail(image_bytes: bytes) -> bytes:
+    """Payload attached to ntfy notifications."""
+    return resize_jpeg(image_bytes, config.NOTIFY_THUMBNAIL_MAX_SIZE, config.NOTIFY_THUMBNAIL_QUALITY)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Local, CPU-only door classifier trained from the saved dataset.
+
+main.py saves every Gemini-classified frame into the dataset store in
+`dataset/` (see dataset_store.py). This module trains a small logistic regression on
+Pillow/NumPy features of those images, so most checks can be answered
+locally in milliseconds. Gemini is only called when the local model is not
+confident enough (see LOCAL_CONFIDENCE_THRESHOLD in config.py).
+
+The model is only saved if it does well enough on held-out images (see
+LOCAL_MODEL_MIN_PER_CLASS and LOCAL_MODEL_MIN_ACCURACY). A bad model would
+skip Gemini with confident wrong answers, and since only Gemini-labelled
+frames are added to the dataset, it would also stop new training data from
+arriving.
+
+Usage:
+    uv run local_classifier.py train            # train from dataset/, write model
+    uv run local_classifier.py train --camera side_gate  # another camera's dataset/model
+    uv run local_classifier.py predict img.jpg  # classify a single image
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import config
+from cameras import get_camera
+from dataset_store import OPEN_LABEL, iter_labelled_images
+from image_features import feature_vector
+
+SCRIPT_DIR = Path(__file__).parent
+DATASET_DIR = SCRIPT_DIR / "dataset"
+MODEL_PATH = SCRIPT_DIR / config.LOCAL_MODEL_PATH
+
+class LocalDoorClassifier:
+    """Logistic regression on standardized image features."""
+
+    def __init__(self, mean: np.ndarray, std: np.ndarray, weights: np.ndarray, bias: float):
+        self.mean = mean
+        self.std = std
+        self.weights = weights
+        self.bias = bias
+
+    def _probability_open(self, features: np.ndarray) -> np.ndarray:
+        z = ((features - self.mean) / self.std) @ self.weights + self.bias
+        return 1.0 / (1.0 + np.exp(-z))
+
+    def predict(self, image_bytes: bytes) -> tuple[bool, float]:
+        """Classify an image. Returns (is_open, confidence in [0.5, 1])."""
+        p_open = float(self._probability_open(feature_vector(image_bytes)))
+        is_open = p_open >= 0.5
+        confidence = p_open if is_open else 1.0 - p_open
+        return is_open, confidence
+
+    def save(self, path: Path):
+        np.savez(path, mean=self.mean, std=self.std, weights=self.weights, bias=np.float32(self.bias))
+
+    @classmethod
+    def load(cls, path: Path) -> "LocalDoorClassifier":
+        with np.load(path) as data:
+            return cls(data["mean"], data["std"], data["weights"], float(data["bias"]))
+
+
+def load_model(path: Path = MODEL_PATH) -> LocalDoorClassifier | None:
+    """Load the trained model, or return None if it hasn't been trained yet."""
+    if not path.exists():
+        return None
+    try:
+        return LocalDoorClassifier.load(path)
+    except Exception as e:
+        print(f"Failed to load local model from {path}: {e}")
+        return None
+
+
+def load_dataset(dataset_dir: Path = DATASET_DIR) -> tuple[np.ndarray, np.ndarray]:
+    """Load feature matrix X and label vector y (1 = open) from the dataset directory."""
+    features = []
+    labels = []
+    for name, label, image_bytes in iter_labelled_images(dataset_dir):
+        try:
+            features.append(feature_vector(image_bytes))
+        except Exception as e:
+            print(f"Skipping unreadable image {name}: {e}")
+            continue
+        labels.append(1 if label == OPEN_LABEL else 0)
+    if not features:
+        return np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=np.float32)
+    return np.stack(features), np.array(labels, dtype=np.float32)
+
+
+def train(X: np.ndarray, y: np.ndarray, epochs: int = 500, learning_rate: float = 0.1,
+          l2: float = 1e-3) -> LocalDoorClassifier:
+    """Fit logistic regression with batch gradient descent."""
+    mean = X.mean(axis=0)
+    std = X.std(axis=0) + 1e-6
+    Xs = (X - mean) / std
+
+    # Weight classes so a mostly-closed dataset doesn't swamp the open examples
+    n_open = max(y.sum(), 1.0)
+    n_closed = max(len(y) - y.sum(), 1.0)
+    sample_weight = np.where(y == 1, len(y) / (2 * n_open), len(y) / (2 * n_closed))
+
+    weights = np.zeros(X.shape[1], dtype=np.float32)
+    bias = 0.0
+    for _ in range(epochs):
+        p = 1.0 / (1.0 + np.exp(-(Xs @ weights + bias)))
+        error = (p - y) * sample_weight
+        weights -= learning_rate * (Xs.T @ error / len(y) + l2 * weights)
+        bias -= learning_rate * float(error.mean())
+    return LocalDoorClassifier(mean, std, weights, bias)
+
+
+def accuracy(model: LocalDoorClassifier, X: np.ndarray, y: np.ndarray) -> float:
+    predictions = model._probability_open(X) >= 0.5
+    return float((predictions == (y == 1)).mean())
+
+
+def holdout_accuracy(X: np.ndarray, y: np.ndarray,
+                     threshold: float = config.LOCAL_CONFIDENCE_THRESHOLD) -> tuple[float, float, float]:
+    """Train without every 5th image and test on those.
+
+    Returns (accuracy, accuracy of the answers at least `threshold` confident,
+    fraction of answers that confident). The confident answers are the ones
+    main.py uses instead of asking Gemini.
+    """
+    holdout = np.arange(len(y)) % 5 == 0
+    model = train(X[~holdout], y[~holdout])
+    p_open = model._probability_open(X[holdout])
+    correct = (p_open >= 0.5) == (y[holdout] == 1)
+    confident = np.maximum(p_open, 1.0 - p_open) >= threshold
+    confident_accuracy = float(correct[confident].mean()) if confident.any() else 1.0
+    return float(correct.mean()), confident_accuracy, float(confident.mean())
+
+
+def quality_problem(X: np.ndarray, y: np.ndarray,
+                    min_per_class: int = config.LOCAL_MODEL_MIN_PER_CLASS,
+                    min_accuracy: float = config.LOCAL_MODEL_MIN_ACCURACY) -> str | None:
+    """Why a model trained on this data shouldn't be used, or None if it is good enough."""
+    n_open = int(y.sum())
+    n_closed = len(y) - n_open
+    if min(n_open, n_closed) < min_per_class:
+        return f"need at least {min_per_class} images of each class (found {n_open} open, {n_closed} closed)"
+    overall, confident, confident_fraction = holdout_accuracy(X, y)
+    print(f"Hold-out accuracy: {overall:.3f} ({confident:.3f} on the {confident_fraction:.0%} "
+          f"confident enough to skip Gemini)")
+    if overall < min_accuracy or confident < min_accuracy:
+        return f"hold-out accuracy is below {min_accuracy:.2f}"
+    return None
+
+
+def apply_camera(args):
+    """Point --dataset/--model/--output at a camera's paths from config.CAMERAS."""
+    if args.camera is None:
+        return
+    camera = get_camera(args.camera)
+    if hasattr(args, "dataset"):
+        args.dataset = str(camera.dataset_dir)
+    for attr in ("model", "output"):
+        if hasattr(args, attr):
+            setattr(args, attr, str(camera.model_path))
+
+
+def cmd_train(args):
+    X, y = load_dataset(Path(args.dataset))
+    if len(y) == 0 or y.min() == y.max():
+        print(f"Need images of both classes in {args.dataset} to train (found {len(y)} images)")
+        return 1
+    print(f"Loaded {len(y)} images ({int(y.sum())} open, {int(len(y) - y.sum())} closed)")
+
+    problem = quality_problem(X, y)
+    if problem is not None:
+        if not args.force:
+            print(f"Not saving the model: {problem} (--force to save anyway)")
+            return 1
+        print(f"Saving anyway (--force): {problem}")
+
+    model = train(X, y)
+    print(f"Training accuracy: {accuracy(model, X, y):.3f}")
+    model.save(Path(args.output))
+    print(f"Saved model to {args.output}")
+    return 0
+
+
+def cmd_predict(args):
+    model = load_model(Path(args.model))
+    if model is None:
+        print(f"No model found at {args.model}, run 'train' first")
+        return 1
+    for image in args.images:
+        is_open, confidence = model.predict(Path(image).read_bytes())
+        print(f"{image}: {'open' if is_open else 'closed'} (confidence {confidence:.3f})")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_train = sub.add_parser("train", help="Train the local model from the dataset directory")
+    p_train.add_argument("--dataset", default=str(DATASET_DIR))
+    p_train.add_argument("--output", default=str(MODEL_PATH))
+    p_train.add_argument("--camera", help="use this camera's dataset and model paths from config.CAMERAS")
+    p_train.add_argument("--force", action="store_true", help="save the model even if it fails the quality checks")
+    p_train.set_defaults(func=cmd_train)
+
+    p_predict = sub.add_parser("predict", help="Classify one or more images")
+    p_predict.add_argument("images", nargs="+")
+    p_predict.add_argument("--model", default=str(MODEL_PATH))
+    p_predict.add_argument("--camera", help="use this camera's model path from config.CAMERAS")
+    p_predict.set_defaults(func=cmd_predict)
+
+    args = parser.parse_args()
+    apply_camera(args)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,45 @@
 from pydantic import BaseModel
-from google import genai
-from google.genai import types
-import requests
 import sys
-import os
 from pathlib import Path
-from datetime import datetime, time
+from datetime import datetime, date, timedelta
 import time as time_module
-import subprocess
+import asyncio
+import signal
 from zoneinfo import ZoneInfo
+from functools import cache
+from typing import Callable
 import config
+import local_classifier
+import metrics
+from change_detector import ChangeDetector
+from result_cache import ResultCache
+import transport
+from presence_probe import probe_all
+from scheduler import CheckScheduler, night_cycle, night_check_times
+from monitor_engine import MonitorEngine, CheckResult
+from cameras import CameraConfig, load_cameras
+from gemini_batcher import GeminiBatcher
+from camera_stream import CameraStream
+from image_prep import prepare_model_image, make_thumbnail
+from retry import RetryPolicy, is_retryable_http_error, is_retryable_gemini_error
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from image_features import grayscale_array
+from state_store import StateStore
+from dataset_store import DatasetStore, Frame
+from dataset_writer import DatasetWriter
+from door_state import DoorStateMachine, CLOSED, OPEN_TOO_LONG
 
 
 # Check for test mode
 TEST_MODE = "--test" in sys.argv
+# Continuous mode: sample the cameras every few seconds instead of checking on presence/night events
+CONTINUOUS_MODE = "--continuous" in sys.argv
+# Run the presence monitor in this process (instead of presence_monitor.py) and take presence from it directly
+WITH_PRESENCE = "--with-presence" in sys.argv
 
 # All configuration values are in config.py (shared with presence monitor)
 # Import them for convenience
-NTFY_TOPIC = config.NTFY_TOPIC
-CAM_URL = config.CAM_URL
+NTFY_SERVER = config.NTFY_SERVER
 NOTIFY_WHEN_SHUT = config.NOTIFY_WHEN_SHUT
 LOCAL_TIMEZONE = config.LOCAL_TIMEZONE
 PHONE_IPS = config.PHONE_IPS
@@ -26,11 +47,37 @@ DAYTIME_START = config.DAYTIME_START
 DAYTIME_END = config.DAYTIME_END
 CHECK_INTERVAL_SECONDS = config.CHECK_INTERVAL_SECONDS
 MAX_API_CALLS_PER_DAY = config.MAX_API_CALLS_PER_DAY
+API_RECHECK_HEADROOM = config.API_RECHECK_HEADROOM
 NIGHT_CHECK_HOURS = config.NIGHT_CHECK_HOURS
+CONTINUOUS_SAMPLE_SECONDS = config.CONTINUOUS_SAMPLE_SECONDS
+CAMERA_WORKERS = config.CAMERA_WORKERS
 PRESENCE_API_PORT = config.PRESENCE_API_PORT
-MAX_RETRIES = config.MAX_RETRIES
-RETRY_INTERVAL_SECONDS = config.RETRY_INTERVAL_SECONDS
+PRESENCE_LONGPOLL_SECONDS = config.PRESENCE_LONGPOLL_SECONDS
+METRICS_PORT = config.METRICS_PORT
+RETRY_REFETCH_AFTER_SECONDS = config.RETRY_REFETCH_AFTER_SECONDS
+DEGRADED_NIGHT_OPEN_BRIGHTNESS = config.DEGRADED_NIGHT_OPEN_BRIGHTNESS
+LOCAL_CONFIDENCE_THRESHOLD = config.LOCAL_CONFIDENCE_THRESHOLD
 QUERY = config.QUERY
+BATCH_QUERY = config.BATCH_QUERY
+
+# Retry policies per dependency (see retry.py)
+CAMERA_RETRY = RetryPolicy("Camera", is_retryable_http_error, **config.CAMERA_RETRY)
+GEMINI_RETRY = RetryPolicy("Gemini", is_retryable_gemini_error, **config.GEMINI_RETRY)
+NTFY_RETRY = RetryPolicy("ntfy", is_retryable_http_error, **config.NTFY_RETRY)
+
+# Shared by all cameras, like the Gemini batcher
+GEMINI_BREAKER = CircuitBreaker("Gemini", config.GEMINI_BREAKER_FAILURE_THRESHOLD,
+                                config.GEMINI_BREAKER_RESET_SECONDS)
+
+# A night check stays due for this long after its scheduled time
+NIGHT_CHECK_GRACE = timedelta(hours=1)
+
+# Metrics served on METRICS_PORT (see metrics.py); scrape-time ones are added by register_metrics()
+STAGE_SECONDS = metrics.STAGE_SECONDS
+API_CALLS = metrics.counter("garage_api_calls_total", "Gemini calls charged to the API budget", ("camera",))
+CHECKS = metrics.counter("garage_checks_total",
+                         "Door checks by how they were answered (unchanged and cache are cache hits)",
+                         ("camera", "source"))
 
 def get_local_time() -> datetime:
     """Get current time in the configured local timezone."""
@@ -40,62 +87,173 @@ class DoorStatus(BaseModel):
     is_open: bool
     rationale: str
 
+# API call priority classes, highest first (see ApiRateLimiter)
+NIGHT = "night"            # scheduled night checks, may use the night reserve
+TRANSITION = "transition"  # home -> out checks
+RECHECK = "recheck"        # anything else, must also leave API_RECHECK_HEADROOM spare
+
 class ApiRateLimiter:
-    """Manages API call timing and daily limits."""
+    """Manages the API call budget over a rolling 24 hour window.
+
+    Each call uses one unit of quota, which comes back 24 hours after the
+    call was made, rather than all at once at midnight (so the budget can't
+    be spent twice around midnight, and a busy morning doesn't lock out the
+    evening for the rest of the calendar day).
+
+    Calls have priority classes: `reserve()` returns how many calls to keep
+    back for scheduled night checks, which only NIGHT priority may use, and
+    RECHECK priority must leave a further `recheck_headroom` calls.
+
+    With a `store`, call times are kept under `key` and updated in a SQLite
+    transaction, so they survive restarts and processes using the same
+    database and key share one budget.
+
+    `clock` returns the current local time (a simulated clock in simulate.py).
+    """
+
+    WINDOW_SECONDS = 24 * 3600
     
-    def __init__(self, max_calls_per_day: int):
+    def __init__(self, max_calls_per_day: int, store: StateStore | None = None, key: str = "api_limiter",
+                 reserve: Callable[[], int] = lambda: 0, recheck_headroom: int = 0,
+                 clock: Callable[[], datetime] = get_local_time):
         self.max_calls_per_day = max_calls_per_day
-        self.api_calls_today: int = 0
-        self.current_day: int | None = None
-    
-    def _reset_if_new_day(self):
-        """Reset daily counter if it's a new day."""
-        today = get_local_time().day
-        if self.current_day != today:
-            self.current_day = today
-            self.api_calls_today = 0
-            print(f"New day detected, reset API call counter")
+        self.store = store
+        self.key = key
+        self.reserve = reserve
+        self.recheck_headroom = recheck_headroom
+        self.clock = clock
+        self._calls: list[float] = []  # call timestamps when there is no store
+        # priority -> why its last check was refused, so a refusal is logged once, not on every check
+        self._refused: dict[str, str] = {}
+
+    def _recent(self, calls: list[float]) -> list[float]:
+        cutoff = self.clock().timestamp() - self.WINDOW_SECONDS
+        return [t for t in calls if t > cutoff]
+
+    def _call_times(self) -> list[float]:
+        calls = self.store.get(self.key, []) if self.store is not None else self._calls
+        return self._recent(calls)
+
+    @property
+    def api_calls_today(self) -> int:
+        """Calls made in the last 24 hours."""
+        return len(self._call_times())
     
-    def can_make_api_call(self) -> bool:
-        """Check if we can make an API call based on daily limits."""
-        self._reset_if_new_day()
-        
-        # Check daily limit
-        if self.api_calls_today >= self.max_calls_per_day:
-            print(f"Daily API limit reached ({self.api_calls_today}/{self.max_calls_per_day})")
-            return False
-        
+    def can_make_api_call(self, priority: str = TRANSITION) -> bool:
+        """Check if a call of this priority fits in the budget, leaving the reserves free."""
+        used = self.api_calls_today
+        if used >= self.max_calls_per_day:
+            return self._refuse(priority, "limit", f"Daily API limit reached ({used}/{self.max_calls_per_day})")
+
+        keep_free = 0
+        if priority != NIGHT:
+            keep_free += self.reserve()
+        if priority == RECHECK:
+            keep_free += self.recheck_headroom
+        if self.max_calls_per_day - used <= keep_free:
+            return self._refuse(priority, "reserved",
+                                f"API budget reserved for higher priority checks ({used}/{self.max_calls_per_day} "
+                                f"used, {keep_free} kept free, {priority} check)")
+
+        if self._refused.pop(priority, None) is not None:
+            print(f"API budget available again for {priority} checks")
         return True
+
+    def _refuse(self, priority: str, why: str, message: str) -> bool:
+        """Log a refusal when it starts (or its reason changes) rather than on every check."""
+        if self._refused.get(priority) != why:
+            print(message)
+            self._refused[priority] = why
+        return False
     
     def record_api_call(self):
         """Record that an API call was made."""
-        self.api_calls_today += 1
-        print(f"API call recorded. Calls today: {self.api_calls_today}/{self.max_calls_per_day}")
+        now = self.clock().timestamp()
+        if self.store is not None:
+            calls = self.store.update(self.key, lambda calls: self._recent(calls) + [now], default=[])
+        else:
+            self._calls = self._recent(self._calls) + [now]
+            calls = self._calls
+        print(f"API call recorded. Calls in the last 24h: {len(calls)}/{self.max_calls_per_day}")
 
 
 class PresenceTracker:
-    """Tracks presence state and determines when to run checks."""
+    """Tracks presence state and determines when to run checks.
+
+    With a `store`, the state is persisted under `key` whenever it changes
+    and reloaded on startup, so a restart neither repeats a night check nor
+    misses a home -> out transition. `clock` returns the current local time.
+    """
     
-    def __init__(self, night_check_hours: list[int]):
+    def __init__(self, night_check_hours: list[int], store: StateStore | None = None, key: str = "presence",
+                 clock: Callable[[], datetime] = get_local_time):
         self.someone_was_home: bool = True  # Default to True so first "nobody home" triggers a check
         self.night_check_hours = set(night_check_hours)
         self.completed_night_checks: set[int] = set()
+        self.night_cycle: date | None = None
+        self.store = store
+        self.key = key
+        self.clock = clock
+        self._saved_state = None
+        if store is not None:
+            saved = store.get(key)
+            if saved is not None:
+                self.someone_was_home = saved["someone_was_home"]
+                self.completed_night_checks = set(saved["completed_night_checks"])
+                self.night_cycle = date.fromisoformat(saved["night_cycle"]) if saved["night_cycle"] else None
+                self._saved_state = saved
+
+    def _save(self):
+        """Persist the state if it changed since the last save."""
+        if self.store is None:
+            return
+        state = {
+            "someone_was_home": self.someone_was_home,
+            "completed_night_checks": sorted(self.completed_night_checks),
+            "night_cycle": self.night_cycle.isoformat() if self.night_cycle else None,
+        }
+        if state != self._saved_state:
+            self.store.set(self.key, state)
+            self._saved_state = state
     
     def _reset_night_checks_if_new_day(self):
-        """Reset night check tracking at start of new day."""
-        current_hour = get_local_time().hour
-        # Reset at 6am (start of new cycle)
-        if current_hour == 6 and self.completed_night_checks:
-            print("New day (6am), resetting night check tracking")
+        """Reset night check tracking when a new night cycle starts (at DAYTIME_START).
+
+        Compares cycles rather than looking for the 6am hour, so the reset
+        can't be missed if the loop is stalled through that hour.
+        """
+        cycle = night_cycle(self.clock(), DAYTIME_START)
+        if cycle != self.night_cycle:
+            if self.completed_night_checks:
+                print(f"New night cycle (from {DAYTIME_START}), resetting night check tracking")
             self.completed_night_checks.clear()
+            self.night_cycle = cycle
+
+    def remaining_night_checks(self) -> int:
+        """Night checks not yet done in the current night cycle."""
+        return len(self.night_check_hours - self.completed_night_checks)
+
+    def _current_night_check_hour(self) -> int | None:
+        """The night check hour whose window (scheduled time + NIGHT_CHECK_GRACE) we're in."""
+        now = self.clock()
+        times = night_check_times(self.night_cycle, self.night_check_hours, DAYTIME_START, ZoneInfo(LOCAL_TIMEZONE))
+        for hour, due in sorted(times.items(), key=lambda item: item[1]):
+            if due <= now < due + NIGHT_CHECK_GRACE:
+                return hour
+        return None
     
     def should_check_now(self, someone_home: bool, is_daytime: bool) -> tuple[bool, str]:
         """
         Determine if we should run a check now.
         Returns (should_check, reason).
         """
+        try:
+            return self._should_check_now(someone_home, is_daytime)
+        finally:
+            self._save()
+
+    def _should_check_now(self, someone_home: bool, is_daytime: bool) -> tuple[bool, str]:
         self._reset_night_checks_if_new_day()
-        current_hour = get_local_time().hour
         
         # During daytime: only check on home -> out transition
         if is_daytime:
@@ -117,315 +275,638 @@ class PresenceTracker:
             # Update presence state
             self.someone_was_home = someone_home
             
-            if current_hour in self.night_check_hours:
-                if current_hour not in self.completed_night_checks:
-                    self.completed_night_checks.add(current_hour)
-                    return True, f"Night check at {current_hour}:00"
+            check_hour = self._current_night_check_hour()
+            if check_hour is not None:
+                if check_hour not in self.completed_night_checks:
+                    self.completed_night_checks.add(check_hour)
+                    return True, f"Night check at {check_hour}:00"
                 else:
-                    return False, f"Already completed night check for {current_hour}:00"
+                    return False, f"Already completed night check for {check_hour}:00"
             else:
-                return False, f"Not a night check hour (current: {current_hour}:00)"
+                return False, f"Not a night check hour (current: {self.clock().hour}:00)"
         
         return False, "Unknown state"
 
 
-# Setup dataset directory
+class CameraMonitor:
+    """Per-camera state: schedule, change detector, result cache and API budget share.
+
+    The Gemini batcher is shared by all cameras. `clock` returns the current
+    local time, for the schedule.
+    """
+
+    def __init__(self, camera: CameraConfig, api_limiter: ApiRateLimiter, gemini: GeminiBatcher,
+                 store: StateStore | None = None, clock: Callable[[], datetime] = get_local_time,
+                 night_check_hours: list[int] = NIGHT_CHECK_HOURS):
+        self.camera = camera
+        self.api_limiter = api_limiter
+        self.gemini = gemini
+        self.clock = clock
+        self.presence_tracker = PresenceTracker(night_check_hours, store, f"{camera.name}.presence", clock)
+        # Keep enough of this camera's budget for its remaining night checks
+        self.api_limiter.reserve = self.presence_tracker.remaining_night_checks
+        self.change_detector = ChangeDetector()
+        self.result_cache = ResultCache(camera.result_cache_path)
+        self.stream = CameraStream(camera.stream_url) if camera.stream_url else None
+
+    @property
+    def name(self) -> str:
+        return self.camera.name
+
+
+def split_api_budget(total: int, num_cameras: int) -> list[int]:
+    """Split the daily API budget across cameras (earlier cameras get any remainder)."""
+    share, remainder = divmod(total, num_cameras)
+    return [share + (1 if i < remainder else 0) for i in range(num_cameras)]
+
+
+def build_monitors(cameras: list[CameraConfig], gemini: GeminiBatcher, store: StateStore | None,
+                   max_calls_per_day: int = MAX_API_CALLS_PER_DAY) -> dict[str, CameraMonitor]:
+    """A monitor per camera, with its share of the API budget and state kept under its own keys."""
+    monitors = {}
+    for camera, budget in zip(cameras, split_api_budget(max_calls_per_day, len(cameras))):
+        api_limiter = ApiRateLimiter(budget, store, f"{camera.name}.api_calls",
+                                     recheck_headroom=API_RECHECK_HEADROOM)
+        monitors[camera.name] = CameraMonitor(camera, api_limiter, gemini, store)
+    return monitors
+
+
+# Default dataset directory (per-camera dataset dirs come from config.CAMERAS)
 SCRIPT_DIR = Path(__file__).parent
 DATASET_DIR = SCRIPT_DIR / "dataset"
-DATASET_OPEN_DIR = DATASET_DIR / "door_open"
-DATASET_CLOSED_DIR = DATASET_DIR / "door_closed"
 
-def init_dataset_dirs():
-    """Initialize dataset directory structure if it doesn't exist."""
-    DATASET_OPEN_DIR.mkdir(parents=True, exist_ok=True)
-    DATASET_CLOSED_DIR.mkdir(parents=True, exist_ok=True)
+@cache
+def get_local_model(model_path: Path = local_classifier.MODEL_PATH) -> local_classifier.LocalDoorClassifier | None:
+    """Load a local door classifier once (None if it hasn't been trained)."""
+    model = local_classifier.load_model(model_path)
+    if model is not None:
+        print(f"Loaded local classifier from {model_path}")
+    return model
 
-def is_phone_reachable(ip: str) -> bool:
-    """Check if a phone is reachable via ping."""
+def classify_locally(image_bytes: bytes,
+                     model_path: Path = local_classifier.MODEL_PATH) -> tuple[DoorStatus, float] | None:
+    """
+    Classify with the local model.
+    Returns (door_status, confidence), or None if no model is available.
+    """
+    model = get_local_model(model_path)
+    if model is None:
+        return None
     try:
-        # Use ping with 1 second timeout, 1 packet
-        result = subprocess.run(
-            ["ping", "-c", "1", "-W", "1", ip],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            timeout=2
-        )
-        return result.returncode == 0
-    except (subprocess.TimeoutExpired, Exception):
-        return False
+        with STAGE_SECONDS.time(stage="local_model"):
+            is_open, confidence = model.predict(image_bytes)
+    except Exception as e:
+        print(f"Local classifier failed: {e}")
+        return None
+    state = "open" if is_open else "closed"
+    door_status = DoorStatus(
+        is_open=is_open,
+        rationale=f"Local classifier: door {state} (confidence {confidence:.2f})"
+    )
+    return door_status, confidence
 
-def is_anyone_home() -> bool:
+@cache
+def get_dataset_store(dataset_dir: Path = DATASET_DIR) -> DatasetStore:
+    """Open a camera's dataset store once (creates it if needed)."""
+    return DatasetStore(dataset_dir)
+
+# Frames are saved in the background, in batches (see dataset_writer.py)
+DATASET_WRITER = DatasetWriter(get_dataset_store)
+
+def is_anyone_home(since_version: int | None = None) -> tuple[bool, list[str], int | None]:
     """Get presence state from the presence monitor service.
 
-    Returns tuple (someone_home: bool, people_home: list[str]).
-    Falls back to direct pings if the presence service is unreachable.
+    With `since_version`, long-polls: the presence service holds the request
+    until the state version moves past it (i.e. a debounced transition
+    happened) or PRESENCE_LONGPOLL_SECONDS pass.
+
+    Returns tuple (someone_home: bool, people_home: list[str], version).
+    Falls back to direct pings if the presence service is unreachable, in
+    which case version is None.
     """
     url = f"http://127.0.0.1:{PRESENCE_API_PORT}/status"
     try:
-        resp = requests.get(url, timeout=1)
+        if since_version is None:
+            resp = transport.get(url)
+        else:
+            connect_timeout, read_timeout = transport.timeout_for(url)
+            resp = transport.get(
+                url,
+                params={"since": since_version, "timeout": PRESENCE_LONGPOLL_SECONDS},
+                timeout=(connect_timeout, PRESENCE_LONGPOLL_SECONDS + read_timeout),
+            )
         resp.raise_for_status()
         data = resp.json()
         people = data.get("people_home") or []
+        version = data.get("version")
         if people:
             print(f"Someone is home: {', '.join(people)} (from presence service)")
-            return True, people
+            return True, people, version
         else:
             print("No phones reachable - nobody home (from presence service)")
-            return False, []
+            return False, [], version
     except Exception:
-        # fallback: do direct pings (slower)
-        people_home = []
-        for name, ip in PHONE_IPS.items():
-            if is_phone_reachable(ip):
-                people_home.append(name)
+        # fallback: ping the phones directly (all at once)
+        reachable = probe_all(PHONE_IPS)
+        people_home = [name for name, ok in reachable.items() if ok]
         if people_home:
             print(f"Someone is home: {', '.join(people_home)} (fallback pings)")
-            return True, people_home
+            return True, people_home, None
         else:
             print("No phones reachable - nobody home (fallback pings)")
-            return False, []
+            return False, [], None
 
-def is_daytime() -> bool:
+def is_daytime(clock: Callable[[], datetime] = get_local_time) -> bool:
     """Check if current time is within daytime hours (in configured timezone)."""
-    current_time = get_local_time().time()
+    current_time = clock().time()
     is_day = DAYTIME_START <= current_time <= DAYTIME_END
     return is_day
 
-def should_run_door_check(api_limiter: ApiRateLimiter, presence_tracker: PresenceTracker) -> tuple[bool, str]:
+def should_run_door_check(monitor: CameraMonitor, someone_home: bool) -> tuple[bool, str, str]:
     """
-    Determine if we should run the door check now.
-    Returns (should_check, reason).
+    Determine if we should run the door check for one camera now, given the
+    latest presence state (from the presence service or fallback pings).
+    Returns (should_check, reason, priority): the API priority class the
+    check's Gemini call gets (see ApiRateLimiter).
     """
     if TEST_MODE:
-        return True, "Test mode"
-    
-    # Check if we've hit daily API limit
-    if not api_limiter.can_make_api_call():
-        return False, "Daily API limit reached"
+        return True, "Test mode", RECHECK
     
-    # Check presence via presence service (or fallback)
-    someone_home, people = is_anyone_home()
-
     # Check if it's daytime
-    daytime = is_daytime()
+    daytime = is_daytime(monitor.clock)
+
+    # Check if we've hit daily API limit (only matters without a local model,
+    # otherwise get_door_status falls back to the local answer). Checks at
+    # night are night checks, daytime checks are home -> out transitions
+    priority = TRANSITION if daytime else NIGHT
+    if get_local_model(monitor.camera.model_path) is None and not monitor.api_limiter.can_make_api_call(priority):
+        return False, "API budget unavailable (daily limit reached or reserved)", priority
 
     # Delegate to presence tracker for the logic (we only pass boolean)
-    should_check, reason = presence_tracker.should_check_now(someone_home, daytime)
+    should_check, reason = monitor.presence_tracker.should_check_now(someone_home, daytime)
     
-    return should_check, reason
+    return should_check, reason, priority
 
 
-def save_to_dataset(image_bytes: bytes, is_open: bool):
-    """Save image to appropriate dataset folder."""
-    if is_open:
-        save_dir = DATASET_OPEN_DIR
-    else:
-        save_dir = DATASET_CLOSED_DIR
-    
-    # Use timestamp for unique filename (in local timezone)
-    timestamp = get_local_time().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-    filename = f"{timestamp}.jpg"
-    filepath = save_dir / filename
-    
-    with open(filepath, "wb") as f:
-        f.write(image_bytes)
-    
-    print(f"Saved image to {filepath}")
+def save_to_dataset(image_bytes: bytes, is_open: bool, dataset_dir: Path = DATASET_DIR,
+                    rationale: str = "", camera: str = ""):
+    """Queue image and its label to be appended to the dataset store by the background writer.
 
-def get_door_status() -> tuple[DoorStatus, bytes, bool]:
+    Near-duplicates of a stored frame with the same label are skipped by the
+    store (see DATASET_DEDUP_MAX_DISTANCE).
     """
-    Get current status with retry logic for 503 errors.
+    frame = Frame(image_bytes, is_open, rationale=rationale, camera=camera, timestamp=get_local_time().timestamp())
+    DATASET_WRITER.submit(dataset_dir, frame)
+
+def fetch_frame(monitor: CameraMonitor) -> bytes:
+    """Latest camera frame: from the MJPEG stream if it has a fresh one, else a one-shot fetch."""
+    if monitor.stream is not None:
+        frame = monitor.stream.latest()
+        if frame is not None:
+            return frame
+        print(f"[{monitor.name}] No fresh stream frame, fetching {monitor.camera.url}")
+    with STAGE_SECONDS.time(stage="camera_fetch"):
+        response = transport.get(monitor.camera.url)
+        response.raise_for_status()
+        return response.content
+
+def answer_without_gemini(monitor: CameraMonitor, image_bytes: bytes,
+                          priority: str = TRANSITION, scene_checked: bool = False) -> tuple[DoorStatus, str] | None:
+    """
+    Try to answer a check without calling Gemini: change detector, then the
+    result cache, then the local classifier. With `scene_checked`, the
+    caller already asked the change detector about this frame.
+    Returns (door_status, source), or None if Gemini is needed.
+    """
+    api_limiter = monitor.api_limiter
+    change_detector = monitor.change_detector
+    result_cache = monitor.result_cache
+
+    # reuse the last result if the scene hasn't changed
+    if change_detector is not None and not scene_checked:
+        cached_status = change_detector.cached_result(image_bytes)
+        if cached_status is not None:
+            print("Scene unchanged since last check, reusing previous result")
+            return cached_status, "unchanged"
+
+    # answer repeated scenes from the result cache
+    if result_cache is not None:
+        cached = result_cache.get(image_bytes)
+        if cached is not None:
+            door_status = DoorStatus(**cached)
+            print(f"Result cache hit ({result_cache.stats()['hit_rate']:.0%} hit rate)")
+            if change_detector is not None:
+                change_detector.remember(door_status)
+            return door_status, "cache"
+
+    # try the local model first
+    local_result = classify_locally(image_bytes, monitor.camera.model_path)
+    if local_result is not None:
+        local_status, confidence = local_result
+        if confidence >= LOCAL_CONFIDENCE_THRESHOLD:
+            if change_detector is not None:
+                change_detector.remember(local_status)
+            return local_status, "local"
+        if not api_limiter.can_make_api_call(priority):
+            # Low confidence, but a best-effort answer beats no answer
+            print("No API budget for this check, using low-confidence local result")
+            return local_status, "local"
+        print(f"Local classifier not confident ({confidence:.2f}), asking Gemini")
+    return None
+
+def degraded_door_status(monitor: CameraMonitor, image_bytes: bytes) -> DoorStatus | None:
+    """
+    Best-effort answer while Gemini is unavailable (circuit breaker open).
+    Uses the local model even below its confidence threshold, then at night a
+    mean-brightness heuristic, then the camera's last known state.
+    Returns None if none of these can give an answer.
+    """
+    local_result = classify_locally(image_bytes, monitor.camera.model_path)
+    if local_result is not None:
+        local_status, confidence = local_result
+        return DoorStatus(is_open=local_status.is_open, rationale=f"Gemini unavailable. {local_status.rationale}")
+
+    if not is_daytime(monitor.clock):
+        brightness = float(grayscale_array(image_bytes).mean())
+        is_open = brightness > DEGRADED_NIGHT_OPEN_BRIGHTNESS
+        comparison = "above" if is_open else "below"
+        return DoorStatus(
+            is_open=is_open,
+            rationale=f"Gemini unavailable. Night brightness heuristic: mean brightness {brightness:.2f} "
+                      f"is {comparison} {DEGRADED_NIGHT_OPEN_BRIGHTNESS}"
+        )
 
-    Return [DoorStatus, image_bytes, error_state] tuple
+    last_status = monitor.change_detector.last_result if monitor.change_detector is not None else None
+    if last_status is not None:
+        return DoorStatus(is_open=last_status.is_open,
+                          rationale=f"Gemini unavailable. Last known state: {last_status.rationale}")
+    return None
+
+async def get_door_status(monitor: CameraMonitor, priority: str = TRANSITION,
+                          frame: bytes | None = None, scene_checked: bool = False) -> tuple[DoorStatus, bytes, bool, str]:
+    """
+    Get current status of one camera's door, retrying camera and Gemini
+    failures with their own backoff policies (see retry.py).
+
+    If the change detector reports the scene is unchanged since the last
+    classification, that result is reused. Next the perceptual-hash result
+    cache is consulted, then the local classifier; Gemini is only called when
+    the local model is missing or less confident than LOCAL_CONFIDENCE_THRESHOLD.
+
+    `frame` is a camera frame the caller already fetched (otherwise one is
+    fetched here); `scene_checked` means the caller already asked the change
+    detector about it. Retries wait with asyncio.sleep, so other cameras and the rest of the
+    monitor keep running meanwhile. Before a Gemini retry the frame is
+    refetched if it is older than RETRY_REFETCH_AFTER_SECONDS. Gemini calls go
+    through GEMINI_BREAKER; while it is open, a best-effort answer comes from
+    degraded_door_status instead.
+
+    Return [DoorStatus, image_bytes, error_state, source] tuple, where source
+    is "unchanged", "cache", "local", "gemini" or "degraded" (only Gemini
+    requests count against the API budget, and are recorded here)
 
     (on error, error_state will be true, and
     error message is provided in door_status.rationale)
     """
-    error_state = False
     image_bytes = bytes()
-    
-    for attempt in range(MAX_RETRIES + 1):
-        try:
-            # fetch image
-            response = requests.get(CAM_URL)
-            response.raise_for_status()
-            image_bytes = response.content
-            image = types.Part.from_bytes(
-              data=image_bytes, mime_type="image/jpeg"
-            )
+    fetched_at = 0.0
+    source = "gemini"
+
+    async def fetch():
+        nonlocal image_bytes, fetched_at
+        image_bytes = await CAMERA_RETRY.run(lambda: asyncio.to_thread(fetch_frame, monitor))
+        fetched_at = time_module.monotonic()
+
+    async def ask_gemini():
+        # batched with any other frames due at the same time
+        with STAGE_SECONDS.time(stage="gemini"):
+            # image prep (decode, resize, encode) runs in the worker thread too, off the event loop
+            return await asyncio.to_thread(lambda: monitor.gemini.classify(prepare_model_image(image_bytes)))
+
+    async def classify():
+        if time_module.monotonic() - fetched_at > RETRY_REFETCH_AFTER_SECONDS:
+            print(f"[{monitor.name}] Frame is stale, fetching a fresh one before retrying")
+            await fetch()
+        # Only outages count against the breaker; e.g. a bad response means Gemini is up
+        return await GEMINI_BREAKER.call(ask_gemini, is_retryable_gemini_error)
 
-            # call gemini
-            client = genai.Client()
-            response = client.models.generate_content(
-                model="gemini-3-flash-preview",
-                contents=[QUERY, image],
-                config={
-                    "response_mime_type": "application/json",
-                    "response_schema": DoorStatus,
-                }
-            )
-            # Access the parsed Pydantic object directly
-            door_status = response.parsed
-            
-            if door_status is None:
-                raise ValueError(f"Failed to parse gemini response: {response}")
-            
-            # Success! Return the result
-            return door_status, image_bytes, error_state
-
-        except requests.exceptions.HTTPError as e:
-            # Check if it's a 503 error
-            if e.response is not None and e.response.status_code == 503:
-                if attempt < MAX_RETRIES:
-                    print(f"503 Service Unavailable (attempt {attempt + 1}/{MAX_RETRIES + 1}). Retrying in {RETRY_INTERVAL_SECONDS} seconds...")
-                    time_module.sleep(RETRY_INTERVAL_SECONDS)
-                    continue
-                else:
-                    error_message = f"Error: 503 Service Unavailable persisted after {MAX_RETRIES + 1} attempts over {MAX_RETRIES} minutes"
-                    print(error_message)
-                    door_status = DoorStatus(
-                        is_open=False,
-                        rationale=error_message
-                    )
-                    error_state = True
-                    return door_status, image_bytes, error_state
-            else:
-                # Other HTTP error, don't retry
-                error_message = f"HTTP Error: {str(e)}"
-                print(error_message)
-                door_status = DoorStatus(
-                    is_open=False,
-                    rationale=error_message
-                )
-                error_state = True
-                return door_status, image_bytes, error_state
-                
-        except Exception as e:
-            # Non-503 error, don't retry
-            error_message = f"Error: {str(e)}"
-            print(error_message)
-            door_status = DoorStatus(
-                is_open=False,
-                rationale=error_message
-            )
-            error_state = True
-            return door_status, image_bytes, error_state
-    
-    # This should never be reached, but just in case
-    error_message = "Unexpected error: max retries reached without resolution"
-    door_status = DoorStatus(
-        is_open=False,
-        rationale=error_message
-    )
-    error_state = True
-    return door_status, image_bytes, error_state
+    try:
+        if frame is None:
+            await fetch()
+        else:
+            image_bytes, fetched_at = frame, time_module.monotonic()
+        shortcut = await asyncio.to_thread(answer_without_gemini, monitor, image_bytes, priority, scene_checked)
+        if shortcut is not None:
+            door_status, shortcut_source = shortcut
+            return door_status, image_bytes, False, shortcut_source
+
+        # the API call is recorded once per request, by the caller that paid
+        try:
+            door_status, paid = await GEMINI_RETRY.run(classify)
+        except CircuitOpenError as e:
+            degraded_status = await asyncio.to_thread(degraded_door_status, monitor, image_bytes)
+            if degraded_status is None:
+                raise
+            print(f"[{monitor.name}] {e}, using degraded answer")
+            return degraded_status, image_bytes, False, "degraded"
+        if paid:
+            monitor.api_limiter.record_api_call()
+            API_CALLS.inc(camera=monitor.name)
+
+        # Success! Return the result
+        if monitor.change_detector is not None:
+            monitor.change_detector.remember(door_status)
+        if monitor.result_cache is not None:
+            # put() rewrites the cache file, so like the lookup it runs in a worker thread
+            await asyncio.to_thread(monitor.result_cache.put, image_bytes, door_status.model_dump())
+        return door_status, image_bytes, False, source
+
+    except Exception as e:
+        error_message = f"Error: {str(e)}"
+        print(f"[{monitor.name}] {error_message}")
+        door_status = DoorStatus(
+            is_open=False,
+            rationale=error_message
+        )
+        return door_status, image_bytes, True, source
 
 
-def get_door_status_test_mode():
+async def get_door_status_test_mode(monitor: CameraMonitor, priority: str = RECHECK):
     print("Running in TEST MODE")
     with open("door_open_daytime.jpg", "rb") as f:
         image_bytes = f.read()
     door_status = DoorStatus(is_open=True, rationale="test")
-    return door_status, image_bytes, False
+    return door_status, image_bytes, False, "test"
 
-def send_notification(door_status: DoorStatus, image_bytes: bytes, is_error: bool):
-    """Send notification via ntfy."""
-    ntfy_url = f"https://ntfy.sh/{NTFY_TOPIC}"
+def send_notification(door_status: DoorStatus, image_bytes: bytes, is_error: bool, camera: CameraConfig,
+                      unconfirmed: bool = False, open_for: float | None = None):
+    """Send notification for one camera via ntfy (with a thumbnail, not the full image).
+
+    `unconfirmed` marks a degraded best-effort answer in the title, and
+    `open_for` (seconds) says how long the door has been open.
+    Raises on HTTP errors, so the notify stage can retry.
+    """
+    suffix = " (unconfirmed)" if unconfirmed else ""
+    ntfy_url = f"{NTFY_SERVER}/{camera.ntfy_topic}"
+    if image_bytes and not is_error:
+        image_bytes = make_thumbnail(image_bytes)
     
     if is_error:
-        requests.post(
-            ntfy_url,
-            data=door_status.rationale.encode(encoding='utf-8'),
-            headers={
-                "Title": "Garage door check failed",
-                "Priority": "default",
-                "Tags": "facepalm"
-            }
-        )
+        data = door_status.rationale.encode(encoding='utf-8')
+        headers = {
+            "Title": f"{camera.title} check failed",
+            "Priority": "default",
+            "Tags": "facepalm"
+        }
     elif door_status.is_open:
-        requests.post(
-            ntfy_url,
-            data=image_bytes,
-            headers={
-                "Title": "Garage door is open!",
-                "Priority": "urgent",
-                "Tags": "warning,skull"
-            }
-        )
+        data = image_bytes
+        state = f"has been open for {int(open_for // 60)} min" if open_for is not None else "is open"
+        headers = {
+            "Title": f"{camera.title} {state}!{suffix}",
+            "Priority": "urgent",
+            "Tags": "warning,skull"
+        }
     elif NOTIFY_WHEN_SHUT:
-        requests.post(
-            ntfy_url,
-            data=image_bytes,
-            headers={
-                "Title": "garage door is shut",
-                "Priority": "min",
-                "Tags": "heavy_check_mark"
-            }
-        )
+        data = image_bytes
+        headers = {
+            "Title": f"{camera.title} is shut{suffix}",
+            "Priority": "min",
+            "Tags": "heavy_check_mark"
+        }
+    else:
+        return
+    with STAGE_SECONDS.time(stage="ntfy_post"):
+        transport.post(ntfy_url, data=data, headers=headers).raise_for_status()
 
-def run_door_check_cycle(api_limiter: ApiRateLimiter):
-    """Run one cycle of the door check."""
+async def run_door_check(monitor: CameraMonitor, priority: str) -> CheckResult:
+    """Run one door check for a camera (classifier stage of the monitor engine)."""
     get_status = get_door_status if not TEST_MODE else get_door_status_test_mode
-    door_status, image_bytes, is_error = get_status()
-
-    print(f"Door is open: {door_status.is_open}")
-    print(f"Rationale: {door_status.rationale}")
+    door_status, image_bytes, is_error, source = await get_status(monitor, priority)
+    CHECKS.inc(camera=monitor.name, source="error" if is_error else source)
+
+    print(f"[{monitor.name}] Door is open: {door_status.is_open}")
+    print(f"[{monitor.name}] Rationale: {door_status.rationale}")
+    breaker = GEMINI_BREAKER.status()
+    if breaker["state"] != "closed":
+        print(f"[{monitor.name}] Gemini circuit breaker: {breaker}")
+
+    return CheckResult(door_status, image_bytes, is_error, source, monitor.name)
+
+def save_check_result(monitor: CameraMonitor, result: CheckResult):
+    """Dataset stage of the monitor engine."""
+    # Save to dataset only on successful Gemini classification (not in test mode,
+    # not on error, and not local results - those would train the model on itself)
+    if result.source == "gemini" and not result.is_error and result.image_bytes:
+        save_to_dataset(result.image_bytes, result.door_status.is_open, monitor.camera.dataset_dir,
+                        result.door_status.rationale, monitor.name)
+
+async def notify_check_result(monitor: CameraMonitor, result: CheckResult):
+    """Notification stage of the monitor engine (retried with the ntfy policy)."""
+    await NTFY_RETRY.run(lambda: asyncio.to_thread(
+        send_notification, result.door_status, result.image_bytes, result.is_error, monitor.camera,
+        result.source == "degraded"))
+
+def decide_checks(monitors: dict[str, CameraMonitor], someone_home: bool) -> list[tuple[str, bool, str, str]]:
+    """Scheduler stage of the monitor engine: (camera, should_check, reason, priority) per camera."""
+    return [(name, *should_run_door_check(monitor, someone_home)) for name, monitor in monitors.items()]
+
+def poll_presence(since_version: int | None) -> tuple[bool, list[str], int | None]:
+    """Presence stage of the monitor engine."""
+    if TEST_MODE:
+        return False, [], None
+    return is_anyone_home(since_version)
 
-    # Record API call
-    api_limiter.record_api_call()
+async def sample_door_status(monitor: CameraMonitor) -> tuple[DoorStatus, bytes, bool, str] | None:
+    """
+    One continuous-mode sample of a camera: a single frame fetch (the next
+    sample is the retry), answered from the change detector while the scene
+    is unchanged, otherwise by get_door_status at RECHECK priority (local
+    model, Gemini only for uncertain frames).
+    Returns None if there is no frame, or no way to classify it within budget.
+    """
+    frame = await asyncio.to_thread(fetch_frame, monitor)
+    cached_status = await asyncio.to_thread(monitor.change_detector.cached_result, frame)
+    if cached_status is not None:
+        return cached_status, frame, False, "unchanged"
+    if get_local_model(monitor.camera.model_path) is None and not monitor.api_limiter.can_make_api_call(RECHECK):
+        return None
+    return await get_door_status(monitor, RECHECK, frame, scene_checked=True)
+
+async def notify_door_event(monitor: CameraMonitor, result: CheckResult, open_for: float | None):
+    """Send a continuous-mode alert (retried with the ntfy policy)."""
+    try:
+        await NTFY_RETRY.run(lambda: asyncio.to_thread(
+            send_notification, result.door_status, result.image_bytes, False, monitor.camera,
+            result.source == "degraded", open_for))
+    except Exception as e:
+        print(f"[{monitor.name}] Failed to send notification: {e}")
 
-    # Save to dataset only on successful classification (not in test mode, not on error)
-    if not TEST_MODE and not is_error and image_bytes:
-        init_dataset_dirs()
-        save_to_dataset(image_bytes, door_status.is_open)
+async def watch_camera(monitor: CameraMonitor, interval: float = CONTINUOUS_SAMPLE_SECONDS):
+    """
+    Continuous mode for one camera: sample every `interval` seconds and feed
+    the readings to a DoorStateMachine. Notifies only when the debounced state
+    changes (not for the initial closed state) or the door has been open too long.
+    """
+    state = DoorStateMachine()
+    notifications: set[asyncio.Task] = set()
+    failures = 0
+    while True:
+        started = time_module.monotonic()
+        try:
+            sample = await sample_door_status(monitor)
+            failures = 0
+        except Exception as e:
+            sample = None
+            failures += 1
+            # a camera outage would otherwise log every sample
+            if failures == 1 or failures % 100 == 0:
+                print(f"[{monitor.name}] Sample failed ({failures} in a row): {e}")
+
+        result = CheckResult(*sample, monitor.name) if sample is not None else None
+        if result is not None:
+            CHECKS.inc(camera=monitor.name, source="error" if result.is_error else result.source)
+        if result is not None and not result.is_error:
+            door_status = result.door_status
+            was_known = state.is_open is not None
+            event = state.update(door_status.is_open, time_module.monotonic())
+            if event is not None and (was_known or event != CLOSED):
+                open_for = state.open_for(time_module.monotonic()) if event == OPEN_TOO_LONG else None
+                print(f"[{monitor.name}] Door {event.replace('_', ' ')}: {door_status.rationale}")
+                # Notify in the background, so ntfy retries don't stall sampling
+                task = asyncio.create_task(notify_door_event(monitor, result, open_for))
+                notifications.add(task)
+                task.add_done_callback(notifications.discard)
+            # In a worker thread: with the writer queue full it waits for space
+            try:
+                await asyncio.to_thread(save_check_result, monitor, result)
+            except Exception as e:
+                print(f"[{monitor.name}] Failed to save to dataset: {e}")
+
+        await asyncio.sleep(max(0.0, interval - (time_module.monotonic() - started)))
+
+async def run_until_stopped(run):
+    """Await `run`, cancelling it on SIGTERM (systemctl stop) so shutdown cleanup still runs."""
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    await run
+
+async def watch_cameras(monitors: dict[str, CameraMonitor]):
+    """Continuous mode: watch every camera concurrently."""
+    await asyncio.gather(*(watch_camera(monitor) for monitor in monitors.values()))
+
+async def run_with_presence(engine: MonitorEngine):
+    """
+    Run the presence monitor and the monitor engine on one event loop.
 
-    # Send notification
-    send_notification(door_status, image_bytes, is_error)
+    Transitions reach the scheduler through a presence_monitor listener, so
+    there is no long-poll over localhost and no fallback pings. /status is
+    still served for other clients.
+    """
+    # Imported here: it registers the presence metrics on import
+    import presence_monitor
+
+    presence_monitor.setup_logging()
+    presence_monitor.log_settings()
+    presence_monitor.add_listener(lambda status: engine.publish_presence(status["someone_home"]))
+    with presence_monitor.state_lock:
+        engine.publish_presence(presence_monitor.status_payload()["someone_home"])
+    server = presence_monitor.start_http_server()
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(presence_monitor.monitor_loop())
+            tg.create_task(engine.run())
+    finally:
+        server.shutdown()
+
+def register_metrics(monitors: dict[str, CameraMonitor], gemini: GeminiBatcher):
+    """Add the metrics read at scrape time from state the monitor already keeps."""
+    def per_camera(fn):
+        return lambda: {(name,): fn(monitor) for name, monitor in monitors.items()}
+
+    metrics.gauge("garage_api_calls_last_24h", "Gemini calls in the rolling 24 hour budget window", ("camera",),
+                  fn=per_camera(lambda monitor: monitor.api_limiter.api_calls_today))
+    metrics.gauge("garage_api_budget_per_day", "Gemini calls allowed per rolling 24 hours", ("camera",),
+                  fn=per_camera(lambda monitor: monitor.api_limiter.max_calls_per_day))
+    metrics.counter("garage_result_cache_hits_total", "Result cache hits", ("camera",),
+                    fn=per_camera(lambda monitor: monitor.result_cache.hits))
+    metrics.counter("garage_result_cache_misses_total", "Result cache misses", ("camera",),
+                    fn=per_camera(lambda monitor: monitor.result_cache.misses))
+    metrics.counter("garage_gemini_requests_total", "Gemini requests sent (one per batch), failed ones included",
+                    fn=lambda: gemini.calls)
+    metrics.counter("garage_gemini_errors_total", "Gemini requests that failed", fn=lambda: gemini.errors)
+    metrics.gauge("garage_gemini_breaker_open", "1 while the Gemini circuit breaker is open or probing",
+                  fn=lambda: float(GEMINI_BREAKER.status()["state"] != "closed"))
+    metrics.counter("garage_gemini_breaker_opened_total", "Times the Gemini circuit breaker opened",
+                    fn=lambda: GEMINI_BREAKER.status()["times_opened"])
+    metrics.counter("garage_dataset_frames_total", "Frames handled by the dataset writer", ("outcome",),
+                    fn=lambda: {("written",): DATASET_WRITER.written, ("duplicate",): DATASET_WRITER.duplicates,
+                                ("dropped",): DATASET_WRITER.dropped, ("failed",): DATASET_WRITER.failed})
 
 def main():
-    """Main continuous monitoring loop."""
+    """Main continuous monitoring loop (runs the asyncio monitor engine)."""
     print("Starting garage door monitor...")
     print(f"Configuration:")
     print(f"  - Local timezone: {LOCAL_TIMEZONE}")
     print(f"  - Current local time: {get_local_time().strftime('%Y-%m-%d %H:%M:%S %Z')}")
     print(f"  - Check interval: {CHECK_INTERVAL_SECONDS}s")
     print(f"  - Max API calls per day: {MAX_API_CALLS_PER_DAY}")
+    print(f"  - Local classifier threshold: {LOCAL_CONFIDENCE_THRESHOLD}")
     print(f"  - Daytime hours: {DAYTIME_START} - {DAYTIME_END} ({LOCAL_TIMEZONE})")
     print(f"  - Night check hours: {sorted(NIGHT_CHECK_HOURS)} ({LOCAL_TIMEZONE})")
     print(f"  - Phone IPs: {PHONE_IPS}")
     print(f"  - Test mode: {TEST_MODE}")
+    print(f"  - Continuous mode: {CONTINUOUS_MODE}")
+    if not CONTINUOUS_MODE:
+        print(f"  - Presence monitor: {'in this process' if WITH_PRESENCE else f'http://127.0.0.1:{PRESENCE_API_PORT}'}")
+    print(f"  - Camera workers: {CAMERA_WORKERS}")
+    print(f"  - Metrics: {f'http://0.0.0.0:{METRICS_PORT}/metrics' if METRICS_PORT else 'disabled'}")
+
+    cameras = load_cameras()
+    gemini = GeminiBatcher(DoorStatus, QUERY, BATCH_QUERY, callers=len(cameras))
+    # Test runs keep their state in memory, so they don't spend the real budget
+    store = StateStore() if not TEST_MODE else None
+    monitors = build_monitors(cameras, gemini, store)
+    for monitor in monitors.values():
+        if monitor.stream is not None and not TEST_MODE:
+            monitor.stream.start()
+        model_state = "loaded" if get_local_model(monitor.camera.model_path) else "not trained"
+        print(f"  - Camera {monitor.name}: {monitor.camera.url} ({monitor.api_limiter.max_calls_per_day} "
+              f"API calls/day, local model {model_state})")
+    register_metrics(monitors, gemini)
+    if METRICS_PORT and not TEST_MODE:
+        metrics.serve(METRICS_PORT)
     print()
     print("Check Logic:")
-    print(f"  - Daytime: Check once when 'home -> out' transition detected")
-    print(f"  - Night: Check at specified hours ({', '.join(f'{h}:00' for h in sorted(NIGHT_CHECK_HOURS))})")
+    if CONTINUOUS_MODE:
+        print(f"  - Continuous: sample every {CONTINUOUS_SAMPLE_SECONDS}s, notify when the door opens/closes "
+              f"or stays open longer than {config.CONTINUOUS_OPEN_ALERT_SECONDS // 60} min")
+        run = watch_cameras(monitors)
+    else:
+        print(f"  - Daytime: Check once when 'home -> out' transition detected")
+        print(f"  - Night: Check at specified hours ({', '.join(f'{h}:00' for h in sorted(NIGHT_CHECK_HOURS))})")
+        check_scheduler = CheckScheduler(NIGHT_CHECK_HOURS, DAYTIME_START, DAYTIME_END, ZoneInfo(LOCAL_TIMEZONE))
+        engine = MonitorEngine(
+            poll_presence=poll_presence if not WITH_PRESENCE else None,
+            decide=lambda someone_home: decide_checks(monitors, someone_home),
+            run_check=lambda name, priority: run_door_check(monitors[name], priority),
+            save=lambda result: save_check_result(monitors[result.camera], result),
+            notify=lambda result: notify_check_result(monitors[result.camera], result),
+            interval=CHECK_INTERVAL_SECONDS,
+            workers=CAMERA_WORKERS,
+            now=get_local_time,
+            next_event=check_scheduler.next_event,
+        )
+        run = engine.run() if not WITH_PRESENCE else run_with_presence(engine)
     print()
     
-    api_limiter = ApiRateLimiter(MAX_API_CALLS_PER_DAY)
-    presence_tracker = PresenceTracker(NIGHT_CHECK_HOURS)
-    
-    while True:
-        try:
-            timestamp = get_local_time().strftime("%Y-%m-%d %H:%M:%S %Z")
-            print(f"[{timestamp}] Checking conditions...")
-            
-            should_check, reason = should_run_door_check(api_limiter, presence_tracker)
-            print(f"  -> {reason}")
-            
-            if should_check:
-                print("Running door check...")
-                run_door_check_cycle(api_limiter)
-            
-            print(f"Waiting {CHECK_INTERVAL_SECONDS}s until next check...")
-            print()
-            time_module.sleep(CHECK_INTERVAL_SECONDS)
-            
-        except KeyboardInterrupt:
-            print("\nShutting down garage door monitor...")
-            break
-        except Exception as e:
-            print(f"Unexpected error in main loop: {e}")
-            print(f"Waiting {CHECK_INTERVAL_SECONDS}s before retry...")
-            time_module.sleep(CHECK_INTERVAL_SECONDS)
+    try:
+        asyncio.run(run_until_stopped(run))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("\nShutting down garage door monitor...")
+    finally:
+        DATASET_WRITER.close()
+        transport.close_all()
+        if store is not None:
+            store.close()
 
 if __name__ == "__main__":
     main()
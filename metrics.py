@@ -0,0 +1,235 @@
+"""
+Minimal Prometheus metrics: counters, gauges and histograms rendered in the
+text exposition format, with no extra dependencies.
+
+Recording a value is a dict update under a lock (about a microsecond), so
+instrumenting the hot loop costs nothing noticeable; all formatting happens
+when /metrics is scraped. Counters and gauges can instead take a function
+evaluated at scrape time, for values another object already keeps (API
+budget used, breaker state, cache hits).
+
+main.py serves REGISTRY on METRICS_PORT; presence_monitor.py serves it at
+/metrics next to /status.
+"""
+import bisect
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Callable
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Seconds; covers a local classification up to a slow Gemini call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                 fn: Callable[[], float | dict[LabelValues, float]] | None = None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.fn = fn
+        self._values: dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _samples(self) -> dict[LabelValues, float]:
+        if self.fn is None:
+            with self._lock:
+                return dict(self._values)
+        values = self.fn()
+        return values if isinstance(values, dict) else {(): values}
+
+    def render(self) -> list[str]:
+        lines = []
+        for labels, value in sorted(self._samples().items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """A value that only goes up (or a function returning one)."""
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    """A value that can go up and down (or a function returning one)."""
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class _Timer:
+    def __init__(self, histogram: "Histogram", labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Histogram(Metric):
+    """Counts of observations in cumulative buckets, plus their sum."""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts with a final +Inf bucket, sum)
+        self._series: dict[LabelValues, tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._series[key] = (counts, total + value)
+
+    def time(self, **labels) -> _Timer:
+        """Context manager observing the seconds its block takes."""
+        return _Timer(self, labels)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+        lines = []
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    """The metrics a process exposes. Registering an existing name returns the existing metric."""
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is None:
+                self._metrics[metric.name] = metric
+                return metric
+        if type(existing) is not type(metric) or existing.label_names != metric.label_names:
+            raise ValueError(f"Metric {metric.name} is already registered with a different type or labels")
+        if metric.fn is not None:
+            existing.fn = metric.fn
+        return existing
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.render()
+            except Exception as e:
+                # A failing scrape-time function must not break the whole endpoint
+                samples = []
+                print(f"Failed to collect metric {metric.name}: {e}")
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labels: tuple[str, ...] = (), fn=None) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labels, fn))
+
+
+def gauge(name: str, documentation: str, labels: tuple[str, ...] = (), fn=None) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labels, fn))
+
+
+def histogram(name: str, documentation: str, labels: tuple[str, ...] = (),
+              buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labels, buckets))
+
+
+# Time spent in each stage of the check pipeline, shared by the modules that run them
+STAGE_SECONDS = histogram("garage_stage_seconds", "Time spent in each check pipeline stage", ("stage",))
+
+
+def write_response(handler: BaseHTTPRequestHandler, registry: Registry = REGISTRY):
+    """Answer an HTTP request with the registry's metrics."""
+    data = registry.render().encode("utf-8")
+    handler.send_response(200)
+    handler.send_header("Content-Type", CONTENT_TYPE)
+    handler.send_header("Content-Length", str(len(data)))
+    handler.end_headers()
+    handler.wfile.write(data)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        write_response(self)
+
+    def log_message(self, format, *args):
+        # suppress default logging to stdout
+        return
+
+
+class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
+    """Handle requests in a separate thread."""
+    daemon_threads = True
+
+
+def serve(port: int, host: str = "0.0.0.0") -> ThreadedHTTPServer:
+    """Serve /metrics from a background thread."""
+    server = ThreadedHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
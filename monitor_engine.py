@@ -0,0 +1,207 @@
+"""
+Asyncio engine for the garage monitor.
+
+The monitor is split into independent stages connected by queues:
+
+    presence poller -> scheduler -> classifier workers -> dataset writer
+                                                     \\-> notifier
+
+Each stage runs as its own task, and blocking work (HTTP, Gemini, disk)
+runs in worker threads via asyncio.to_thread. The check and notify stages
+are coroutines, so their retries back off with asyncio.sleep instead of
+holding a thread. A slow or retrying stage (e.g. Gemini 503 retries)
+therefore never stops presence polling or delays notifications behind
+dataset writes.
+
+Checks are per camera: the scheduler decides for every camera, and a
+bounded pool of classifier workers fetches and classifies frames for
+different cameras concurrently (at most one pending check per camera).
+Each decision carries the check's API priority, passed on to run_check.
+
+The scheduler sleeps until the next scheduled event (night check hours and
+daytime edges, see scheduler.py) or a presence update, whichever is first.
+Presence changes are pushed: the presence stage long-polls the presence
+service, so the scheduler reacts to a home -> out transition as soon as it
+is debounced rather than on the next polling tick. When the presence
+monitor runs in the same process, there is no presence stage: it calls
+publish_presence() directly instead.
+
+The engine only does the wiring; main.py supplies the stage functions.
+"""
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable
+
+# Upper bound on one scheduler sleep, so a wall-clock jump (NTP, suspend)
+# can't leave us asleep past the next event for long
+MAX_SCHEDULER_SLEEP_SECONDS = 3600
+
+
+@dataclass
+class CheckResult:
+    """Outcome of one door check, passed to the dataset and notify stages."""
+    door_status: Any
+    image_bytes: bytes
+    is_error: bool
+    source: str
+    camera: str
+
+
+class MonitorEngine:
+    """Runs the monitor stages as concurrent asyncio tasks."""
+
+    def __init__(self,
+                 poll_presence: Callable[[int | None], tuple[bool, list[str], int | None]] | None,
+                 decide: Callable[[bool], list[tuple[str, bool, str, str]]],
+                 run_check: Callable[[str, str], Awaitable[CheckResult]],
+                 save: Callable[[CheckResult], None],
+                 notify: Callable[[CheckResult], Awaitable[None]],
+                 interval: float,
+                 now: Callable[[], datetime],
+                 next_event: Callable[[datetime], tuple[datetime, str]] | None = None,
+                 workers: int = 1,
+                 queue_size: int = 100):
+        self.poll_presence = poll_presence
+        self.decide = decide
+        self.run_check = run_check
+        self.save = save
+        self.notify = notify
+        self.interval = interval
+        self.now = now
+        self.next_event = next_event
+        self.workers = workers
+        self.presence_updates: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.check_requests: asyncio.Queue = asyncio.Queue()
+        # Cameras with a check queued or running. One pending check per camera
+        # is enough: checks requested meanwhile would look at the same door
+        self.pending_checks: set[str] = set()
+        self.dataset_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.notify_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def _timestamp(self) -> str:
+        return self.now().strftime("%Y-%m-%d %H:%M:%S %Z")
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, item, name: str) -> bool:
+        """Put without waiting; log and drop the item if the queue is full."""
+        try:
+            queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            print(f"{name} queue full, dropping item")
+            return False
+
+    def publish_presence(self, someone_home: bool):
+        """Hand a presence update to the scheduler. Call from the engine's event loop."""
+        self._offer(self.presence_updates, someone_home, "Presence")
+
+    async def presence_task(self):
+        """Follow presence and publish updates to the scheduler.
+
+        poll_presence(version) long-polls the presence service and returns
+        as soon as a transition happens, along with the new state version.
+        If no version comes back (fallback pings), fall back to polling
+        every interval.
+        """
+        version = None
+        while True:
+            try:
+                someone_home, people, version = await asyncio.to_thread(self.poll_presence, version)
+                self.publish_presence(someone_home)
+            except Exception as e:
+                print(f"Presence poll failed: {e}")
+                version = None
+            if version is None:
+                await asyncio.sleep(self.interval)
+
+    def _seconds_until_next_event(self) -> float:
+        """How long the scheduler can sleep before the next scheduled event."""
+        if self.next_event is None:
+            return self.interval
+        now = self.now()
+        due, description = self.next_event(now)
+        # Elapsed seconds: subtracting datetimes that share a ZoneInfo gives the
+        # wall-clock difference, which is off by an hour across a DST change
+        wait = due.timestamp() - now.timestamp()
+        # Wake just after the event so the decision sees the new hour
+        return min(max(wait, 0) + 0.5, MAX_SCHEDULER_SLEEP_SECONDS)
+
+    async def scheduler_task(self):
+        """Decide whether a check is due when presence changes or a scheduled event is reached."""
+        someone_home = None
+        while True:
+            try:
+                timeout = self._seconds_until_next_event()
+                someone_home = await asyncio.wait_for(self.presence_updates.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                # Scheduled event reached; re-evaluate with the last known presence
+                if someone_home is None:
+                    continue
+            try:
+                print(f"[{self._timestamp()}] Checking conditions...")
+                for camera, should_check, reason, priority in self.decide(someone_home):
+                    print(f"  -> [{camera}] {reason}")
+                    if not should_check:
+                        continue
+                    if camera in self.pending_checks:
+                        print(f"  -> [{camera}] A door check is already pending")
+                        continue
+                    self.pending_checks.add(camera)
+                    self.check_requests.put_nowait((camera, reason, priority))
+            except Exception as e:
+                print(f"Unexpected error in scheduler: {e}")
+
+    async def classifier_task(self):
+        """Run queued door checks and fan results out to dataset and notify stages."""
+        while True:
+            camera, reason, priority = await self.check_requests.get()
+            print(f"[{camera}] Running door check ({reason})...")
+            try:
+                result = await self.run_check(camera, priority)
+            except Exception as e:
+                print(f"[{camera}] Unexpected error in door check: {e}")
+                continue
+            finally:
+                self.pending_checks.discard(camera)
+            self._offer(self.notify_queue, result, "Notification")
+            self._offer(self.dataset_queue, result, "Dataset")
+
+    async def dataset_task(self):
+        while True:
+            result = await self.dataset_queue.get()
+            try:
+                await asyncio.to_thread(self.save, result)
+            except Exception as e:
+                print(f"Failed to save to dataset: {e}")
+
+    async def notify_task(self):
+        while True:
+            result = await self.notify_queue.get()
+            try:
+                await self.notify(result)
+            except Exception as e:
+                print(f"Failed to send notification: {e}")
+
+    def _drain_dataset_queue(self):
+        """Hand results still waiting for the dataset stage to save() on shutdown."""
+        while not self.dataset_queue.empty():
+            result = self.dataset_queue.get_nowait()
+            try:
+                self.save(result)
+            except Exception as e:
+                print(f"Failed to save to dataset: {e}")
+
+    async def run(self):
+        """Run all stages until cancelled."""
+        try:
+            async with asyncio.TaskGroup() as tg:
+                if self.poll_presence is not None:
+                    tg.create_task(self.presence_task())
+                tg.create_task(self.scheduler_task())
+                for _ in range(self.workers):
+                    tg.create_task(self.classifier_task())
+                tg.create_task(self.dataset_task())
+                tg.create_task(self.notify_task())
+        finally:
+            self._drain_dataset_queue()
@@ -1,67 +1,93 @@
 #!/usr/bin/env python3
 """
 Presence monitor process
-- Pings configured phone IPs at regular intervals
+- Pings configured phone IPs at regular intervals (all phones concurrently)
 - Debounces per-device state (requires N consistent changes to flip)
 - Logs state changes
-- Serves current debounced state via a simple HTTP endpoint
+- Serves current debounced state via a simple HTTP endpoint, with long-polling
+  (`/status?since=<version>`) so clients hear about transitions immediately
+- Serves Prometheus metrics (ping RTT/failures, presence) at `/metrics`
 
-Run this separately (or via systemd) alongside `main.py`.
+Run this separately (or via systemd) alongside `main.py`, or inside it with
+`main.py --with-presence`: then the door checks hear about transitions through
+add_listener() callbacks instead of HTTP, and both share one event loop.
 """
+import asyncio
 import json
 import logging
 import threading
-import time
 from http.server import HTTPServer, BaseHTTPRequestHandler
 from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qs
 from datetime import datetime
-import subprocess
+from typing import Callable
 from zoneinfo import ZoneInfo
 
 import config
+import metrics
+from presence_probe import probe_all_async
 
 LOG = logging.getLogger("presence_monitor")
 LOG.setLevel(logging.INFO)
-# File handler
-file_handler = logging.FileHandler(config.PRESENCE_LOG_FILE)
-file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s: %(message)s"))
-LOG.addHandler(file_handler)
-# Console handler
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s: %(message)s"))
-LOG.addHandler(console_handler)
 
 # In-memory state
 state_lock = threading.Lock()
+# Notified (under state_lock) whenever a debounced transition bumps state_version
+state_changed = threading.Condition(state_lock)
+state_version = 0
 people_state = {name: {"is_home": True, "counter": 0, "last_changed": None} for name in config.PHONE_IPS}
 # default to True (assume home) so first "nobody home" will trigger a check in main process
 
 last_overall_change = None
-
-
-def ping_host(ip: str) -> bool:
-    try:
-        result = subprocess.run(["ping", "-c", "1", "-W", "1", ip], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=3)
-        return result.returncode == 0
-    except Exception:
-        return False
+# Called with status_payload() after every overall transition (in-process clients)
+listeners: list[Callable[[dict], None]] = []
+
+TRANSITIONS = metrics.counter("presence_transitions_total", "Debounced presence changes", ("person",))
+SWEEP_SECONDS = metrics.histogram("presence_sweep_seconds", "Time to ping all devices once")
+metrics.gauge("presence_is_home", "Debounced presence per person (1 = home)", ("person",),
+              fn=lambda: {(name,): float(info["is_home"]) for name, info in people_state.items()})
+metrics.gauge("presence_state_version", "Number of debounced presence transitions so far",
+              fn=lambda: state_version)
+
+
+def status_payload() -> dict:
+    """Current debounced state as a JSON-able dict. Call with state_lock held."""
+    people = [name for name, info in people_state.items() if info["is_home"]]
+    overall = len(people) > 0
+    return {
+        "someone_home": overall,
+        "people_home": people,
+        "version": state_version,
+        "last_changed": last_overall_change.isoformat() if last_overall_change else None,
+        "per_person": {name: {"is_home": info["is_home"], "last_changed": info["last_changed"].isoformat() if info["last_changed"] else None} for name, info in people_state.items()}
+    }
 
 
 class StatusHandler(BaseHTTPRequestHandler):
     def do_GET(self):
-        if self.path != "/status":
+        url = urlsplit(self.path)
+        if url.path == "/metrics":
+            metrics.write_response(self)
+            return
+        if url.path != "/status":
             self.send_response(404)
             self.end_headers()
             return
-        with state_lock:
-            people = [name for name, info in people_state.items() if info["is_home"]]
-            overall = len(people) > 0
-            payload = {
-                "someone_home": overall,
-                "people_home": people,
-                "last_changed": last_overall_change.isoformat() if last_overall_change else None,
-                "per_person": {name: {"is_home": info["is_home"], "last_changed": info["last_changed"].isoformat() if info["last_changed"] else None} for name, info in people_state.items()}
-            }
+        query = parse_qs(url.query)
+        try:
+            since = int(query["since"][0]) if "since" in query else None
+            wait = min(float(query.get("timeout", [config.PRESENCE_LONGPOLL_MAX_SECONDS])[0]),
+                       config.PRESENCE_LONGPOLL_MAX_SECONDS)
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        with state_changed:
+            if since is not None:
+                # Long-poll: hold the request until the next transition (or timeout). Any other
+                # version answers at once: after a restart the version starts over below `since`
+                state_changed.wait_for(lambda: state_version != since, timeout=wait)
+            payload = status_payload()
         data = json.dumps(payload).encode("utf-8")
         self.send_response(200)
         self.send_header("Content-Type", "application/json")
@@ -74,36 +100,57 @@ class StatusHandler(BaseHTTPRequestHandler):
         return
 
 
-def monitor_loop():
-    global last_overall_change
-    debounce = config.PRESENCE_DEBOUNCE
-    interval = config.PRESENCE_PING_INTERVAL
+def add_listener(callback: Callable[[dict], None]):
+    """Call `callback(status_payload())` after every transition. Runs on the monitor loop's thread."""
+    listeners.append(callback)
+
+
+def record_sweep(reachable: dict[str, bool]) -> dict | None:
+    """Debounce one sweep's results. Returns the new status if the overall state changed."""
+    global last_overall_change, state_version
+    any_change = False
+    for name, ok in reachable.items():
+        with state_lock:
+            info = people_state[name]
+            current = info["is_home"]
+            if ok == current:
+                # reset counter
+                info["counter"] = 0
+            else:
+                info["counter"] += 1
+                if info["counter"] >= config.PRESENCE_DEBOUNCE:
+                    # flip state
+                    info["is_home"] = ok
+                    info["last_changed"] = datetime.now(ZoneInfo(config.LOCAL_TIMEZONE))
+                    info["counter"] = 0
+                    any_change = True
+                    TRANSITIONS.inc(person=name)
+                    LOG.info(f"Presence change: {name} is_home={info['is_home']}")
+    if not any_change:
+        return None
+    with state_changed:
+        last_overall_change = datetime.now(ZoneInfo(config.LOCAL_TIMEZONE))
+        state_version += 1
+        state_changed.notify_all()
+        payload = status_payload()
+    LOG.info(f"Overall presence: someone_home={payload['someone_home']}, people={payload['people_home']}")
+    return payload
+
+
+async def monitor_loop(interval: float = config.PRESENCE_PING_INTERVAL):
+    """Ping all phones every `interval` seconds and publish debounced transitions."""
     LOG.info("Monitor loop started")
     while True:
-        any_change = False
-        for name, ip in config.PHONE_IPS.items():
-            ok = ping_host(ip)
-            with state_lock:
-                info = people_state[name]
-                current = info["is_home"]
-                if ok == current:
-                    # reset counter
-                    info["counter"] = 0
-                else:
-                    info["counter"] += 1
-                    if info["counter"] >= debounce:
-                        # flip state
-                        info["is_home"] = ok
-                        info["last_changed"] = datetime.now(ZoneInfo(config.LOCAL_TIMEZONE))
-                        info["counter"] = 0
-                        any_change = True
-                        LOG.info(f"Presence change: {name} is_home={info['is_home']}")
-        if any_change:
-            with state_lock:
-                people = [n for n, info in people_state.items() if info["is_home"]]
-                last_overall_change = datetime.now(ZoneInfo(config.LOCAL_TIMEZONE))
-                LOG.info(f"Overall presence: someone_home={len(people) > 0}, people={people}")
-        time.sleep(interval)
+        with SWEEP_SECONDS.time():
+            reachable = await probe_all_async(config.PHONE_IPS)
+        payload = record_sweep(reachable)
+        if payload is not None:
+            for callback in listeners:
+                try:
+                    callback(payload)
+                except Exception as e:
+                    LOG.error(f"Presence listener failed: {e}")
+        await asyncio.sleep(interval)
 
 
 class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
@@ -111,20 +158,44 @@ class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
     daemon_threads = True
 
 
-def run_http_server():
-    server_address = ("0.0.0.0", config.PRESENCE_API_PORT)
+def start_http_server(port: int = config.PRESENCE_API_PORT) -> ThreadedHTTPServer:
+    """Serve /status and /metrics from a background thread."""
+    server_address = ("0.0.0.0", port)
     httpd = ThreadedHTTPServer(server_address, StatusHandler)
-    LOG.info(f"Presence HTTP server listening on http://{server_address[0]}:{server_address[1]}/status")
-    httpd.serve_forever()
+    threading.Thread(target=httpd.serve_forever, name="presence-http", daemon=True).start()
+    LOG.info(f"Presence HTTP server listening on http://{server_address[0]}:{server_address[1]}/status (and /metrics)")
+    return httpd
 
 
-def main():
-    LOG.info("Starting presence monitor")
+def setup_logging():
+    """Log to PRESENCE_LOG_FILE and the console (when running the monitor, not on import)."""
+    if LOG.handlers:
+        return
+    formatter = logging.Formatter("%(asctime)s %(levelname)s: %(message)s")
+    # File handler
+    file_handler = logging.FileHandler(config.PRESENCE_LOG_FILE)
+    file_handler.setFormatter(formatter)
+    LOG.addHandler(file_handler)
+    # Console handler
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    LOG.addHandler(console_handler)
+
+
+def log_settings():
     LOG.info(f"Ping interval: {config.PRESENCE_PING_INTERVAL}s, Debounce: {config.PRESENCE_DEBOUNCE} checks")
     LOG.info(f"Monitoring: {list(config.PHONE_IPS.keys())}")
-    t = threading.Thread(target=monitor_loop, daemon=True)
-    t.start()
-    run_http_server()
+
+
+def main():
+    setup_logging()
+    LOG.info("Starting presence monitor")
+    log_settings()
+    start_http_server()
+    try:
+        asyncio.run(monitor_loop())
+    except KeyboardInterrupt:
+        LOG.info("Shutting down presence monitor")
 
 
 if __name__ == "__main__":
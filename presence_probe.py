@@ -0,0 +1,80 @@
+"""
+Concurrent presence probing.
+
+Pings every configured device at once using an asyncio subprocess fan-out,
+so one sweep takes a single timeout no matter how many phones are tracked.
+Used by presence_monitor.py and by main.py's fallback when the presence
+service is unreachable. Round-trip times and failures are recorded per
+device (see metrics.py).
+"""
+import asyncio
+import math
+import re
+import subprocess
+import time
+
+import config
+import metrics
+
+# "time=12.3 ms" in ping's reply line
+PING_TIME = re.compile(rb"time[=<]([\d.]+) ?ms")
+
+PING_RTT_SECONDS = metrics.histogram("presence_ping_rtt_seconds", "Ping round-trip time of reachable devices",
+                                     ("device",), buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2))
+PING_FAILURES = metrics.counter("presence_ping_failures_total", "Pings that got no reply", ("device",))
+
+
+async def _ping(ip: str, timeout: float) -> float | None:
+    """Ping once. Returns the round-trip time in seconds, or None if there was no reply."""
+    started = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        "ping", "-c", "1", "-W", str(max(1, math.ceil(timeout))), ip,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        output, _ = await proc.communicate()
+    except asyncio.CancelledError:
+        # Sweep deadline hit: don't leave the ping process behind
+        proc.kill()
+        await proc.wait()
+        raise
+    if proc.returncode != 0:
+        return None
+    match = PING_TIME.search(output)
+    # Fall back to the process's run time if the output has no time
+    return float(match.group(1)) / 1000 if match else time.perf_counter() - started
+
+
+async def probe_all_async(hosts: dict[str, str], timeout: float = config.PRESENCE_PROBE_TIMEOUT) -> dict[str, bool]:
+    """Ping all hosts concurrently. Returns {name: reachable}.
+
+    The whole sweep is bounded by `timeout`; hosts that haven't answered by
+    then count as unreachable.
+    """
+    if not hosts:
+        return {}
+    tasks = {name: asyncio.create_task(_ping(ip, timeout)) for name, ip in hosts.items()}
+    done, pending = await asyncio.wait(tasks.values(), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    results = {}
+    for name, task in tasks.items():
+        rtt = task.result() if task in done and not task.cancelled() and task.exception() is None else None
+        results[name] = rtt is not None
+        if rtt is None:
+            PING_FAILURES.inc(device=name)
+        else:
+            PING_RTT_SECONDS.observe(rtt, device=name)
+    return results
+
+
+def probe_all(hosts: dict[str, str], timeout: float = config.PRESENCE_PROBE_TIMEOUT) -> dict[str, bool]:
+    """Blocking wrapper around probe_all_async (for threads without an event loop)."""
+    try:
+        return asyncio.run(probe_all_async(hosts, timeout))
+    except Exception:
+        return {name: False for name in hosts}
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Perceptual-hash result cache for door classifications.
+
+Results are keyed by the dHash of the camera frame, so repeated scenes
+(the usual daytime view, the same scene at night) are answered from cache
+instead of a Gemini round trip. Frames without enough structure to tell an
+open door from a shut one (a black frame) are never cached or matched. Entries expire after a TTL and the least
+recently used entries are evicted once the cache is full. The cache is
+persisted to a small JSON file so a service restart doesn't start cold.
+
+Run directly to inspect the on-disk cache:
+    uv run result_cache.py
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import config
+from image_features import dhash, hamming_distance, is_featureless
+
+SCRIPT_DIR = Path(__file__).parent
+CACHE_PATH = SCRIPT_DIR / config.RESULT_CACHE_PATH
+# Bump when the hash changes, so entries keyed on an old hash are dropped
+CACHE_VERSION = 2
+
+
+class ResultCache:
+    """TTL + LRU cache keyed on perceptual image hashes, persisted to disk."""
+
+    def __init__(self,
+                 path: Path | None = CACHE_PATH,
+                 ttl_seconds: float = config.RESULT_CACHE_TTL_SECONDS,
+                 max_entries: int = config.RESULT_CACHE_MAX_ENTRIES,
+                 max_distance: int = config.RESULT_CACHE_MAX_HAMMING_DISTANCE):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        # hash -> (stored_at, value); ordered from least to most recently used
+        self.entries: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # get() and put() run in worker threads
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def key_for(image_bytes: bytes) -> int:
+        return dhash(image_bytes)
+
+    def _find(self, key: int) -> int | None:
+        """Find the stored key for `key`, allowing a small Hamming distance."""
+        if key in self.entries:
+            return key
+        best, best_distance = None, self.max_distance + 1
+        for stored in self.entries:
+            distance = hamming_distance(key, stored)
+            if distance < best_distance:
+                best, best_distance = stored, distance
+        return best
+
+    def _expire(self, now: float):
+        expired = [k for k, (stored_at, _) in self.entries.items() if now - stored_at > self.ttl_seconds]
+        for k in expired:
+            del self.entries[k]
+
+    def get(self, image_bytes: bytes) -> dict | None:
+        """Return the cached value for a frame, or None on a miss."""
+        key = self.key_for(image_bytes)
+        with self._lock:
+            self._expire(time.time())
+            stored = self._find(key) if not is_featureless(key) else None
+            if stored is None:
+                self.misses += 1
+                return None
+            # Recency and hit counts are written with the next put()
+            self.entries.move_to_end(stored)
+            self.hits += 1
+            return self.entries[stored][1]
+
+    def put(self, image_bytes: bytes, value: dict):
+        """Store a value for a frame and persist the cache."""
+        key = self.key_for(image_bytes)
+        if is_featureless(key):
+            return
+        with self._lock:
+            self.entries[key] = (time.time(), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.save()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _load(self):
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable result cache {self.path}: {e}")
+            return
+        if data.get("version") != CACHE_VERSION:
+            print(f"Ignoring result cache {self.path} from an older version")
+            return
+        for key, stored_at, value in data.get("entries", []):
+            self.entries[int(key, 16)] = (stored_at, value)
+        self.hits = data.get("hits", 0)
+        self.misses = data.get("misses", 0)
+        self._expire(time.time())
+
+    def save(self):
+        """Write the cache atomically (write temp file, then rename)."""
+        if self.path is None:
+            return
+        data = {
+            "version": CACHE_VERSION,
+            "entries": [[f"{k:032x}", stored_at, value] for k, (stored_at, value) in self.entries.items()],
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(data))
+        os.replace(tmp_path, self.path)
+
+
+if __name__ == "__main__":
+    cache = ResultCache()
+    print(f"Result cache at {cache.path}")
+    for name, value in cache.stats().items():
+        print(f"  {name}: {value}")
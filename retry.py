@@ -0,0 +1,99 @@
+"""
+Retry policies with exponential backoff, jitter and an overall deadline.
+
+Each dependency (camera, Gemini, ntfy) gets its own policy, configured in
+config.py, with its own idea of which errors are worth retrying. Retries
+wait with asyncio.sleep, so a dependency that is down never blocks the
+monitor loop, and the backoff starts short so we recover as soon as the
+service does.
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+
+import requests
+from google.genai import errors as genai_errors
+
+import metrics
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: rate limiting and server-side trouble
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+RETRIES = metrics.counter("garage_retries_total", "Failed attempts that were retried", ("dependency",))
+GIVE_UPS = metrics.counter("garage_retry_give_ups_total", "Retry policies that ran out of attempts or time",
+                           ("dependency",))
+
+
+class RetryError(Exception):
+    """Raised when a policy gives up (attempts or deadline exhausted)."""
+
+
+def is_retryable_http_error(e: Exception) -> bool:
+    """Connection problems, timeouts and 429/5xx responses (camera, ntfy)."""
+    if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(e, requests.exceptions.HTTPError) and e.response is not None:
+        return e.response.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def is_retryable_gemini_error(e: Exception) -> bool:
+    """Gemini overload/rate limiting (503, 429, other 5xx) and network errors."""
+    if isinstance(e, genai_errors.APIError):
+        return e.code in RETRYABLE_STATUS_CODES
+    # The genai client uses httpx underneath; its transport errors are OSError
+    # subclasses or carry "timeout"/"connect" in their type name
+    name = type(e).__name__.lower()
+    return isinstance(e, (OSError, TimeoutError)) or "timeout" in name or "connect" in name
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    name: str
+    retry_on: Callable[[Exception], bool]
+    max_attempts: int
+    base_delay: float
+    max_delay: float
+    deadline: float
+    multiplier: float = 2.0
+    jitter: float = 0.5  # each delay is randomly shortened by up to this fraction
+
+    def delay_for(self, attempt: int) -> float:
+        """Backoff before retry number `attempt` (1-based)."""
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
+
+    async def run(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Await `attempt()` until it succeeds, retrying retryable errors.
+
+        Non-retryable errors propagate immediately. When attempts or the
+        deadline run out, raises RetryError chained to the last error. The
+        deadline also bounds an attempt in progress: a hung attempt is
+        cancelled when it passes.
+        """
+        start = time.monotonic()
+        for n in range(1, self.max_attempts + 1):
+            deadline = asyncio.timeout(max(0.0, self.deadline - (time.monotonic() - start)))
+            try:
+                async with deadline:
+                    return await attempt()
+            except Exception as e:
+                elapsed = time.monotonic() - start
+                if deadline.expired():
+                    GIVE_UPS.inc(dependency=self.name)
+                    raise RetryError(f"{self.name} gave no answer within {self.deadline:.0f}s "
+                                     f"(attempt {n})") from e
+                if not self.retry_on(e):
+                    raise
+                delay = self.delay_for(n)
+                if n == self.max_attempts or elapsed + delay > self.deadline:
+                    GIVE_UPS.inc(dependency=self.name)
+                    raise RetryError(f"{self.name} unavailable after {n} attempts over {elapsed:.0f}s: {e}") from e
+                RETRIES.inc(dependency=self.name)
+                print(f"{self.name} attempt {n}/{self.max_attempts} failed ({e}). Retrying in {delay:.1f}s...")
+                await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
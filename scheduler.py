@@ -0,0 +1,80 @@
+"""
+Event-driven check scheduling.
+
+Night checks happen at known wall-clock hours and the daytime window has
+fixed edges, so instead of re-evaluating the schedule on a fixed tick we
+compute the upcoming events ahead of time and keep them in a heap. The
+monitor engine sleeps until the earliest one (or until a presence event
+arrives).
+
+All times are timezone-aware in LOCAL_TIMEZONE. Wall-clock times that fall
+in a DST gap move forward to the first valid instant, and ambiguous times
+(the repeated hour when clocks go back) resolve to their first occurrence,
+so every night check happens exactly once.
+
+A "night cycle" runs from one DAYTIME_START to the next and is identified
+by the date it starts on, so the 8pm..4am checks of one night belong
+together regardless of midnight.
+"""
+import heapq
+from datetime import date, datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+
+def localize(naive: datetime, tz: ZoneInfo) -> datetime:
+    """Attach `tz` to a wall-clock time, normalizing times in a DST gap."""
+    aware = naive.replace(tzinfo=tz, fold=0)
+    return aware.astimezone(timezone.utc).astimezone(tz)
+
+
+def night_cycle(now: datetime, daytime_start: time) -> date:
+    """The night cycle `now` belongs to (date of the most recent DAYTIME_START)."""
+    wall = now.replace(tzinfo=None)
+    if wall.time() < daytime_start:
+        return wall.date() - timedelta(days=1)
+    return wall.date()
+
+
+def night_check_times(cycle: date, night_check_hours, daytime_start: time, tz: ZoneInfo) -> dict[int, datetime]:
+    """When each night check hour falls in the given night cycle."""
+    times = {}
+    for hour in night_check_hours:
+        day = cycle if time(hour) >= daytime_start else cycle + timedelta(days=1)
+        times[hour] = localize(datetime.combine(day, time(hour)), tz)
+    return times
+
+
+class CheckScheduler:
+    """Heap of upcoming schedule events (night checks and daytime edges)."""
+
+    def __init__(self, night_check_hours, daytime_start: time, daytime_end: time, tz: ZoneInfo):
+        self.night_check_hours = sorted(set(night_check_hours))
+        self.daytime_start = daytime_start
+        self.daytime_end = daytime_end
+        self.tz = tz
+        self._heap: list[tuple[datetime, str]] = []
+        self._scheduled_until: date | None = None
+
+    def _schedule_cycle(self, cycle: date):
+        for hour, due in night_check_times(cycle, self.night_check_hours, self.daytime_start, self.tz).items():
+            heapq.heappush(self._heap, (due, f"Night check at {hour}:00"))
+        heapq.heappush(self._heap, (localize(datetime.combine(cycle, self.daytime_start), self.tz), "Daytime starts"))
+        heapq.heappush(self._heap, (localize(datetime.combine(cycle, self.daytime_end), self.tz), "Daytime ends"))
+
+    def next_event(self, now: datetime) -> tuple[datetime, str]:
+        """The earliest event strictly after `now` as (due, description)."""
+        cycle = night_cycle(now, self.daytime_start)
+        if self._scheduled_until is None or self._scheduled_until < cycle:
+            # First call, or the clock jumped past everything we scheduled
+            self._heap.clear()
+            self._scheduled_until = cycle - timedelta(days=1)
+        while True:
+            # Keep at least one full cycle ahead in the heap
+            while self._scheduled_until <= cycle:
+                self._scheduled_until += timedelta(days=1)
+                self._schedule_cycle(self._scheduled_until)
+            while self._heap and self._heap[0][0] <= now:
+                heapq.heappop(self._heap)
+            if self._heap:
+                return self._heap[0]
+            cycle += timedelta(days=1)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Discrete-event simulator for the check schedule and API budget.
+
+Runs the real scheduling code (PresenceTracker, ApiRateLimiter,
+should_run_door_check and CheckScheduler from main.py/scheduler.py) against
+a simulated clock: instead of sleeping, the clock jumps from one event to
+the next (presence changes and scheduled events, the same events the monitor
+engine wakes up for). Weeks of presence, including DST transitions, run in a
+fraction of a second.
+
+Every check is assumed to cost one Gemini call (no local model or result
+cache), so the numbers are what a policy would spend at most. Each policy
+(night check hours x daily API budget) reports its checks, API calls, and
+the night checks and home -> out transitions it missed (for lack of budget).
+
+Usage:
+    uv run simulate.py                                  # 4 synthetic weeks across a DST change
+    uv run simulate.py --presence-log presence.log      # replay recorded presence
+    uv run simulate.py --night-hours 20,22,0,4 21,1 --budgets 20 10 6
+"""
+import argparse
+import contextlib
+import io
+import re
+import sys
+import time as time_module
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import config
+from cameras import CameraConfig
+from main import ApiRateLimiter, CameraMonitor, API_RECHECK_HEADROOM, is_daytime, should_run_door_check
+from scheduler import CheckScheduler, localize, night_check_times, night_cycle
+
+TZ = ZoneInfo(config.LOCAL_TIMEZONE)
+# Synthetic weekday: (hour, someone_home) presence changes
+DEFAULT_DAY = [(8.0, False), (12.5, True), (13.25, False), (17.75, True), (19.0, False), (20.5, True)]
+PRESENCE_LOG_LINE = re.compile(r"^(\S+ \S+) INFO: Overall presence: someone_home=(True|False)")
+# The monitor engine wakes just after a scheduled event
+WAKE_DELAY = timedelta(seconds=0.5)
+
+
+class SimulatedClock:
+    """A clock that only moves when told to. Call it for the current local time."""
+
+    def __init__(self, start: datetime):
+        self.now = start
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def advance_to(self, when: datetime):
+        self.now = max(self.now, when.astimezone(TZ))
+
+
+@dataclass
+class Policy:
+    night_check_hours: list[int]
+    max_api_calls_per_day: int
+
+
+@dataclass
+class SimulationResult:
+    policy: Policy
+    days: float
+    checks: Counter = field(default_factory=Counter)  # by priority
+    api_calls: int = 0
+    missed_night_checks: int = 0
+    missed_transitions: int = 0
+
+    @property
+    def calls_per_day(self) -> float:
+        return self.api_calls / self.days
+
+
+def load_presence_log(path: Path, tz: ZoneInfo = TZ) -> list[tuple[datetime, bool]]:
+    """(time, someone_home) overall presence changes from a presence monitor log."""
+    changes = []
+    for line in path.read_text().splitlines():
+        match = PRESENCE_LOG_LINE.match(line)
+        if match:
+            when = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S,%f")
+            changes.append((localize(when, tz), match.group(2) == "True"))
+    if not changes:
+        raise ValueError(f"No presence changes found in {path}")
+    return changes
+
+
+def synthetic_presence(start: date, days: int, tz: ZoneInfo = TZ,
+                       day: list[tuple[float, bool]] = DEFAULT_DAY) -> list[tuple[datetime, bool]]:
+    """`day`'s presence changes repeated for `days` days from `start` (wall-clock times)."""
+    changes = []
+    for i in range(days):
+        for hour, someone_home in day:
+            wall = datetime.combine(start + timedelta(days=i), time(int(hour), int(hour % 1 * 60)))
+            changes.append((localize(wall, tz), someone_home))
+    return changes
+
+
+def simulate(policy: Policy, presence: list[tuple[datetime, bool]], start: datetime, end: datetime,
+             workdir: Path = Path("simulation")) -> SimulationResult:
+    """Run one policy from `start` to `end` with the given presence changes."""
+    # Just before `start`, so an event due exactly at `start` still happens
+    clock = SimulatedClock(start - WAKE_DELAY)
+    limiter = ApiRateLimiter(policy.max_api_calls_per_day, recheck_headroom=API_RECHECK_HEADROOM, clock=clock)
+    # No local model, so every check needs (and is budgeted for) a Gemini call
+    camera = CameraConfig(name="simulated", url="", stream_url=None, title="Simulated door", ntfy_topic="",
+                          dataset_dir=workdir, model_path=workdir / "no_model.npz",
+                          result_cache_path=workdir / "no_cache.json")
+    monitor = CameraMonitor(camera, limiter, None, clock=clock, night_check_hours=policy.night_check_hours)
+    scheduler = CheckScheduler(policy.night_check_hours, config.DAYTIME_START, config.DAYTIME_END, TZ)
+    result = SimulationResult(policy, (end - start).total_seconds() / 86400)
+
+    presence = sorted(change for change in presence if start <= change[0] < end)
+    someone_home = True  # the presence service starts out assuming everyone is home
+    departures = 0
+    i = 0
+    while True:
+        due, _ = scheduler.next_event(clock())
+        if i < len(presence) and presence[i][0] <= due + WAKE_DELAY:
+            when, now_home = presence[i]
+            i += 1
+        else:
+            when, now_home = due + WAKE_DELAY, someone_home
+        if when >= end:
+            break
+        clock.advance_to(when)
+        if someone_home and not now_home and is_daytime(clock):
+            departures += 1
+        someone_home = now_home
+
+        should_check, reason, priority = should_run_door_check(monitor, someone_home)
+        if should_check:
+            result.checks[priority] += 1
+            limiter.record_api_call()
+            result.api_calls += 1
+
+    result.missed_night_checks = scheduled_night_checks(policy.night_check_hours, start, end) - result.checks["night"]
+    result.missed_transitions = departures - result.checks["transition"]
+    return result
+
+
+def scheduled_night_checks(night_check_hours: list[int], start: datetime, end: datetime) -> int:
+    """How many night checks are due in [start, end)."""
+    count = 0
+    cycle = night_cycle(start, config.DAYTIME_START) - timedelta(days=1)
+    while cycle <= end.date():
+        times = night_check_times(cycle, night_check_hours, config.DAYTIME_START, TZ)
+        count += sum(start <= due < end for due in times.values())
+        cycle += timedelta(days=1)
+    return count
+
+
+def report(results: list[SimulationResult]):
+    print(f"{'night hours':<16} {'budget':>6} {'night':>6} {'transition':>10} {'calls/day':>9} "
+          f"{'missed night':>12} {'missed transition':>17}")
+    for result in results:
+        hours = ",".join(str(hour) for hour in result.policy.night_check_hours)
+        print(f"{hours:<16} {result.policy.max_api_calls_per_day:>6} {result.checks['night']:>6} "
+              f"{result.checks['transition']:>10} {result.calls_per_day:>9.2f} {result.missed_night_checks:>12} "
+              f"{result.missed_transitions:>17}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--presence-log", help="presence monitor log to replay (default: synthetic days)")
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2026, 3, 1),
+                        help="first day of the synthetic scenario (default spans a DST change)")
+    parser.add_argument("--days", type=int, default=28)
+    parser.add_argument("--night-hours", nargs="+",
+                        default=[",".join(str(hour) for hour in config.NIGHT_CHECK_HOURS)],
+                        help="night check hour lists to compare, e.g. 20,22,0,4 21,1")
+    parser.add_argument("--budgets", nargs="+", type=int, default=[config.MAX_API_CALLS_PER_DAY],
+                        help="daily API budgets to compare")
+    parser.add_argument("--verbose", action="store_true", help="show the monitor's own output")
+    args = parser.parse_args()
+
+    if args.presence_log:
+        presence = load_presence_log(Path(args.presence_log))
+        start = presence[0][0].replace(hour=0, minute=0, second=0, microsecond=0)
+        end = presence[-1][0].replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    else:
+        presence = synthetic_presence(args.start, args.days)
+        start = localize(datetime.combine(args.start, time()), TZ)
+        end = localize(datetime.combine(args.start + timedelta(days=args.days), time()), TZ)
+
+    policies = [Policy([int(hour) for hour in hours.split(",")], budget)
+                for hours in args.night_hours for budget in args.budgets]
+    started = time_module.perf_counter()
+    # The monitor logs every decision; keep the report readable unless asked
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        results = [simulate(policy, presence, start, end) for policy in policies]
+    elapsed = time_module.perf_counter() - started
+
+    print(f"Simulated {(end - start).days} days ({start.date()} to {end.date()}, {config.LOCAL_TIMEZONE}), "
+          f"{len(policies)} policies in {elapsed:.2f}s\n")
+    report(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
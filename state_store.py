@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Crash-safe key/value store for monitor state that must survive restarts.
+
+The API rate limiter and the presence tracker keep their state here (daily
+call count, completed night checks, last presence), so a systemd restart
+doesn't reset the budget, repeat a night check or miss a transition.
+
+Backed by SQLite in WAL mode: each write is a small transaction that only
+appends to the write-ahead log, cheap enough to run on every loop tick, and
+a crash mid-write leaves the previous value intact. Values are JSON.
+
+Run directly to dump the stored state:
+    uv run state_store.py
+"""
+import json
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import config
+
+SCRIPT_DIR = Path(__file__).parent
+STATE_DB_PATH = SCRIPT_DIR / config.STATE_DB_PATH
+
+
+class StateStore:
+    """JSON values by key in a SQLite database (WAL mode)."""
+
+    def __init__(self, path: Path | str = STATE_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        # timeout: how long to wait for another process holding the write lock
+        self._db = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only risks the last commits on power loss (never
+        # corruption), and avoids an fsync per write
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO state (key, value, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                (key, json.dumps(value), time.time()),
+            )
+
+    def update(self, key: str, fn: Callable[[Any], Any], default: Any = None) -> Any:
+        """Atomically replace the value with fn(current value) and return it.
+
+        Runs in one IMMEDIATE transaction, which takes SQLite's write lock on
+        the database file, so read-modify-write is atomic across processes too.
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+                value = fn(json.loads(row[0]) if row else default)
+                self._db.execute(
+                    "INSERT INTO state (key, value, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at",
+                    (key, json.dumps(value), time.time()),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return value
+
+    def items(self) -> dict[str, Any]:
+        with self._lock:
+            rows = self._db.execute("SELECT key, value FROM state ORDER BY key").fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def main():
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else STATE_DB_PATH
+    if not path.exists():
+        print(f"No state database at {path}")
+        return 1
+    store = StateStore(path)
+    for key, value in store.items().items():
+        print(f"{key}: {value}")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,6 +11,7 @@ echo "Installing systemd service files..."
 # Copy service files
 sudo cp "$SCRIPT_DIR/presence-monitor.service" "$SERVICE_DIR/"
 sudo cp "$SCRIPT_DIR/garage-monitor.service" "$SERVICE_DIR/"
+sudo cp "$SCRIPT_DIR/garage-monitor-combined.service" "$SERVICE_DIR/"
 
 echo "Service files installed."
 echo ""
@@ -30,6 +31,9 @@ echo "   sudo systemctl daemon-reload"
 echo "   sudo systemctl enable presence-monitor"
 echo "   sudo systemctl enable garage-monitor"
 echo ""
+echo "   (or, on small hardware, run both in one process instead:"
+echo "    sudo systemctl enable garage-monitor-combined)"
+echo ""
 echo "4. Start services:"
 echo "   sudo systemctl start presence-monitor"
 echo "   sudo systemctl start garage-monitor"
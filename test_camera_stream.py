@@ -0,0 +1,161 @@
+"""
+Tests for the persistent MJPEG camera stream: splitting a multipart byte
+stream into frames however it is chunked, and the background reader keeping
+the newest frame from a local stand-in camera.
+"""
+
+import io
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+from camera_stream import CameraStream, iter_mjpeg_frames
+
+BOUNDARY = b"frame"
+
+
+def jpeg(shade: int) -> bytes:
+    image = Image.new("RGB", (64, 48), (shade, shade, shade))
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def jpeg_with_embedded_eoi(shade: int) -> bytes:
+    """A JPEG whose EXIF-like APP1 segment contains an end-of-image marker, as an embedded thumbnail would."""
+    data = jpeg(shade)
+    payload = b"Exif\x00\x00thumb\xff\xd8\x00\x01\xff\xd9"
+    app1 = b"\xff\xe1" + (len(payload) + 2).to_bytes(2, "big") + payload
+    return data[:2] + app1 + data[2:]
+
+
+def multipart(frames: list[bytes], content_length: bool = True) -> bytes:
+    parts = []
+    for frame in frames:
+        header = b"--" + BOUNDARY + b"\r\nContent-Type: image/jpeg\r\n"
+        if content_length:
+            header += b"Content-Length: " + str(len(frame)).encode() + b"\r\n"
+        parts.append(header + b"\r\n" + frame + b"\r\n")
+    return b"".join(parts)
+
+
+def split_randomly(data: bytes, rng: random.Random) -> list[bytes]:
+    chunks, pos = [], 0
+    while pos < len(data):
+        size = rng.randint(1, 700)
+        chunks.append(data[pos:pos + size])
+        pos += size
+    return chunks
+
+
+def test_frame_splitting():
+    """Frames come out whole and in order, wherever the chunk boundaries fall."""
+    print("=" * 60)
+    print("TEST: MJPEG Frame Splitting")
+    print("=" * 60)
+
+    frames = [jpeg(shade) for shade in (0, 80, 160, 240)]
+    rng = random.Random(1)
+
+    for content_length in (True, False):
+        stream = multipart(frames, content_length)
+        label = "with" if content_length else "without"
+        assert list(iter_mjpeg_frames([stream])) == frames
+        one_byte = [stream[i:i + 1] for i in range(len(stream))]
+        assert list(iter_mjpeg_frames(one_byte)) == frames, "SOI/EOI and headers split across chunks"
+        for _ in range(20):
+            assert list(iter_mjpeg_frames(split_randomly(stream, rng))) == frames
+        print(f"1. {len(frames)} frames {label} Content-Length: whole, 1-byte and random chunks")
+
+    tricky = [jpeg_with_embedded_eoi(shade) for shade in (30, 200)]
+    stream = multipart(tricky, content_length=True)
+    assert list(iter_mjpeg_frames(split_randomly(stream, rng))) == tricky, \
+        "Content-Length should keep an embedded end-of-image marker inside the frame"
+    print("2. Embedded end-of-image marker kept inside the frame by Content-Length")
+
+    # A partial frame at the start of a connection is dropped, the next one is found
+    stream = frames[0][len(frames[0]) // 2:] + multipart(frames[1:], content_length=False)
+    assert list(iter_mjpeg_frames([stream])) == frames[1:]
+    # A truncated last frame is never yielded
+    stream = multipart(frames, content_length=True)[:-200]
+    assert list(iter_mjpeg_frames(split_randomly(stream, rng))) == frames[:-1]
+    print("3. Partial frames at either end of the stream are dropped")
+
+    print("✓ Frame splitting tests passed!\n")
+
+
+class StandInCamera(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    frames: list[bytes] = []
+    interval = 0.05
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY.decode()}")
+        self.end_headers()
+        try:
+            for frame in self.frames:
+                self.wfile.write(multipart([frame]))
+                self.wfile.flush()
+                time.sleep(self.interval)
+            # Then hold the connection open, as a camera with a still scene would not
+            while not self.server.closing:
+                time.sleep(self.interval)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_stream_reader():
+    """The background reader keeps the newest frame and reports stale ones as missing."""
+    print("=" * 60)
+    print("TEST: Camera Stream Reader")
+    print("=" * 60)
+
+    frames = [jpeg(shade) for shade in (10, 90, 170)]
+    StandInCamera.frames = frames
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInCamera)
+    server.closing = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stream = CameraStream(f"http://127.0.0.1:{server.server_port}/video", buffer_frames=2)
+    try:
+        assert stream.latest() is None, "No frame before connecting"
+        stream.start()
+        deadline = time.monotonic() + 5
+        while stream.latest() != frames[-1] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert stream.connected
+        assert stream.latest() == frames[-1], "Latest frame should be the newest one sent"
+        assert [frame for _, frame in stream.frames] == frames[-2:], "Ring buffer keeps the newest frames"
+        print(f"1. Received {len(frames)} frames, newest kept, buffer of {stream.frames.maxlen}")
+
+        time.sleep(0.2)
+        assert stream.latest(max_age=0.1) is None, "A frame older than max_age is not current"
+        assert stream.latest(max_age=10) == frames[-1]
+        print("2. Stale frame reported as missing")
+    finally:
+        stream.stop()
+        server.closing = True
+        server.shutdown()
+        server.server_close()
+
+    print("✓ Camera stream reader tests passed!\n")
+
+
+if __name__ == "__main__":
+    try:
+        test_frame_splitting()
+        test_stream_reader()
+
+        print("=" * 60)
+        print("✓ ALL TESTS PASSED!")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        exit(1)
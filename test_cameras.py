@@ -0,0 +1,141 @@
+"""
+Tests for multi-camera support: camera config defaults and validation, the
+API budget split, and per-camera separation of persisted state and datasets.
+
+Uses a temporary state database and dataset directories, no cameras needed.
+"""
+
+import tempfile
+from pathlib import Path
+
+import config
+import main
+from cameras import SCRIPT_DIR, load_cameras
+from dataset_store import DatasetStore
+from dataset_writer import DatasetWriter
+from main import NIGHT, DoorStatus, build_monitors, save_check_result, split_api_budget
+from monitor_engine import CheckResult
+from state_store import StateStore
+
+
+def test_load_cameras():
+    """Each camera gets its own defaults; names must be unique."""
+    print("=" * 60)
+    print("TEST: Camera Config")
+    print("=" * 60)
+
+    garage, gate = load_cameras([
+        {"name": "garage", "url": "http://camera1/photo.jpg"},
+        {"name": "side_gate", "url": "http://camera2/photo.jpg", "title": "Side gate", "ntfy_topic": "gate"},
+    ])
+    print(f"1. Defaults: {garage}")
+    assert garage.title == "Garage door" and garage.ntfy_topic == config.NTFY_TOPIC
+    assert garage.stream_url is None
+    assert garage.dataset_dir == SCRIPT_DIR / "dataset_garage"
+    assert garage.model_path == SCRIPT_DIR / "door_model_garage.npz"
+    assert garage.result_cache_path == SCRIPT_DIR / "result_cache_garage.json"
+    assert (gate.title, gate.ntfy_topic) == ("Side gate", "gate"), "Explicit settings override the defaults"
+    assert gate.dataset_dir != garage.dataset_dir and gate.model_path != garage.model_path
+    assert gate.result_cache_path != garage.result_cache_path
+    print("2. Cameras get separate dataset, model and result cache paths")
+
+    for entries, problem in (([{"name": "garage", "url": "a"}, {"name": "garage", "url": "b"}], "Duplicate"),
+                             ([], "empty")):
+        try:
+            load_cameras(entries)
+            assert False, f"Should reject: {problem}"
+        except ValueError as e:
+            print(f"3. Rejected: {e}")
+            assert problem in str(e)
+
+    print("✓ Camera config tests passed!\n")
+
+
+def test_api_budget_split():
+    """The daily budget is shared out whole, earlier cameras getting the remainder."""
+    print("=" * 60)
+    print("TEST: API Budget Split")
+    print("=" * 60)
+
+    for total, cameras, expected in ((20, 1, [20]), (20, 2, [10, 10]), (20, 3, [7, 7, 6]), (2, 3, [1, 1, 0])):
+        budgets = split_api_budget(total, cameras)
+        print(f"{total} calls over {cameras} camera(s): {budgets}")
+        assert budgets == expected and sum(budgets) == total
+
+    print("✓ API budget split tests passed!\n")
+
+
+def test_per_camera_state():
+    """Budgets, schedule state and datasets are kept apart per camera, across restarts."""
+    print("=" * 60)
+    print("TEST: Per-Camera State")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        cameras = load_cameras([
+            {"name": name, "url": f"http://{name}/photo.jpg", "dataset_dir": str(tmp / f"dataset_{name}"),
+             "result_cache_path": str(tmp / f"result_cache_{name}.json")}
+            for name in ("garage", "side_gate")
+        ])
+        store = StateStore(tmp / "state.db")
+        monitors = build_monitors(cameras, None, store, max_calls_per_day=5)
+        garage, gate = monitors["garage"], monitors["side_gate"]
+        print(f"1. Budgets: garage {garage.api_limiter.max_calls_per_day}, "
+              f"side_gate {gate.api_limiter.max_calls_per_day}")
+        assert (garage.api_limiter.max_calls_per_day, gate.api_limiter.max_calls_per_day) == (3, 2)
+
+        for _ in range(3):
+            garage.api_limiter.record_api_call()
+        garage.presence_tracker.should_check_now(someone_home=False, is_daytime=True)
+        assert not garage.api_limiter.can_make_api_call(NIGHT), "Garage has used its share"
+        assert gate.api_limiter.can_make_api_call(NIGHT), "Another camera's calls don't use this camera's share"
+        print("2. Garage's calls don't use the side gate's budget")
+
+        # After a restart each camera picks up its own state again
+        store.close()
+        store = StateStore(tmp / "state.db")
+        monitors = build_monitors(cameras, None, store, max_calls_per_day=5)
+        garage, gate = monitors["garage"], monitors["side_gate"]
+        assert garage.api_limiter.api_calls_today == 3 and gate.api_limiter.api_calls_today == 0
+        assert garage.presence_tracker.someone_was_home is False
+        assert gate.presence_tracker.someone_was_home is True, "Presence state is per camera"
+        print("3. After restart: budgets and schedule state restored per camera")
+        store.close()
+
+        # Frames go to the dataset of the camera that took them
+        writer, main.DATASET_WRITER = main.DATASET_WRITER, DatasetWriter(main.get_dataset_store, flush_seconds=0)
+        try:
+            for monitor, is_open in ((garage, True), (gate, False)):
+                status = DoorStatus(is_open=is_open, rationale=f"{monitor.name} frame")
+                image = (Path(__file__).parent / f"door_{'open' if is_open else 'shut'}_daytime.jpg").read_bytes()
+                save_check_result(monitor, CheckResult(status, image, False, "gemini", monitor.name))
+            main.DATASET_WRITER.close()
+        finally:
+            main.DATASET_WRITER = writer
+        for monitor, counts in ((garage, {"door_open": 1, "door_closed": 0}),
+                                (gate, {"door_open": 0, "door_closed": 1})):
+            main.get_dataset_store(monitor.camera.dataset_dir).close()
+            dataset = DatasetStore(monitor.camera.dataset_dir)
+            samples = dataset.query()
+            print(f"4. {monitor.name} dataset: {dataset.counts()}")
+            assert dataset.counts() == counts and samples[0].camera == monitor.name
+            dataset.close()
+        main.get_dataset_store.cache_clear()
+
+    print("✓ Per-camera state tests passed!\n")
+
+
+if __name__ == "__main__":
+    try:
+        test_load_cameras()
+        test_api_budget_split()
+        test_per_camera_state()
+
+        print("=" * 60)
+        print("✓ ALL TESTS PASSED!")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        exit(1)
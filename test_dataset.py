@@ -0,0 +1,292 @@
+"""
+Tests for the dataset store (appends, range queries, export to the
+directory-tree layout, legacy loose JPEGs) and the background writer.
+
+Uses the sample images in the repo and a temporary directory.
+"""
+
+import io
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from dataset_store import DatasetStore, Frame, iter_labelled_images
+from dataset_writer import DatasetWriter
+from hash_index import HashIndex
+from image_features import dhash, hamming_distance
+
+
+def read_sample(name: str) -> bytes:
+    return (Path(__file__).parent / name).read_bytes()
+
+
+def test_dataset_store():
+    """Frames round-trip through segments and the index, and export to a tree."""
+    print("=" * 60)
+    print("TEST: Dataset Store")
+    print("=" * 60)
+
+    open_image = read_sample("door_open_daytime.jpg")
+    shut_image = read_sample("door_shut_daytime.jpg")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "dataset"
+        # Tiny segments so the rollover is exercised; no dedup, the same two images repeat
+        store = DatasetStore(root, segment_max_bytes=len(open_image), dedup_distance=None)
+        t0 = 1_780_000_000.0
+        for i in range(6):
+            is_open = i % 2 == 0
+            store.append(open_image if is_open else shut_image, is_open,
+                         rationale=f"check {i}", camera="garage", timestamp=t0 + i * 60)
+
+        counts = store.counts()
+        print(f"1. Counts: {counts}")
+        assert counts == {"door_open": 3, "door_closed": 3}
+
+        segments = sorted((root / "segments").glob("*.bin"))
+        print(f"2. Segments: {[p.name for p in segments]}")
+        assert len(segments) > 1, "Segments should roll over when full"
+
+        # Range query by time and label
+        samples = store.query(since=t0 + 60, until=t0 + 240, label="door_closed")
+        print(f"3. Closed between +1 and +4 minutes: {[s.rationale for s in samples]}")
+        assert [s.rationale for s in samples] == ["check 1", "check 3"]
+        assert store.read_image(samples[0]) == shut_image, "Image bytes should round-trip"
+        store.close()
+
+        # Reopening continues the same store
+        store = DatasetStore(root, segment_max_bytes=len(open_image), dedup_distance=None)
+        store.append(open_image, True, rationale="after reopen", camera="garage", timestamp=t0 + 600)
+        latest = store.query(since=t0 + 600)
+        assert len(latest) == 1 and store.read_image(latest[0]) == open_image
+        assert store.query(after_id=6) == latest, "after_id should return only newer samples"
+        print("✓ Appends and queries work across reopen")
+
+        # Export to the directory-tree layout
+        out = Path(tmp) / "export"
+        exported = store.export(out, label="door_open")
+        files = sorted(p.name for p in (out / "door_open").glob("*.jpg"))
+        print(f"4. Exported {exported} open images: {files[:2]}...")
+        assert exported == 4 and len(files) == 4
+        assert not list((out / "door_closed").glob("*.jpg")), "Label filter should apply to export"
+        store.close()
+
+        # Legacy loose JPEGs are read too, and can be imported into the store
+        (root / "door_closed").mkdir()
+        (root / "door_closed" / "20250101_120000_000.jpg").write_bytes(shut_image)
+        names = [name for name, label, image in iter_labelled_images(root)]
+        assert len(names) == 8, f"Expected 7 stored + 1 loose image, got {len(names)}"
+        store = DatasetStore(root, dedup_distance=None)
+        assert store.import_tree(root, camera="garage") == 1
+        assert not list((root / "door_closed").glob("*.jpg")), "Imported files should be removed"
+        assert sum(store.counts().values()) == 8
+        store.close()
+        print("✓ Export and legacy import work")
+
+    print("✓ Dataset store tests passed!\n")
+
+
+def test_dataset_writer():
+    """Frames are written in batches, drained on close, and dropped when the queue is full."""
+    print("=" * 60)
+    print("TEST: Dataset Writer")
+    print("=" * 60)
+
+    image = read_sample("door_shut_daytime.jpg")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "dataset"
+        store = DatasetStore(root, dedup_distance=None)
+        batches = []
+
+        class RecordingStore:
+            def append_many(self, frames):
+                batches.append(len(frames))
+                return store.append_many(frames)
+
+        writer = DatasetWriter(lambda dataset_dir: RecordingStore(), queue_size=100, batch_size=8,
+                               flush_seconds=0.5, put_timeout=1)
+        for i in range(20):
+            assert writer.submit(root, Frame(image, False, rationale=f"check {i}"))
+        writer.close()
+        print(f"1. Batches written: {batches}")
+        assert sum(store.counts().values()) == 20, "close() should drain every queued frame"
+        assert max(batches) > 1, "Frames should be written in batches"
+        assert writer.written == 20 and writer.dropped == 0
+
+        # A stalled disk: the queue fills up and further frames are dropped, not waited on forever
+        release = threading.Event()
+
+        class StalledStore:
+            def append_many(self, frames):
+                release.wait()
+                return store.append_many(frames)
+
+        writer = DatasetWriter(lambda dataset_dir: StalledStore(), queue_size=2, batch_size=1,
+                               flush_seconds=0, put_timeout=0.05)
+        accepted = sum(writer.submit(root, Frame(image, True)) for _ in range(6))
+        print(f"2. Stalled disk: {accepted} frames accepted, {writer.dropped} dropped")
+        assert writer.dropped > 0, "Frames should be dropped when the queue is full"
+        release.set()
+        writer.close()
+        assert writer.written == accepted, "Accepted frames should still be written"
+        store.close()
+
+        # Near-duplicates skipped by the store are not counted as written
+        dedup_store = DatasetStore(Path(tmp) / "dedup")
+        writer = DatasetWriter(lambda dataset_dir: dedup_store, batch_size=8, flush_seconds=0.5)
+        for _ in range(3):
+            writer.submit(root, Frame(image, False))
+        writer.close()
+        print(f"3. Same frame 3 times: {writer.written} written, {writer.duplicates} duplicates")
+        assert writer.written == 1 and writer.duplicates == 2
+        dedup_store.close()
+
+    print("✓ Dataset writer tests passed!\n")
+
+
+def make_jpeg(pixels: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def test_dedup():
+    """Near-duplicates are skipped on append, and dropped offline keeping one per cluster."""
+    print("=" * 60)
+    print("TEST: Near-Duplicate Dedup")
+    print("=" * 60)
+
+    rng = np.random.default_rng(0)
+    base = read_sample("door_open_daytime.jpg")
+    shut = read_sample("door_shut_daytime.jpg")
+    # Same scene with a bit of sensor noise: a near-duplicate
+    with Image.open(io.BytesIO(base)) as img:
+        pixels = np.asarray(img.convert("L"), dtype=np.float32)
+    noisy = make_jpeg(pixels + rng.normal(0, 2, pixels.shape))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "dataset"
+
+        # Inline: duplicates of a stored frame (same label) are not stored again
+        store = DatasetStore(root, dedup_distance=4)
+        first = store.append(base, True, rationale="first")
+        ids = store.append_many([Frame(noisy, True), Frame(base, True), Frame(shut, False), Frame(base, False)])
+        print(f"1. Inline ids: first={first}, then {ids}")
+        assert ids[0] is None and ids[1] is None, "Near-duplicates of a stored open frame should be skipped"
+        assert ids[2] is not None, "A different scene should be stored"
+        assert ids[3] is not None, "The same scene with a different label is kept"
+        assert store.duplicate_count() == 2 and sum(store.counts().values()) == 3
+
+        # The same scene at dusk hashes like the daytime frame, but is kept: the
+        # local classifier needs the dim variants
+        dim = make_jpeg(pixels * 0.15 + rng.normal(0, 1, pixels.shape))
+        black = [make_jpeg(rng.normal(1, 0.5, pixels.shape)) for _ in range(3)]
+        print(f"   Dim copy is {hamming_distance(dhash(dim), dhash(base))} bits from the daytime frame")
+        ids = store.append_many([Frame(dim, True), Frame(dim, True)] + [Frame(image, False) for image in black])
+        print(f"2. Dim and black frames: {ids}")
+        assert ids[0] is not None, "A dim frame should not be a duplicate of the daytime one"
+        assert ids[1] is None, "A dim frame is still a duplicate of the same dim frame"
+        assert None not in ids[2:], "Featureless (black) frames should not be deduped"
+        store.close()
+
+        # A store created before the brightness column gets it on open
+        db = sqlite3.connect(root / "index.sqlite")
+        db.execute("ALTER TABLE samples DROP COLUMN brightness")
+        db.commit()
+        db.close()
+        store = DatasetStore(root, dedup_distance=4)
+        assert store.append(dim, True) is None, "Brightness should be filled in for existing samples"
+        store.close()
+
+        # Offline: a store filled without dedup, cleaned up afterwards
+        root = Path(tmp) / "dataset2"
+        store = DatasetStore(root, dedup_distance=None)
+        for i in range(50):
+            store.append(base if i % 5 else noisy, True, rationale=f"open {i}", timestamp=1000 + i)
+            store.append(shut, False, rationale=f"closed {i}", timestamp=1000 + i)
+        size_before = sum(p.stat().st_size for p in (root / "segments").glob("*.bin"))
+        kept, dropped = store.dedup(max_distance=4)
+        print(f"3. Offline dedup: kept {kept}, dropped {dropped}")
+        assert (kept, dropped) == (2, 98), "One representative per label and scene"
+        assert [s.rationale for s in store.query()] == ["open 0", "closed 0"], "The earliest sample is kept"
+        freed = store.compact()
+        print(f"4. Compact freed {freed} of {size_before} bytes")
+        assert freed > 0.9 * size_before
+        sample = store.query(label="door_closed")[0]
+        assert store.read_image(sample) == shut, "Kept samples should still read back after compact"
+        last_id = max(s.id for s in store.query())
+        new_id = store.append(dim, True)
+        print(f"5. After dropping ids up to 100, a new sample gets id {new_id}")
+        assert new_id == 101 and last_id < 100, "Ids of dropped samples should not be reused"
+        store.close()
+
+        # A store created when ids could be reused is rebuilt to never reuse them
+        root = Path(tmp) / "dataset3"
+        root.mkdir()
+        db = sqlite3.connect(root / "index.sqlite")
+        db.executescript("""
+            CREATE TABLE samples (id INTEGER PRIMARY KEY, timestamp REAL NOT NULL, camera TEXT NOT NULL,
+                label TEXT NOT NULL, rationale TEXT NOT NULL, phash TEXT NOT NULL, segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL, length INTEGER NOT NULL, brightness REAL);
+            CREATE INDEX samples_timestamp ON samples (timestamp);
+            CREATE INDEX samples_label_timestamp ON samples (label, timestamp);
+            CREATE TABLE duplicates (id INTEGER PRIMARY KEY, sample_id INTEGER, timestamp REAL NOT NULL,
+                camera TEXT NOT NULL, label TEXT NOT NULL, rationale TEXT NOT NULL, phash TEXT NOT NULL,
+                representative_id INTEGER NOT NULL, distance INTEGER NOT NULL);
+            INSERT INTO samples VALUES (1, 1000, '', 'door_open', 'kept', '0', 1, 0, 0, 0.5);
+            INSERT INTO duplicates VALUES (1, 2, 1001, '', 'door_open', 'dropped', '0', 1, 0);
+        """)
+        db.close()
+        store = DatasetStore(root, dedup_distance=None)
+        assert [s.rationale for s in store.query()] == ["kept"], "Samples should survive the rebuild"
+        assert store.append(shut, False) == 3, "The id of a sample dropped before the rebuild is not reused"
+        store.close()
+
+    print("✓ Dedup tests passed!\n")
+
+
+def test_hash_index():
+    """Multi-index hashing finds the nearest hash within the radius, same as a linear scan."""
+    print("=" * 60)
+    print("TEST: Hash Index")
+    print("=" * 60)
+
+    rng = np.random.default_rng(1)
+    keys = [int(rng.integers(0, 2**63)) << 64 | int(rng.integers(0, 2**63)) for _ in range(2000)]
+    index = HashIndex(max_distance=4)
+    for i, key in enumerate(keys):
+        index.add(key, i)
+    assert len(index) == 2000
+
+    for trial in range(50):
+        target = keys[trial * 7]
+        # flip a few bits
+        probe = target ^ (1 << int(rng.integers(0, 128))) ^ (1 << int(rng.integers(0, 128)))
+        found = index.find(probe)
+        expected = min((hamming_distance(probe, key), i) for i, key in enumerate(keys))
+        assert found is not None and found[0] == expected[0], "Should match a linear scan"
+    assert index.find(keys[0] ^ ((1 << 40) - 1)) is None, "Nothing within 4 bits of a 40-bit change"
+    print("✓ Hash index matches linear scan")
+
+    print("✓ Hash index tests passed!\n")
+
+
+if __name__ == "__main__":
+    try:
+        test_dataset_store()
+        test_dataset_writer()
+        test_dedup()
+        test_hash_index()
+
+        print("=" * 60)
+        print("✓ ALL TESTS PASSED!")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        exit(1)
@@ -0,0 +1,178 @@
+"""
+Tests for the frame-level shortcuts that avoid classification calls
+(the change detector and the perceptual-hash result cache) and for the
+downscaled payloads uploaded to Gemini and ntfy.
+
+Uses synthetic JPEGs plus the sample images in the repo, no network needed.
+"""
+
+import io
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+import config
+from change_detector import ChangeDetector
+from image_prep import make_thumbnail, prepare_model_image
+from result_cache import ResultCache
+
+
+def make_jpeg(pixels: np.ndarray) -> bytes:
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def night_frame(seed: int) -> bytes:
+    """Almost-black frame with a bit of sensor noise."""
+    rng = np.random.default_rng(seed)
+    return make_jpeg(rng.integers(0, 8, (240, 320)))
+
+
+def read_sample(name: str) -> bytes:
+    return (Path(__file__).parent / name).read_bytes()
+
+
+def dark_sample(name: str, brightness: float, seed: int = 0) -> bytes:
+    """A sample image dimmed like a night frame, with a bit of sensor noise."""
+    rng = np.random.default_rng(seed)
+    with Image.open(Path(__file__).parent / name) as img:
+        pixels = np.asarray(img.convert("RGB"), dtype=np.float32) * brightness
+    return make_jpeg(pixels + rng.normal(0, 1, pixels.shape))
+
+
+def test_change_detector():
+    """Unchanged scenes reuse the result; a scene change invalidates it."""
+    print("=" * 60)
+    print("TEST: Change Detector")
+    print("=" * 60)
+
+    detector = ChangeDetector()
+    shut = read_sample("door_shut_daytime.jpg")
+    opened = read_sample("door_open_daytime.jpg")
+
+    result = detector.cached_result(shut)
+    print(f"1. First frame: {result}")
+    assert result is None, "First frame should always be classified"
+    detector.remember("closed")
+
+    result = detector.cached_result(shut)
+    print(f"2. Same frame again: {result}")
+    assert result == "closed", "Unchanged scene should reuse the last result"
+
+    result = detector.cached_result(opened)
+    print(f"3. Door opened: {result}")
+    assert result is None, "Scene change should force a classification"
+
+    result = detector.cached_result(opened)
+    print(f"4. Same frame, nothing remembered yet: {result}")
+    assert result is None, "Stale result must not be reused"
+
+    print("✓ Change detector tests passed!\n")
+
+
+def test_result_cache():
+    """Cache hits on repeated scenes, misses on different ones, survives restart."""
+    print("=" * 60)
+    print("TEST: Result Cache")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cache.json"
+        cache = ResultCache(path, max_entries=2)
+        cache.put(dark_sample("door_shut_daytime.jpg", 0.1), {"is_open": False, "rationale": "shut, dark"})
+
+        hit = cache.get(dark_sample("door_shut_daytime.jpg", 0.1, seed=1))
+        print(f"1. Another dark frame of the shut door: {hit}")
+        assert hit is not None and not hit["is_open"], "Repeated night scenes should share a cache entry"
+
+        for brightness in (0.1, 0.05):
+            miss = cache.get(dark_sample("door_open_daytime.jpg", brightness))
+            print(f"2. Open door at {brightness:.0%} brightness: {miss}")
+            assert miss is None, "A dark open door must not match the dark shut door"
+
+        cache.put(night_frame(0), {"is_open": False, "rationale": "black"})
+        miss = cache.get(night_frame(1))
+        print(f"3. Featureless black frame: {miss}")
+        assert miss is None and len(cache.entries) == 1, "Frames without structure are never cached"
+
+        restarted = ResultCache(path, max_entries=2)
+        print(f"4. After restart: {restarted.stats()}")
+        assert restarted.get(dark_sample("door_shut_daytime.jpg", 0.1, seed=2)) is not None, \
+            "Cache should persist across restarts"
+
+        restarted.put(read_sample("door_open_daytime.jpg"), {"is_open": True, "rationale": "open"})
+        restarted.put(dark_sample("door_open_daytime.jpg", 0.2), {"is_open": True, "rationale": "open, dusk"})
+        print(f"5. After two more entries (max 2): {restarted.stats()}")
+        assert restarted.get(dark_sample("door_shut_daytime.jpg", 0.1, seed=3)) is None, \
+            "Least recently used entry should be evicted"
+
+        expiring = ResultCache(None, ttl_seconds=-1)
+        expiring.put(read_sample("door_shut_daytime.jpg"), {"is_open": False, "rationale": "shut"})
+        assert expiring.get(read_sample("door_shut_daytime.jpg")) is None, "Expired entries should miss"
+        print("6. Expired entry misses")
+
+    print("✓ Result cache tests passed!\n")
+
+
+def camera_frame(name: str, scale: int = 3) -> bytes:
+    """A sample image upscaled to a full-resolution camera frame."""
+    with Image.open(Path(__file__).parent / name) as img:
+        big = img.convert("RGB").resize((img.width * scale, img.height * scale), Image.Resampling.BICUBIC)
+    buf = io.BytesIO()
+    big.save(buf, format="JPEG", quality=95)
+    return buf.getvalue()
+
+
+def test_image_prep():
+    """Uploads are downscaled JPEGs, never bigger than the camera frame."""
+    print("=" * 60)
+    print("TEST: Upload Image Preparation")
+    print("=" * 60)
+
+    frame = camera_frame("door_open_daytime.jpg")
+    with Image.open(io.BytesIO(frame)) as img:
+        frame_size = img.size
+
+    for step, (label, prepare, max_size) in enumerate((
+        ("Gemini", prepare_model_image, config.MODEL_IMAGE_MAX_SIZE),
+        ("ntfy", make_thumbnail, config.NOTIFY_THUMBNAIL_MAX_SIZE),
+    ), start=1):
+        data = prepare(frame)
+        with Image.open(io.BytesIO(data)) as img:
+            assert img.format == "JPEG"
+            img.load()
+            size = img.size
+        print(f"{step}. {label}: {frame_size} {len(frame) // 1024} KiB -> {size} {len(data) // 1024} KiB")
+        assert max(size) == max_size, "Longest side should be scaled down to the configured size"
+        assert abs(size[0] / size[1] - frame_size[0] / frame_size[1]) < 0.01, "Aspect ratio should be kept"
+        assert len(data) < len(frame), "Payload should be smaller than the camera frame"
+
+    # Already small and heavily compressed: re-encoding would only add bytes
+    with Image.open(Path(__file__).parent / "door_shut_daytime.jpg") as img:
+        small = img.convert("RGB").resize((160, 120))
+    buf = io.BytesIO()
+    small.save(buf, format="JPEG", quality=20)
+    tiny = buf.getvalue()
+    assert prepare_model_image(tiny) is tiny, "A payload that wouldn't shrink should be sent as is"
+    assert make_thumbnail(tiny) is tiny
+    print(f"3. Small {len(tiny)} byte frame sent unchanged")
+
+    print("✓ Image preparation tests passed!\n")
+
+
+if __name__ == "__main__":
+    try:
+        test_change_detector()
+        test_result_cache()
+        test_image_prep()
+
+        print("=" * 60)
+        print("✓ ALL TESTS PASSED!")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        exit(1)
@@ -0,0 +1,132 @@
+"""
+Tests for the Gemini batcher: batching window, fan-out of results to their
+callers, per-photo errors and budget accounting.
+
+Uses a stand-in Gemini client that answers with the photos it was sent,
+no network needed.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import transport
+from gemini_batcher import GeminiBatcher
+
+
+class StandInClient:
+    """Answers each photo with its own bytes, or with `answers(photos)` if given."""
+
+    def __init__(self, answers=None, delay: float = 0.0):
+        self.answers = answers or (lambda photos: photos)
+        self.delay = delay
+        self.requests = []
+        self.models = self
+
+    def generate_content(self, model, contents, config):
+        photos = [item.inline_data.data for item in contents if not isinstance(item, str)]
+        self.requests.append(photos)
+        time.sleep(self.delay)
+        answers = self.answers(photos)
+        return SimpleNamespace(parsed=answers[0] if len(photos) == 1 else answers)
+
+
+def classify_all(batcher: GeminiBatcher, photos: list[bytes]) -> list:
+    """Classify photos from concurrent callers (like one check per camera); results or exceptions."""
+    def call(photo):
+        try:
+            return batcher.classify(photo)
+        except Exception as e:
+            return e
+    with ThreadPoolExecutor(len(photos)) as pool:
+        return list(pool.map(call, photos))
+
+
+def with_client(client: StandInClient):
+    original = transport.get_gemini_client
+    transport.get_gemini_client = lambda: client
+    return lambda: setattr(transport, "get_gemini_client", original)
+
+
+def test_batching_window():
+    """The window closes as soon as every camera has a frame queued, and is skipped for one camera."""
+    print("=" * 60)
+    print("TEST: Batching Window")
+    print("=" * 60)
+
+    client = StandInClient()
+    restore = with_client(client)
+    try:
+        single = GeminiBatcher(dict, "query", "batch query", window_seconds=5, callers=1)
+        started = time.monotonic()
+        result, paid = single.classify(b"garage")
+        elapsed = time.monotonic() - started
+        print(f"1. One camera: {elapsed * 1000:.1f} ms")
+        assert result == b"garage" and paid
+        assert elapsed < 1, "A single camera should not wait for the batching window"
+
+        cameras = [b"garage", b"side", b"shed"]
+        batcher = GeminiBatcher(dict, "query", "batch query", window_seconds=5, callers=len(cameras))
+        started = time.monotonic()
+        results = classify_all(batcher, cameras)
+        elapsed = time.monotonic() - started
+        print(f"2. Three cameras: {elapsed * 1000:.1f} ms, requests: {client.requests[1:]}")
+        assert elapsed < 1, "The batch should close once every camera's frame is queued"
+        assert len(client.requests) == 2 and sorted(client.requests[1]) == sorted(cameras)
+    finally:
+        restore()
+
+    print("✓ Batching window tests passed!\n")
+
+
+def test_batch_results():
+    """Each caller gets its own photo's result; per-photo errors and short answers are reported."""
+    print("=" * 60)
+    print("TEST: Batch Results and Accounting")
+    print("=" * 60)
+
+    cameras = [b"garage", b"side", b"shed"]
+    client = StandInClient()
+    restore = with_client(client)
+    try:
+        batcher = GeminiBatcher(dict, "query", "batch query", window_seconds=5, callers=len(cameras))
+        results = classify_all(batcher, cameras)
+        print(f"1. Results: {results}")
+        assert [result for result, _ in results] == cameras, "Results must go back to their own callers"
+        assert sum(paid for _, paid in results) == 1, "Exactly one caller pays for the batch"
+        assert batcher.calls == 1 and batcher.frames == 3
+
+        # Gemini answered for every photo but one
+        client.answers = lambda photos: [None if photo == b"side" else photo for photo in photos]
+        results = classify_all(batcher, cameras)
+        print(f"2. One photo without a result: {results}")
+        assert isinstance(results[1], ValueError), "The photo without a result gets an error"
+        assert [results[0][0], results[2][0]] == [b"garage", b"shed"], "The other photos keep their results"
+        assert results[0][1] and not results[2][1], "Only one caller with a result pays"
+
+        # Gemini left a photo out of its list, so no answer can be matched to its photo
+        client.answers = lambda photos: photos[:-1]
+        results = classify_all(batcher, cameras)
+        print(f"3. Short answer list: {results}")
+        assert all(isinstance(result, ValueError) for result in results), "A short list fails the whole batch"
+        print(f"4. {batcher.calls} requests, {batcher.errors} failed")
+        assert batcher.calls == 3, "Every request sent counts, failed ones included"
+        assert batcher.errors == 1
+    finally:
+        restore()
+
+    print("✓ Batch result tests passed!\n")
+
+
+if __name__ == "__main__":
+    try:
+        test_batching_window()
+        test_batch_results()
+
+        print("=" * 60)
+        print("✓ ALL TESTS PASSED!")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        exit(1)
@@ -0,0 +1,117 @@
+"""
+Tests for the local door classifier: training on a dataset store,
+prediction, save/load, and the quality checks that keep a bad model from
+being saved.
+
+Uses varied copies of the sample images in a temporary directory.
+"""
+
+import io
+import tempfile
+from argparse import Namespace
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+import local_classifier
+from dataset_store import DatasetStore
+
+
+def read_sample(name: str) -> bytes:
+    return (Path(__file__).parent / name).read_bytes()
+
+
+def variant(name: str, rng: np.random.Generator) -> bytes:
+    """A sample image with different lighting, a small camera shift and sensor noise."""
+    with Image.open(Path(__file__).parent / name) as img:
+        pixels = np.asarray(img.convert("RGB").resize((320, 240)), dtype=np.float32)
+    pixels = np.roll(pixels * rng.uniform(0.6, 1.2), rng.integers(-4, 5), axis=1)
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(pixels + rng.normal(0, 4, pixels.shape), 0, 255).astype(np.uint8)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def make_dataset(root: Path, per_class: int, seed: int = 0, shuffle_labels: bool = False):
+    rng = np.random.default_rng(seed)
+    store = DatasetStore(root, dedup_distance=None)
+    try:
+        for _ in range(per_class):
+            for name, is_open in (("door_open_daytime.jpg", True), ("door_shut_daytime.jpg", False)):
+                label = bool(rng.integers(2)) if shuffle_labels else is_open
+                store.append(variant(name, rng), label)
+    finally:
+        store.close()
+
+
+def train_args(root: Path, output: Path) -> Namespace:
+    return Namespace(dataset=str(root), output=str(output), camera=None, force=False)
+
+
+def test_train_predict():
+    """A model trained on a good dataset is saved, reloads, and classifies the samples."""
+    print("=" * 60)
+    print("TEST: Train, Save, Load, Predict")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root, model_path = Path(tmp) / "dataset", Path(tmp) / "model.npz"
+        make_dataset(root, per_class=25)
+        assert local_classifier.cmd_train(train_args(root, model_path)) == 0, "A good model should be saved"
+        assert model_path.exists()
+
+        model = local_classifier.load_model(model_path)
+        for name, expected in (("door_open_daytime.jpg", True), ("door_shut_daytime.jpg", False)):
+            is_open, confidence = model.predict(read_sample(name))
+            print(f"{name}: open={is_open} (confidence {confidence:.3f})")
+            assert is_open == expected, f"{name} misclassified"
+            assert 0.5 <= confidence <= 1.0
+
+        assert local_classifier.load_model(Path(tmp) / "missing.npz") is None, "No model file means no model"
+    print("✓ Model trained, saved and reloaded")
+
+    print("✓ Train/predict tests passed!\n")
+
+
+def test_quality_checks():
+    """Too few images or a poor hold-out accuracy leave the existing model in place."""
+    print("=" * 60)
+    print("TEST: Model Quality Checks")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = Path(tmp) / "model.npz"
+
+        small = Path(tmp) / "small"
+        make_dataset(small, per_class=5)
+        print("1. Five images of each class:")
+        assert local_classifier.cmd_train(train_args(small, model_path)) == 1
+        assert not model_path.exists(), "Too small a dataset must not produce a model"
+
+        noisy = Path(tmp) / "noisy"
+        make_dataset(noisy, per_class=25, shuffle_labels=True)
+        print("2. Labels unrelated to the images:")
+        assert local_classifier.cmd_train(train_args(noisy, model_path)) == 1
+        assert not model_path.exists(), "A model that fails on held-out images must not be saved"
+
+        print("3. Forced:")
+        forced = train_args(small, model_path)
+        forced.force = True
+        assert local_classifier.cmd_train(forced) == 0 and model_path.exists(), "--force saves anyway"
+    print("✓ Bad models refused")
+
+    print("✓ Quality check tests passed!\n")
+
+
+if __name__ == "__main__":
+    try:
+        test_train_predict()
+        test_quality_checks()
+
+        print("=" * 60)
+        print("✓ ALL TESTS PASSED!")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        exit(1)
@@ -0,0 +1,102 @@
+"""
+Tests for the metrics module: the Prometheus text format, histograms,
+scrape-time values, the /metrics endpoint and the cost of recording.
+
+Uses a private registry and a local port, no network needed.
+"""
+
+import time
+import urllib.request
+
+import metrics
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+def test_metrics_format():
+    """Counters, gauges and histograms render in the Prometheus text format."""
+    print("=" * 60)
+    print("TEST: Metrics Format")
+    print("=" * 60)
+
+    registry = Registry()
+    checks = registry.register(Counter("checks_total", "Door checks", ("camera", "source")))
+    checks.inc(camera="garage", source="local")
+    checks.inc(camera="garage", source="local")
+    checks.inc(camera="side \"gate\"", source="gemini")
+    budget = registry.register(Gauge("budget_used", "Calls used", ("camera",),
+                                     fn=lambda: {("garage",): 3, ("side",): 1}))
+    stage = registry.register(Histogram("stage_seconds", "Stage time", ("stage",), buckets=(0.1, 1)))
+    for value in (0.05, 0.1, 0.5, 3):
+        stage.observe(value, stage="gemini")
+
+    text = registry.render()
+    print(text)
+    assert "# TYPE checks_total counter" in text
+    assert 'checks_total{camera="garage",source="local"} 2.0' in text
+    assert 'checks_total{camera="side \\"gate\\"",source="gemini"} 1.0' in text, "Label values are escaped"
+    assert 'budget_used{camera="garage"} 3.0' in text, "Scrape-time values come from the function"
+    # Buckets are cumulative and inclusive of their upper bound
+    assert 'stage_seconds_bucket{stage="gemini",le="0.1"} 2' in text
+    assert 'stage_seconds_bucket{stage="gemini",le="1.0"} 3' in text
+    assert 'stage_seconds_bucket{stage="gemini",le="+Inf"} 4' in text
+    assert 'stage_seconds_count{stage="gemini"} 4' in text
+    assert 'stage_seconds_sum{stage="gemini"} 3.65' in text
+
+    # Registering the same metric again returns the existing one
+    assert registry.register(Counter("checks_total", "Door checks", ("camera", "source"))) is checks
+    try:
+        registry.register(Gauge("checks_total", "Door checks", ("camera", "source")))
+        assert False, "A different type under the same name should be rejected"
+    except ValueError:
+        pass
+    print("✓ Metrics render correctly")
+
+    print("✓ Metrics format tests passed!\n")
+
+
+def test_metrics_endpoint():
+    """The registry is served at /metrics; recording stays cheap."""
+    print("=" * 60)
+    print("TEST: Metrics Endpoint and Overhead")
+    print("=" * 60)
+
+    metrics.counter("test_endpoint_total", "Requests in this test").inc()
+    server = metrics.serve(0, host="127.0.0.1")
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode()
+            assert response.headers["Content-Type"] == metrics.CONTENT_TYPE
+        print(f"1. Scraped {len(body.splitlines())} lines from {url}")
+        assert "test_endpoint_total 1.0" in body
+        assert "# TYPE garage_stage_seconds histogram" in body
+    finally:
+        server.shutdown()
+
+    counter = Counter("overhead_total", "Overhead test", ("camera",))
+    histogram = Histogram("overhead_seconds", "Overhead test", ("stage",))
+    n = 20000
+    started = time.perf_counter()
+    for _ in range(n):
+        counter.inc(camera="garage")
+        with histogram.time(stage="camera_fetch"):
+            pass
+    per_update = (time.perf_counter() - started) / n / 2
+    print(f"2. {per_update * 1e6:.2f} µs per recorded value")
+    assert per_update < 20e-6, "Recording a value should cost microseconds"
+
+    print("✓ Metrics endpoint tests passed!\n")
+
+
+if __name__ == "__main__":
+    try:
+        test_metrics_format()
+        test_metrics_endpoint()
+
+        print("=" * 60)
+        print("✓ ALL TESTS PASSED!")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        exit(1)
@@ -0,0 +1,99 @@
+"""
+Tests for the concurrent presence probe: one sweep pings every device at
+once, is bounded by its timeout, and records round-trip times and failures.
+
+Puts a stand-in `ping` script first on PATH (answering per IP: a reply, no
+reply, or no answer at all), so no network or real phones are needed.
+"""
+
+import os
+import stat
+import tempfile
+import time
+from pathlib import Path
+
+from presence_probe import PING_FAILURES, PING_RTT_SECONDS, probe_all
+
+# The last argument is the IP, as in `ping -c 1 -W 2 <ip>`
+STAND_IN_PING = """#!/bin/sh
+for ip; do :; done
+echo $$ > "{pid_dir}/$ip"
+case "$ip" in
+  10.0.0.1) echo "64 bytes from $ip: icmp_seq=1 ttl=64 time=12.5 ms"; exit 0 ;;
+  10.0.0.2) exit 1 ;;
+  *) exec sleep 30 ;;
+esac
+"""
+
+
+def install_stand_in_ping(tmp: Path) -> Path:
+    pid_dir = tmp / "pids"
+    pid_dir.mkdir()
+    script = tmp / "ping"
+    script.write_text(STAND_IN_PING.format(pid_dir=pid_dir))
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    os.environ["PATH"] = f"{tmp}{os.pathsep}{os.environ['PATH']}"
+    return pid_dir
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # A killed child that hasn't been reaped yet still has a /proc entry, but is a zombie
+    status = Path(f"/proc/{pid}/status")
+    return not (status.exists() and "zombie" in status.read_text())
+
+
+def test_probe_sweep():
+    """All devices are pinged at once; unanswered pings count as away and are cleaned up."""
+    print("=" * 60)
+    print("TEST: Presence Probe Sweep")
+    print("=" * 60)
+
+    path = os.environ["PATH"]
+    with tempfile.TemporaryDirectory() as tmp:
+        pid_dir = install_stand_in_ping(Path(tmp))
+        try:
+            hosts = {"replies": "10.0.0.1", "no_reply": "10.0.0.2", "hangs": "10.0.0.3"}
+            started = time.monotonic()
+            reachable = probe_all(hosts, timeout=0.5)
+            elapsed = time.monotonic() - started
+            print(f"1. Sweep of {len(hosts)} devices in {elapsed:.2f}s: {reachable}")
+            assert reachable == {"replies": True, "no_reply": False, "hangs": False}
+            assert elapsed < 1.5, "One sweep should take a single timeout, not one per device"
+
+            hung_pid = int((pid_dir / "10.0.0.3").read_text())
+            assert not process_alive(hung_pid), "A ping still running at the deadline should be killed"
+            print("2. Unanswered ping killed at the sweep deadline")
+
+            text = "\n".join(PING_RTT_SECONDS.render() + PING_FAILURES.render())
+            print("3. Recorded ping metrics:")
+            for line in text.splitlines():
+                if "_sum" in line or "failures_total{" in line:
+                    print(f"   {line}")
+            assert 'presence_ping_rtt_seconds_sum{device="replies"} 0.0125' in text, \
+                "RTT should be parsed from ping's reply"
+            assert 'presence_ping_failures_total{device="no_reply"}' in text
+            assert 'presence_ping_failures_total{device="hangs"}' in text
+            assert 'presence_ping_failures_total{device="replies"}' not in text
+
+            assert probe_all({}) == {}, "No devices, nothing to ping"
+        finally:
+            os.environ["PATH"] = path
+
+    print("✓ Presence probe tests passed!\n")
+
+
+if __name__ == "__main__":
+    try:
+        test_probe_sweep()
+
+        print("=" * 60)
+        print("✓ ALL TESTS PASSED!")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        exit(1)
@@ -0,0 +1,220 @@
+"""
+Tests for dependency failure handling: the retry policies in retry.py
+(backoff, giving up, which errors are retried) and the circuit breaker.
+Delays are tiny or use a fake clock, so the tests run instantly.
+"""
+
+import asyncio
+import time
+
+import requests
+from google.genai import errors as genai_errors
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from retry import RetryError, RetryPolicy, is_retryable_gemini_error, is_retryable_http_error
+
+
+def http_error(status: int) -> requests.exceptions.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"{status} error", response=response)
+
+
+def flaky(failures: list[Exception], result="ok"):
+    """Async attempt that raises the given errors in turn, then succeeds."""
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return result
+    return attempt, calls
+
+
+def test_retry_policy():
+    """Retries retryable errors with growing delays, gives up on attempts or deadline."""
+    print("=" * 60)
+    print("TEST: Retry Policy")
+    print("=" * 60)
+
+    policy = RetryPolicy("Test", is_retryable_http_error, max_attempts=4,
+                         base_delay=0.001, max_delay=0.004, deadline=5)
+
+    # Backoff doubles up to max_delay; jitter only ever shortens it
+    delays = [policy.delay_for(n) for n in range(1, 6)]
+    print(f"Delays: {[f'{d * 1000:.2f}ms' for d in delays]}")
+    assert 0.0005 <= delays[0] <= 0.001, "First delay should be around base_delay"
+    assert all(d <= 0.004 for d in delays), "Delays should be capped at max_delay"
+    print("✓ Backoff grows and is capped")
+
+    # Recovers as soon as the dependency does
+    attempt, calls = flaky([http_error(503), requests.exceptions.ConnectionError()])
+    assert asyncio.run(policy.run(attempt)) == "ok", "Should succeed after transient errors"
+    assert len(calls) == 3, f"Expected 3 attempts, got {len(calls)}"
+    print("✓ Transient errors retried until success")
+
+    # Non-retryable errors propagate immediately
+    attempt, calls = flaky([http_error(404)])
+    try:
+        asyncio.run(policy.run(attempt))
+        assert False, "404 should not be retried"
+    except requests.exceptions.HTTPError:
+        pass
+    assert len(calls) == 1, "404 should fail on the first attempt"
+    print("✓ Non-retryable error not retried")
+
+    # Gives up after max_attempts
+    attempt, calls = flaky([http_error(503)] * 10)
+    try:
+        asyncio.run(policy.run(attempt))
+        assert False, "Should give up"
+    except RetryError as e:
+        print(f"Gave up: {e}")
+        assert isinstance(e.__cause__, requests.exceptions.HTTPError), "Last error should be chained"
+    assert len(calls) == 4, f"Expected 4 attempts, got {len(calls)}"
+    print("✓ Gives up after max_attempts")
+
+    # Gives up when the next wait would pass the deadline
+    slow = RetryPolicy("Test", is_retryable_http_error, max_attempts=10,
+                       base_delay=10, max_delay=10, deadline=1)
+    attempt, calls = flaky([http_error(503)] * 10)
+    try:
+        asyncio.run(slow.run(attempt))
+        assert False, "Should give up"
+    except RetryError:
+        pass
+    assert len(calls) == 1, "Should not wait past the deadline"
+    print("✓ Deadline respected")
+
+    # A hung attempt is cancelled at the deadline
+    async def hang():
+        await asyncio.sleep(60)
+    bounded = RetryPolicy("Test", is_retryable_http_error, max_attempts=3,
+                          base_delay=0.001, max_delay=0.001, deadline=0.2)
+    started = time.monotonic()
+    try:
+        asyncio.run(bounded.run(hang))
+        assert False, "Should give up"
+    except RetryError as e:
+        print(f"Gave up: {e}")
+    assert time.monotonic() - started < 1, "A hung attempt must not outlive the deadline"
+    print("✓ Hung attempt cancelled at the deadline")
+
+    print("✓ Retry policy tests passed!\n")
+
+
+def test_retryable_errors():
+    """Each dependency retries only errors that can go away on their own."""
+    print("=" * 60)
+    print("TEST: Retryable Errors")
+    print("=" * 60)
+
+    assert is_retryable_http_error(http_error(503))
+    assert is_retryable_http_error(http_error(429))
+    assert is_retryable_http_error(requests.exceptions.ReadTimeout())
+    assert not is_retryable_http_error(http_error(401))
+    assert not is_retryable_http_error(ValueError("bad image"))
+    print("✓ HTTP (camera, ntfy) errors classified")
+
+    assert is_retryable_gemini_error(genai_errors.ServerError(503, {"error": {"message": "overloaded"}}))
+    assert is_retryable_gemini_error(genai_errors.ClientError(429, {"error": {"message": "quota"}}))
+    assert not is_retryable_gemini_error(genai_errors.ClientError(400, {"error": {"message": "bad request"}}))
+    assert not is_retryable_gemini_error(ValueError("Failed to parse gemini response"))
+    print("✓ Gemini errors classified")
+
+    print("✓ Retryable error tests passed!\n")
+
+
+def test_circuit_breaker():
+    """Opens after repeated failures, half-opens with a single probe after the reset time."""
+    print("=" * 60)
+    print("TEST: Circuit Breaker")
+    print("=" * 60)
+
+    now = [0.0]
+    breaker = CircuitBreaker("Test", failure_threshold=3, reset_seconds=60, clock=lambda: now[0])
+
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == "closed", "Should stay closed below the threshold"
+    breaker.record_success()
+    assert breaker.consecutive_failures == 0, "Success should reset the failure count"
+
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == "open", "Should open after 3 consecutive failures"
+    assert not breaker.allow(), "Open breaker should refuse calls"
+    try:
+        breaker.check()
+        assert False, "check() should raise while open"
+    except CircuitOpenError:
+        pass
+    print(f"Open: {breaker.status()}")
+    print("✓ Opens after repeated failures")
+
+    now[0] = 61
+    assert breaker.allow(), "Should let a probe through after the reset time"
+    assert breaker.state == "half_open"
+    assert not breaker.allow(), "Only one probe at a time"
+    breaker.record_failure()
+    assert breaker.state == "open", "Failed probe should re-open"
+    assert not breaker.allow()
+    print("✓ Failed probe re-opens")
+
+    now[0] = 122
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed", "Successful probe should close"
+    assert breaker.allow() and breaker.allow(), "Closed breaker allows all calls"
+    assert breaker.status()["times_opened"] == 2
+    print("✓ Successful probe closes")
+
+    # A half-open probe that hangs is cancelled by the retry deadline; that must free the probe
+    async def hang():
+        await asyncio.sleep(10)
+
+    policy = RetryPolicy("Test", lambda e: True, max_attempts=3, base_delay=0.01, max_delay=0.01, deadline=0.1)
+    for _ in range(3):
+        breaker.record_failure()
+    now[0] = 200
+    try:
+        asyncio.run(policy.run(lambda: breaker.call(hang, lambda e: True)))
+        assert False, "Hung probe should give up at the deadline"
+    except RetryError:
+        pass
+    assert breaker.state == "open" and not breaker.probe_in_flight, "Hung probe should count as a failure"
+    now[0] = 261
+    succeed, _ = flaky([])
+    assert asyncio.run(breaker.call(succeed, lambda e: True)) == "ok", "Next probe should be let through"
+    assert breaker.state == "closed"
+    print("✓ Probe cancelled by the retry deadline re-opens and frees the probe")
+
+    # Errors that aren't outages mean the dependency answered
+    async def bad_response():
+        raise ValueError("unparseable")
+
+    breaker.record_failure()
+    try:
+        asyncio.run(breaker.call(bad_response, lambda e: False))
+    except ValueError:
+        pass
+    assert breaker.consecutive_failures == 0, "A non-outage error should count as a success"
+
+    print("✓ Circuit breaker tests passed!\n")
+
+
+if __name__ == "__main__":
+    try:
+        test_retry_policy()
+        test_retryable_errors()
+        test_circuit_breaker()
+
+        print("=" * 60)
+        print("✓ ALL TESTS PASSED!")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        exit(1)
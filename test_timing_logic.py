@@ -4,8 +4,26 @@ Test script for verifying timing logic without making actual API calls.
 This script tests the PresenceTracker and ApiRateLimiter classes in isolation.
 """
 
-from datetime import time
-from main import PresenceTracker, ApiRateLimiter
+import asyncio
+import contextlib
+import copy
+import io
+import json
+import tempfile
+import threading
+import time as time_module
+import urllib.request
+from datetime import datetime, time, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+import config
+from main import PresenceTracker, ApiRateLimiter, NIGHT, TRANSITION, RECHECK
+from state_store import StateStore
+from scheduler import CheckScheduler, night_cycle
+from door_state import DoorStateMachine, OPENED, CLOSED, OPEN_TOO_LONG
+from simulate import Policy, SimulatedClock, simulate, synthetic_presence
+from monitor_engine import MonitorEngine
+import presence_monitor
 
 
 def test_daytime_transitions():
@@ -87,6 +105,63 @@ def test_night_checks():
     print("✓ Night check tracking tests passed!\n")
 
 
+def test_check_scheduler():
+    """Test the event scheduler, including DST transitions."""
+    print("=" * 60)
+    print("TEST: Check Scheduler")
+    print("=" * 60)
+
+    tz = ZoneInfo("America/Los_Angeles")
+    scheduler = CheckScheduler([20, 22, 0, 4], time(6, 0), time(20, 0), tz)
+
+    now = datetime(2026, 3, 7, 19, 30, tzinfo=tz)
+    due, what = scheduler.next_event(now)
+    print(f"1. Next event after {now:%H:%M}: {what} at {due:%Y-%m-%d %H:%M %Z}")
+    assert due == datetime(2026, 3, 7, 20, 0, tzinfo=tz), "Daytime end is the next event"
+
+    # Walk through the night clocks go forward (2am -> 3am on 2026-03-08).
+    # Events due at the same instant (20:00) share one wakeup.
+    wakeups = []
+    while due < datetime(2026, 3, 8, 12, 0, tzinfo=tz):
+        wakeups.append(due.strftime("%H:%M %Z"))
+        due, what = scheduler.next_event(due)
+    print(f"2. Wakeups over the DST night: {wakeups}")
+    assert wakeups == ["20:00 PST", "22:00 PST", "00:00 PST", "04:00 PDT", "06:00 PDT"], \
+        "Each night check should happen exactly once"
+
+    # A 2am check doesn't exist on spring-forward night: it moves to 3am
+    gap_scheduler = CheckScheduler([2], time(6, 0), time(20, 0), tz)
+    due, what = gap_scheduler.next_event(datetime(2026, 3, 8, 1, 0, tzinfo=tz))
+    print(f"3. 2am check on spring-forward night: {due:%H:%M %Z}")
+    assert due.strftime("%H:%M %Z") == "03:00 PDT"
+
+    # Night cycles run from 6am to 6am
+    cycle = night_cycle(datetime(2026, 3, 8, 4, 0, tzinfo=tz), time(6, 0))
+    print(f"4. 4am on 03-08 belongs to the night cycle of {cycle}")
+    assert cycle.day == 7
+
+    print("✓ Check scheduler tests passed!\n")
+
+
+def test_engine_sleep_across_dst():
+    """The engine sleeps real elapsed time until the next event, also on DST nights."""
+    print("=" * 60)
+    print("TEST: Engine Sleep Across DST")
+    print("=" * 60)
+
+    tz = ZoneInfo("America/Los_Angeles")
+    # Spring forward: 02:00 PST becomes 03:00 PDT, so 01:50 PST is 10 minutes before 03:00 PDT
+    now = datetime(2026, 3, 8, 1, 50, tzinfo=tz)
+    due = datetime(2026, 3, 8, 3, 0, tzinfo=tz)
+    engine = MonitorEngine(poll_presence=None, decide=None, run_check=None, save=None, notify=None,
+                           interval=60, now=lambda: now, next_event=lambda _: (due, "night check"))
+    wait = engine._seconds_until_next_event()
+    print(f"Sleep from {now} until {due}: {wait / 60:.1f} min")
+    assert abs(wait - 600.5) < 1, "Should sleep the 10 real minutes (plus the wake delay), not 70"
+
+    print("✓ Engine sleep tests passed!\n")
+
+
 def test_api_limiter():
     """Test API rate limiter."""
     print("=" * 60)
@@ -123,6 +198,290 @@ def test_api_limiter():
     print("✓ API limiter tests passed!\n")
 
 
+def test_api_limiter_priorities():
+    """Test the night check reserve, priority classes and a budget shared between processes."""
+    print("=" * 60)
+    print("TEST: API Limiter Priorities")
+    print("=" * 60)
+
+    tracker = PresenceTracker([20, 22, 0, 4])
+    limiter = ApiRateLimiter(max_calls_per_day=6, reserve=tracker.remaining_night_checks, recheck_headroom=1)
+    print(f"1. Reserved for night checks: {tracker.remaining_night_checks()}")
+
+    # 6 calls, 4 kept for night checks: transitions get 2, re-checks only 1
+    assert limiter.can_make_api_call(RECHECK), "Re-check allowed with 2 spare calls"
+    limiter.record_api_call()
+    assert not limiter.can_make_api_call(RECHECK), "Re-check must leave headroom for transitions"
+    assert limiter.can_make_api_call(TRANSITION)
+    limiter.record_api_call()
+    assert not limiter.can_make_api_call(TRANSITION), "Transitions can't use the night reserve"
+    assert limiter.can_make_api_call(NIGHT), "Night checks can use the reserve"
+    print(f"2. After 2 calls: transition blocked, night allowed")
+
+    # Completed night checks release their reserve
+    tracker.completed_night_checks.update({20, 22})
+    assert limiter.can_make_api_call(TRANSITION), "Reserve shrinks as night checks complete"
+    print(f"3. After 2 night checks, reserved: {tracker.remaining_night_checks()}")
+
+    # Two limiters on the same database and key (e.g. two processes) share one budget
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "state.db"
+        store_a, store_b = StateStore(db_path), StateStore(db_path)
+        limiter_a = ApiRateLimiter(max_calls_per_day=2, store=store_a, key="shared")
+        limiter_b = ApiRateLimiter(max_calls_per_day=2, store=store_b, key="shared")
+        limiter_a.record_api_call()
+        limiter_b.record_api_call()
+        print(f"4. Shared budget: {limiter_a.api_calls_today} calls seen by A, {limiter_b.api_calls_today} by B")
+        assert limiter_a.api_calls_today == 2 and limiter_b.api_calls_today == 2
+        assert not limiter_a.can_make_api_call(), "Budget is shared between processes"
+        store_a.close()
+        store_b.close()
+
+    # A refusal is logged when it starts, not on every check (continuous mode checks every few seconds)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        for _ in range(100):
+            limiter.can_make_api_call(RECHECK)
+    print(f"5. 100 refused re-checks logged {len(output.getvalue().splitlines())} line(s)")
+    assert len(output.getvalue().splitlines()) == 1, "A repeated refusal should be logged once"
+
+    print("✓ API limiter priority tests passed!\n")
+
+
+def test_state_persistence():
+    """Test that limiter and tracker state survive a restart."""
+    print("=" * 60)
+    print("TEST: State Persistence")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "state.db"
+        store = StateStore(db_path)
+        limiter = ApiRateLimiter(max_calls_per_day=3, store=store, key="garage.api_limiter")
+        tracker = PresenceTracker([20, 22, 0, 4], store=store, key="garage.presence")
+        for _ in range(2):
+            assert limiter.can_make_api_call()
+            limiter.record_api_call()
+        tracker.should_check_now(someone_home=True, is_daytime=True)
+        tracker.completed_night_checks.add(22)
+        tracker._save()
+        store.close()
+
+        # "Restart": new objects reading the same database
+        store = StateStore(db_path)
+        limiter = ApiRateLimiter(max_calls_per_day=3, store=store, key="garage.api_limiter")
+        tracker = PresenceTracker([20, 22, 0, 4], store=store, key="garage.presence")
+        print(f"1. After restart: {limiter.api_calls_today} calls, someone_was_home={tracker.someone_was_home}, "
+              f"night checks {tracker.completed_night_checks}")
+        assert limiter.api_calls_today == 2, "Call count should survive a restart"
+        assert limiter.can_make_api_call()
+        limiter.record_api_call()
+        assert not limiter.can_make_api_call(), "Budget should not reset on restart"
+        assert tracker.someone_was_home, "Presence should survive a restart"
+        assert tracker.completed_night_checks == {22}, "Completed night checks should survive a restart"
+
+        # Other keys (cameras) are independent
+        other = ApiRateLimiter(max_calls_per_day=3, store=store, key="side_gate.api_limiter")
+        assert other.api_calls_today == 0, "Each camera has its own budget"
+        print(f"2. Stored keys: {sorted(store.items())}")
+        store.close()
+
+    print("✓ State persistence tests passed!\n")
+
+
+def test_door_state_machine():
+    """Test the debounced door state and open-too-long alerts of continuous mode."""
+    print("=" * 60)
+    print("TEST: Door State Machine (continuous mode)")
+    print("=" * 60)
+
+    state = DoorStateMachine(debounce=3, open_alert_seconds=600, open_realert_seconds=1800)
+    t = 0.0
+
+    def feed(*readings):
+        nonlocal t
+        events = []
+        for is_open in readings:
+            t += 5
+            events.append(state.update(is_open, t))
+        return [event for event in events if event is not None]
+
+    # Initial state needs `debounce` consistent readings; mixed ones don't add up
+    events = feed(True, False, True, False, False)
+    print(f"1. Mixed initial readings: {events}")
+    assert events == [] and state.is_open is None, "Mixed readings shouldn't decide the initial state"
+    events = feed(False)
+    print(f"   Then a third closed reading in a row: {events}")
+    assert events == [CLOSED] and state.is_open is False
+
+    # Single noisy readings don't flip the state
+    events = feed(True, False, True, True, False)
+    print(f"2. Noisy readings: {events}")
+    assert events == [] and state.is_open is False
+
+    events = feed(True, True, True)
+    print(f"3. Door opens: {events}")
+    assert events == [OPENED]
+    opened_at = t
+
+    # Open too long: one alert at 10 minutes, then one every 30 minutes
+    events = feed(*[True] * (2400 // 5))
+    print(f"4. Open for 40 minutes: {events}, open for {state.open_for(t):.0f}s")
+    assert events == [OPEN_TOO_LONG, OPEN_TOO_LONG]
+    assert state.open_for(t) == t - opened_at
+
+    events = feed(False, False, False)
+    print(f"5. Door closes: {events}")
+    assert events == [CLOSED] and state.open_for(t) == 0
+
+    print("✓ Door state machine tests passed!\n")
+
+
+def test_simulated_weeks():
+    """Test weeks of schedule across both DST changes on a simulated clock."""
+    print("=" * 60)
+    print("TEST: Simulated Weeks (DST)")
+    print("=" * 60)
+
+    tz = ZoneInfo("America/Los_Angeles")
+    # The tracker and limiter follow an injected clock
+    clock = SimulatedClock(datetime(2026, 3, 7, 23, 0, tzinfo=tz))
+    limiter = ApiRateLimiter(2, clock=clock)
+    limiter.record_api_call()
+    limiter.record_api_call()
+    assert not limiter.can_make_api_call()
+    # 24.5 wall-clock hours later, but the clocks went forward: only 23.5 hours have passed
+    clock.advance_to(datetime(2026, 3, 8, 23, 30, tzinfo=tz))
+    print(f"1. Rolling window on the simulated clock: {limiter.api_calls_today} calls after 23.5h")
+    assert limiter.api_calls_today == 2, "The window is 24 elapsed hours, not wall-clock hours"
+    clock.advance_to(datetime(2026, 3, 9, 0, 1, tzinfo=tz))
+    assert limiter.api_calls_today == 0 and limiter.can_make_api_call()
+
+    for start in (datetime(2026, 3, 1, tzinfo=tz), datetime(2026, 10, 18, tzinfo=tz)):
+        end = start + timedelta(days=28)
+        presence = synthetic_presence(start.date(), 28, tz)
+        started = time_module.perf_counter()
+        # 2am falls in the spring-forward gap, 1am repeats when the clocks go back
+        result = simulate(Policy([20, 22, 1, 2], 20), presence, start, end)
+        elapsed = time_module.perf_counter() - started
+        print(f"2. 4 weeks from {start.date()}: {dict(result.checks)} checks, "
+              f"{result.calls_per_day:.2f} calls/day in {elapsed:.3f}s")
+        assert result.checks["night"] == 28 * 4 and result.missed_night_checks == 0, \
+            "Every night check should run exactly once, DST nights included"
+        assert result.checks["transition"] == 28 * 3 and result.missed_transitions == 0
+        assert elapsed < 1, "Weeks of simulation should run in well under a second"
+
+    # A tight budget: the reserve keeps the night checks, transitions are missed
+    result = simulate(Policy([20, 22, 0, 4], 5), presence, start, end)
+    print(f"3. Budget of 5/day: {dict(result.checks)}, missed transitions {result.missed_transitions}")
+    assert result.missed_night_checks == 0 and result.missed_transitions > 0
+
+    print("✓ Simulated weeks tests passed!\n")
+
+
+def test_in_process_presence():
+    """With the presence monitor in-process, debounced transitions reach the scheduler by callback."""
+    print("=" * 60)
+    print("TEST: In-Process Presence Monitor")
+    print("=" * 60)
+
+    # Scripted sweeps instead of pings: everyone leaves, then one person comes back
+    sweeps = [{name: False for name in presence_monitor.people_state}] * 4
+    sweeps += [{name: i == 0 for i, name in enumerate(presence_monitor.people_state)}] * 3
+    async def scripted_probe(hosts):
+        return sweeps.pop(0) if len(sweeps) > 1 else sweeps[0]
+
+    seen = []
+    def decide(someone_home):
+        seen.append(someone_home)
+        return []
+
+    async def scenario():
+        engine = MonitorEngine(poll_presence=None, decide=decide, run_check=None, save=None, notify=None,
+                               interval=60, now=datetime.now)
+        presence_monitor.add_listener(lambda status: engine.publish_presence(status["someone_home"]))
+        engine.publish_presence(True)
+        tasks = [asyncio.create_task(presence_monitor.monitor_loop(interval=0)), asyncio.create_task(engine.run())]
+        while len(seen) < 3:
+            await asyncio.sleep(0.01)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    probe, listeners = presence_monitor.probe_all_async, list(presence_monitor.listeners)
+    version = presence_monitor.state_version
+    people = copy.deepcopy(presence_monitor.people_state)
+    last_change = presence_monitor.last_overall_change
+    presence_monitor.probe_all_async = scripted_probe
+    try:
+        asyncio.run(asyncio.wait_for(scenario(), timeout=5))
+        print(f"Scheduler saw: {seen}")
+        assert seen == [True, False, True], "Initial state, then each debounced overall transition once"
+        assert presence_monitor.state_version == version + 2
+        with presence_monitor.state_lock:
+            assert presence_monitor.status_payload()["someone_home"], "/status reflects the same state"
+    finally:
+        presence_monitor.probe_all_async = probe
+        presence_monitor.listeners[:] = listeners
+        presence_monitor.state_version = version
+        presence_monitor.people_state.clear()
+        presence_monitor.people_state.update(people)
+        presence_monitor.last_overall_change = last_change
+    print("✓ Presence transitions pushed to the scheduler")
+
+    print("✓ In-process presence tests passed!\n")
+
+
+def test_presence_longpoll():
+    """/status?since= answers as soon as a transition happens, and at once after a restart."""
+    print("=" * 60)
+    print("TEST: Presence Long-Poll")
+    print("=" * 60)
+
+    version = presence_monitor.state_version
+    people = copy.deepcopy(presence_monitor.people_state)
+    last_change = presence_monitor.last_overall_change
+    server = presence_monitor.start_http_server(port=0)
+    url = f"http://127.0.0.1:{server.server_address[1]}/status"
+
+    def get(query: str) -> tuple[dict, float]:
+        started = time_module.monotonic()
+        with urllib.request.urlopen(f"{url}?{query}", timeout=10) as response:
+            return json.loads(response.read()), time_module.monotonic() - started
+
+    try:
+        status, elapsed = get("")
+        print(f"1. Plain GET: version {status['version']} in {elapsed * 1000:.0f} ms")
+        assert status["version"] == version
+
+        # Everyone leaves while a client is waiting
+        def leave():
+            time_module.sleep(0.3)
+            for _ in range(config.PRESENCE_DEBOUNCE):
+                presence_monitor.record_sweep({name: False for name in presence_monitor.people_state})
+        threading.Thread(target=leave).start()
+        status, elapsed = get(f"since={version}&timeout=5")
+        print(f"2. Long-poll woken by a transition after {elapsed:.2f}s: someone_home={status['someone_home']}")
+        assert status["version"] == version + 1 and not status["someone_home"]
+        assert elapsed < 2, "The transition should answer the waiting request, not the timeout"
+
+        status, elapsed = get(f"since={version + 100}&timeout=5")
+        print(f"3. Version from before a restart answered in {elapsed * 1000:.0f} ms")
+        assert elapsed < 1, "A client holding a larger version than the server's must not wait"
+
+        status, elapsed = get(f"since={status['version']}&timeout=0.3")
+        print(f"4. No transition: answered after the {elapsed:.2f}s timeout")
+        assert elapsed >= 0.3 and status["version"] == version + 1
+    finally:
+        server.shutdown()
+        presence_monitor.state_version = version
+        presence_monitor.people_state.clear()
+        presence_monitor.people_state.update(people)
+        presence_monitor.last_overall_change = last_change
+
+    print("✓ Presence long-poll tests passed!\n")
+
+
 def test_integration_scenario():
     """Test a realistic day scenario."""
     print("=" * 60)
@@ -177,7 +536,15 @@ if __name__ == "__main__":
     try:
         test_daytime_transitions()
         test_night_checks()
+        test_check_scheduler()
+        test_engine_sleep_across_dst()
         test_api_limiter()
+        test_api_limiter_priorities()
+        test_state_persistence()
+        test_door_state_machine()
+        test_simulated_weeks()
+        test_in_process_presence()
+        test_presence_longpoll()
         test_integration_scenario()
         
         print("=" * 60)
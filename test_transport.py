@@ -0,0 +1,125 @@
+"""
+Tests for the shared transport: one keep-alive session per host, per-host
+timeouts, and the single retry of idempotent requests on a dropped
+connection.
+
+Uses a local HTTP server, no network needed.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import config
+import transport
+
+
+class LocalServer:
+    """HTTP/1.1 server recording the client port of every request; can drop the next connection."""
+
+    def __init__(self):
+        self.client_ports = []
+        self.drop_next = False
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _answer(self):
+                server.client_ports.append(self.client_address[1])
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if server.drop_next:
+                    # Like a keep-alive connection the server closed while idle
+                    server.drop_next = False
+                    self.close_connection = True
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"ok")
+
+            do_GET = do_POST = _answer
+
+            def log_message(self, format, *args):
+                return
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def test_sessions_and_timeouts():
+    """Requests to one host share a keep-alive connection; timeouts are configured per host."""
+    print("=" * 60)
+    print("TEST: Pooled Sessions and Timeouts")
+    print("=" * 60)
+
+    server = LocalServer()
+    try:
+        assert transport.get_session(f"{server.url}/a") is transport.get_session(f"{server.url}/b?x=1")
+        assert transport.get_session(server.url) is not transport.get_session("http://127.0.0.2:1/")
+        print("1. One session per host")
+
+        for _ in range(5):
+            assert transport.get(f"{server.url}/shot.jpg").text == "ok"
+        print(f"2. 5 requests over {len(set(server.client_ports))} connection(s)")
+        assert len(set(server.client_ports)) == 1, "Requests to a host should reuse one keep-alive connection"
+
+        presence_url = f"http://127.0.0.1:{config.PRESENCE_API_PORT}/status"
+        assert transport.timeout_for(presence_url) == config.PRESENCE_HTTP_TIMEOUT
+        assert transport.timeout_for(f"{config.NTFY_SERVER}/topic") == config.NTFY_HTTP_TIMEOUT
+        assert transport.timeout_for(server.url) == config.HTTP_DEFAULT_TIMEOUT
+        print("3. Per-host timeouts, default for unknown hosts")
+    finally:
+        server.close()
+        transport.close_all()
+
+    print("✓ Session tests passed!\n")
+
+
+def test_dropped_connection():
+    """A dropped keep-alive connection is retried once for GET, never for POST."""
+    print("=" * 60)
+    print("TEST: Dropped Connections")
+    print("=" * 60)
+
+    server = LocalServer()
+    try:
+        server.drop_next = True
+        assert transport.get(server.url).text == "ok"
+        print(f"1. GET after a dropped connection: {len(server.client_ports)} attempts")
+        assert len(server.client_ports) == 2, "GET should be retried once"
+
+        server.client_ports.clear()
+        server.drop_next = True
+        try:
+            transport.post(server.url, data=b"notification")
+            assert False, "POST must not be retried"
+        except requests.exceptions.ConnectionError:
+            pass
+        print(f"2. POST after a dropped connection: {len(server.client_ports)} attempt, not retried")
+        assert len(server.client_ports) == 1, "A notification must never be posted twice"
+    finally:
+        server.close()
+        transport.close_all()
+
+    print("✓ Dropped connection tests passed!\n")
+
+
+if __name__ == "__main__":
+    try:
+        test_sessions_and_timeouts()
+        test_dropped_connection()
+
+        print("=" * 60)
+        print("✓ ALL TESTS PASSED!")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n✗ TEST FAILED: {e}")
+        exit(1)
@@ -0,0 +1,94 @@
+"""
+Shared network transport for the garage monitor.
+
+Keeps one pooled keep-alive `requests.Session` per host (camera, presence
+service, ntfy) and one long-lived Gemini client, so the monitor doesn't pay
+TCP/TLS setup on every loop tick and every notification. Timeouts are
+configured per host in config.py (GEMINI_HTTP_TIMEOUT for Gemini).
+"""
+import threading
+from functools import cache
+from urllib.parse import urlsplit
+
+import requests
+from google import genai
+from google.genai import types
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import config
+
+
+def host_key(url: str) -> str:
+    """Pool key for a URL: scheme://host[:port]."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+# Per-host (connect, read) timeouts; anything else gets HTTP_DEFAULT_TIMEOUT
+HOST_TIMEOUTS = {
+    **{host_key(camera["url"]): config.CAMERA_HTTP_TIMEOUT for camera in config.CAMERAS},
+    **{host_key(camera["stream_url"]): config.CAMERA_HTTP_TIMEOUT
+       for camera in config.CAMERAS if camera.get("stream_url")},
+    host_key(f"http://127.0.0.1:{config.PRESENCE_API_PORT}"): config.PRESENCE_HTTP_TIMEOUT,
+    host_key(config.NTFY_SERVER): config.NTFY_HTTP_TIMEOUT,
+}
+
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def _new_session() -> requests.Session:
+    session = requests.Session()
+    # Retry once on connection errors so a keep-alive connection the server
+    # dropped while idle doesn't surface as a failure. Only idempotent GETs
+    # are retried, so a notification is never posted twice.
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=config.HTTP_POOL_SIZE,
+        max_retries=Retry(total=1, allowed_methods=frozenset({"GET"}), raise_on_status=False),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session(url: str) -> requests.Session:
+    """Get the shared keep-alive session for the host of `url`."""
+    key = host_key(url)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _sessions[key] = _new_session()
+        return session
+
+
+def timeout_for(url: str) -> tuple[float, float]:
+    return HOST_TIMEOUTS.get(host_key(url), config.HTTP_DEFAULT_TIMEOUT)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """GET through the pooled session for the host, with its configured timeout."""
+    kwargs.setdefault("timeout", timeout_for(url))
+    return get_session(url).get(url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    """POST through the pooled session for the host, with its configured timeout."""
+    kwargs.setdefault("timeout", timeout_for(url))
+    return get_session(url).post(url, **kwargs)
+
+
+@cache
+def get_gemini_client():
+    """The long-lived Gemini client (created on first use)."""
+    # The client's default is no timeout at all; a hung request would hold the batcher thread
+    return genai.Client(http_options=types.HttpOptions(timeout=int(config.GEMINI_HTTP_TIMEOUT * 1000)))
+
+
+def close_all():
+    """Close all pooled sessions (on shutdown)."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
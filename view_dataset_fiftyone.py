@@ -2,43 +2,135 @@
 """
 View the garage door classification dataset using FiftyOne.
 
-This script loads all images from the dataset directory (organized by class)
-and opens them in the FiftyOne interactive viewer.
+The FiftyOne dataset is persistent and kept in sync with the dataset store
+(see dataset_store.py) by store id: each run imports the samples the store
+gained since the last sync, with their label, rationale, camera and capture
+time, and removes the ones it dropped (e.g. by `dataset_store.py dedup`).
+A run that was interrupted halfway is simply completed by the next one.
+
+FiftyOne needs image files, so each sample gets one small JPEG thumbnail
+(written in parallel, new samples only); the full-size frames stay in the
+store (`dataset_store.py export` writes them out).
+
+Usage:
+    uv run view_dataset_fiftyone.py                   # sync and open the viewer
+    uv run view_dataset_fiftyone.py --camera side_gate
+    uv run view_dataset_fiftyone.py --rebuild         # start the FiftyOne dataset over
+    uv run view_dataset_fiftyone.py --no-app          # sync only
 """
 
-import fiftyone as fo
+import argparse
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import fiftyone as fo
+from fiftyone import ViewField as F
+
+from cameras import get_camera
+from dataset_store import DatasetStore, INDEX_NAME, Sample
+from image_prep import resize_jpeg
+
 # Setup dataset directory
 SCRIPT_DIR = Path(__file__).parent
 DATASET_DIR = SCRIPT_DIR / "dataset"
+# Thumbnails for FiftyOne, one directory per FiftyOne dataset
+EXPORT_DIR = SCRIPT_DIR / "dataset_export"
+DATASET_NAME = "garage_door_classification"
+THUMBNAIL_MAX_SIZE = 640
+THUMBNAIL_QUALITY = 80
+NUM_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def load_or_create(name: str, rebuild: bool, thumbnail_dir: Path) -> fo.Dataset:
+    if fo.dataset_exists(name):
+        if not rebuild:
+            return fo.load_dataset(name)
+        fo.delete_dataset(name)
+    if rebuild:
+        shutil.rmtree(thumbnail_dir, ignore_errors=True)
+    return fo.Dataset(name, persistent=True)
+
+
+def write_thumbnail(store: DatasetStore, sample: Sample, thumbnail_dir: Path) -> str:
+    path = thumbnail_dir / f"{sample.id:08d}.jpg"
+    if not path.exists():
+        path.write_bytes(resize_jpeg(store.read_image(sample), THUMBNAIL_MAX_SIZE, THUMBNAIL_QUALITY))
+    return str(path)
+
+
+def sync(dataset: fo.Dataset, store: DatasetStore, thumbnail_dir: Path) -> tuple[int, int]:
+    """Make the FiftyOne dataset match the store. Returns (added, removed)."""
+    samples = {sample.id: sample for sample in store.query()}
+    synced = set(dataset.values("store_id")) if len(dataset) else set()
+
+    # Samples the store dropped since the last sync
+    removed = sorted(synced - samples.keys())
+    if removed:
+        removed_view = dataset.match(F("store_id").is_in(removed))
+        for path in removed_view.values("filepath"):
+            Path(path).unlink(missing_ok=True)
+        dataset.delete_samples(removed_view)
+
+    new_samples = sorted((samples[i] for i in samples.keys() - synced), key=lambda sample: sample.id)
+    if new_samples:
+        print(f"Writing {len(new_samples)} thumbnails to {thumbnail_dir}...")
+        thumbnail_dir.mkdir(parents=True, exist_ok=True)
+        with ThreadPoolExecutor(NUM_WORKERS) as pool:
+            paths = list(pool.map(lambda sample: write_thumbnail(store, sample, thumbnail_dir), new_samples))
+        # Samples are matched to the store by store_id, so if this run stops after
+        # adding them, the next one neither adds them again nor loses them
+        dataset.add_samples([
+            fo.Sample(
+                filepath=path,
+                ground_truth=fo.Classification(label=sample.label),
+                rationale=sample.rationale,
+                camera=sample.camera,
+                captured_at=sample.local_time(),
+                store_id=sample.id,
+            )
+            for path, sample in zip(paths, new_samples)
+        ])
+
+    # Metadata for samples that don't have it yet (the new ones, or ones an interrupted run added)
+    missing_metadata = dataset.exists("metadata", False)
+    if len(missing_metadata):
+        missing_metadata.compute_metadata(num_workers=NUM_WORKERS)
+    return len(new_samples), len(removed)
+
 
 def main():
-    if not DATASET_DIR.exists():
-        print(f"Dataset directory not found at {DATASET_DIR}")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--camera", help="view this camera's dataset from config.CAMERAS")
+    parser.add_argument("--rebuild", action="store_true", help="delete the FiftyOne dataset and import everything")
+    parser.add_argument("--no-app", action="store_true", help="sync without opening the viewer")
+    args = parser.parse_args()
+
+    dataset_dir, name = DATASET_DIR, DATASET_NAME
+    if args.camera is not None:
+        dataset_dir = get_camera(args.camera).dataset_dir
+        name = f"{DATASET_NAME}_{args.camera}"
+    thumbnail_dir = EXPORT_DIR / name
+
+    if not (dataset_dir / INDEX_NAME).exists():
+        print(f"Dataset store not found at {dataset_dir}")
         print("No images have been collected yet.")
         return
-    
-    # Check if there are any images
-    image_count = len(list(DATASET_DIR.glob("*/*.jpg")))
-    if image_count == 0:
-        print(f"No images found in {DATASET_DIR}")
+
+    store = DatasetStore(dataset_dir)
+    dataset = load_or_create(name, args.rebuild, thumbnail_dir)
+    added, removed = sync(dataset, store, thumbnail_dir)
+    store.close()
+    print(f"Synced: {added} samples added, {removed} removed, dataset has {len(dataset)} samples")
+    if len(dataset) == 0:
+        print(f"No images found in {dataset_dir}")
+        return
+    if args.no_app:
         return
-    
-    print(f"Found {image_count} images in dataset")
-    print(f"Loading dataset from {DATASET_DIR}...")
-    
-    # Create dataset from directory structure
-    # FiftyOne automatically detects labels from subdirectory names
-    dataset = fo.Dataset.from_dir(
-        dataset_dir=str(DATASET_DIR),
-        dataset_type=fo.types.ImageClassificationDirectoryTree,
-        name="garage_door_classification"
-    )
-    
-    print(f"Dataset loaded with {len(dataset)} samples")
+
     print("\nOpening FiftyOne App...")
-    
+
     # Launch the interactive viewer
     session = fo.launch_app(dataset)
     session.wait()